@@ -0,0 +1,49 @@
+"""
+账号管理核心包，不依赖tkinter
+界面、命令行和其他工具共用同一套存储、刷新引擎和接口查询
+"""
+
+from .api_server import AccountApiServer
+from .checkpoint import SweepCheckpoint
+from .engine import RefreshEngine, SweepCancelled
+from .fixtures import RecordingTransport, ReplayTransport
+from .instance_lock import InstanceLock
+from .ipc import InstanceServer, send_command
+from .metrics import MetricsRegistry
+from .profiling import Profiler
+from .providers import PubgPlusProvider
+from .rank_history import RankHistory, RankSeries
+from .repository import AccountRepository, default_data_file
+from .search import AccountSearchIndex
+from .service import DEFAULT_SEASON, RANK_MAP, RANK_OPTIONS, AccountService
+from .store import AccountSnapshot, AccountStore, Change, ChangeSet
+from .warm_start import WarmStartPolicy
+
+__all__ = [
+    "AccountApiServer",
+    "AccountRepository",
+    "AccountSearchIndex",
+    "AccountService",
+    "AccountSnapshot",
+    "AccountStore",
+    "Change",
+    "ChangeSet",
+    "DEFAULT_SEASON",
+    "InstanceLock",
+    "InstanceServer",
+    "MetricsRegistry",
+    "Profiler",
+    "PubgPlusProvider",
+    "RANK_MAP",
+    "RANK_OPTIONS",
+    "RankHistory",
+    "RankSeries",
+    "RecordingTransport",
+    "RefreshEngine",
+    "ReplayTransport",
+    "SweepCancelled",
+    "SweepCheckpoint",
+    "WarmStartPolicy",
+    "default_data_file",
+    "send_command",
+]
@@ -0,0 +1,150 @@
+"""
+本机HTTP接口的请求处理，由AccountApiServer.start导入(http.server导入较慢，不在启动时导入)
+"""
+
+import json
+import socketserver
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """每个请求一个线程(http.server.ThreadingHTTPServer需要Python 3.7)"""
+    daemon_threads = True
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """请求处理，api由AccountApiServer.start设置"""
+
+    api = None
+    server_version = "AccountManager"
+
+    # 允许的Host请求头(不含端口)；其他Host的请求可能来自DNS重绑定的网页，一律拒绝
+    ALLOWED_HOSTS = ("localhost", "127.0.0.1", "[::1]")
+
+    def do_GET(self):
+        if not self._check_host():
+            return
+        path, params = self._parse()
+        if path == ["metrics"]:
+            # 指标与账号数据无关，不使用ETag
+            self._send_metrics(params.get("format", "prometheus"))
+            return
+        snapshot = self.api.service.store.snapshot()
+
+        # 先确认路径和参数有效，再比较ETag，未知路径不会返回304
+        if path == ["accounts"]:
+            try:
+                offset = int(params.get("offset", 0))
+                limit = int(params["limit"]) if "limit" in params else None
+            except ValueError:
+                self._send_json(400, {"error": "offset和limit必须是整数"})
+                return
+            query = params.get("q", "")
+            if not self.api.cacheable(query):
+                # unban条件的结果随时间变化，快照版本相同时也可能不同，不使用ETag
+                self._send_json(200, self.api.list_accounts(snapshot, query, max(offset, 0), limit))
+                return
+            etag = self.api.etag(snapshot)
+            build = lambda: self.api.list_accounts(snapshot, query, max(offset, 0), limit)
+        elif len(path) == 2 and path[0] == "accounts":
+            account = snapshot.get(path[1])
+            if account is None:
+                self._send_json(404, {"error": "账号不存在"})
+                return
+            etag = self.api.etag(snapshot)
+            build = lambda: self.api.public(account)
+        elif path == ["stats"]:
+            # 统计中的refreshing不随快照版本变化，计入ETag
+            refreshing = self.api.service.engine.is_busy()
+            etag = self.api.etag(snapshot, "refreshing" if refreshing else "idle")
+            build = lambda: self.api.stats(snapshot, refreshing)
+        else:
+            self._send_json(404, {"error": "未知的路径"})
+            return
+
+        matched = self._etag_matches(etag)
+        self.api.service.metrics.record_cache("http_etag", matched)
+        if matched:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._send_json(200, build(), etag)
+
+    def do_POST(self):
+        if not self._check_host():
+            return
+        path, params = self._parse()
+        if path == ["refresh"]:
+            kind = params.get("kind", "full")
+            if self.api.service.sweep_for(kind) is None:
+                self._send_json(400, {"error": f"未知的刷新类型: {kind}"})
+            elif self.api.service.engine.is_busy() or not self.api.refresh(kind):
+                self._send_json(409, {"error": "已有刷新在执行"})
+            else:
+                self._send_json(202, {"started": kind})
+        elif len(path) == 3 and path[0] == "accounts" and path[2] == "refresh":
+            account = self.api.service.store.get(path[1])
+            if account is None:
+                self._send_json(404, {"error": "账号不存在"})
+            elif not (account.get("account_id") or account.get("id")):
+                self._send_json(400, {"error": "账号没有设置ID，无法查询"})
+            else:
+                self.api.refresh_account(path[1])
+                self._send_json(202, {"started": path[1]})
+        else:
+            self._send_json(404, {"error": "未知的路径"})
+
+    def _parse(self):
+        """返回(路径分段, 查询参数)，同名参数取最后一个"""
+        parts = urlsplit(self.path)
+        path = [part for part in parts.path.split("/") if part]
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        return path, params
+
+    def _check_host(self):
+        """Host请求头不是本机地址时返回403，返回是否可以继续处理"""
+        host = (self.headers.get("Host") or "").strip().lower()
+        if host.startswith("["):
+            name = host[:host.find("]") + 1]
+        else:
+            name = host.split(":", 1)[0]
+        if name in self.ALLOWED_HOSTS:
+            return True
+        self._send_json(403, {"error": "只接受发往本机地址(localhost/127.0.0.1)的请求"})
+        return False
+
+    def _etag_matches(self, etag):
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+    def _send_metrics(self, format):
+        metrics = self.api.service.metrics
+        if format == "json":
+            self._send_json(200, metrics.snapshot())
+            return
+        data = metrics.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, body, etag=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+            # 允许缓存，但每次使用前都要带If-None-Match验证
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # 轮询请求很频繁，不打印访问日志
+        pass
@@ -0,0 +1,125 @@
+import os
+import threading
+
+from .logs import get_logger
+from .search import SnapshotSearchIndex
+from .service import DEFAULT_SEASON, RANK_MAP
+
+log = get_logger(__name__)
+
+
+class AccountApiServer:
+    """
+    本机HTTP接口，供其他工具读取账号状态、触发刷新，只使用标准库
+        GET  /accounts?q=status:normal tier>=钻石5&offset=0&limit=100  过滤后的账号列表
+        GET  /accounts/<uid>                                           单个账号
+        GET  /stats                                                    统计
+        POST /refresh?kind=full|bans|ranks                             启动一次刷新
+        POST /accounts/<uid>/refresh                                   刷新单个账号
+        GET  /metrics?format=prometheus|json                           运行指标
+    GET响应带ETag(由账号存储的快照版本生成，/stats还包括是否正在刷新)，请求带相同的If-None-Match时返回304，
+    数据没有变化时轮询几乎没有开销；结果随时间变化的查询(含unban条件)不带ETag。返回的账号不包含密码；
+    Host请求头不是localhost/127.0.0.1的请求返回403，网页不能通过DNS重绑定访问接口
+    """
+
+    # 不对外返回的字段
+    HIDDEN_FIELDS = ("password",)
+
+    def __init__(self, service, host="127.0.0.1", port=8765, refresh=None, refresh_account=None):
+        """
+        refresh: 可选的 refresh(kind)，启动刷新并返回是否已启动；默认直接使用service
+        refresh_account: 可选的 refresh_account(uid)，返回是否已提交；默认直接使用service
+        两个回调在请求线程中调用，图形界面可借此把刷新交给主线程，以便更新按钮和状态栏
+        """
+        self.service = service
+        self.host = host
+        self.port = port
+        self.refresh = refresh or service.start_refresh
+        self.refresh_account = refresh_account or service.start_account_refresh
+        # 本机进程每次启动生成不同的前缀，避免重启后版本号重复导致客户端误用缓存
+        self._etag_prefix = os.urandom(4).hex()
+        # 接口自己的搜索索引(界面的搜索索引不是线程安全的)
+        self._index = SnapshotSearchIndex(RANK_MAP)
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """在后台线程中开始监听，端口被占用时抛出OSError"""
+        if self._server is not None:
+            return
+        # http.server导入较慢，只在启动接口时导入
+        from .api_handler import RequestHandler, ThreadingHTTPServer
+        handler = type("AccountApiHandler", (RequestHandler,), {"api": self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.port = self._server.server_address[1]  # port为0时使用系统分配的端口
+        self._thread = threading.Thread(target=self._server.serve_forever, name="account-api", daemon=True)
+        self._thread.start()
+        log.info("本机接口已启动: http://%s:%s/", self.host, self.port)
+
+    def stop(self):
+        """停止监听"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(3)
+        self._server = None
+        self._thread = None
+
+    def etag(self, snapshot, variant=None):
+        """
+        快照对应的ETag，同一快照下相同URL的响应内容不变
+        variant: 响应中不随快照变化的部分(如/stats的是否正在刷新)，计入ETag
+        """
+        if variant:
+            return f'"{self._etag_prefix}-{snapshot.version}-{variant}"'
+        return f'"{self._etag_prefix}-{snapshot.version}"'
+
+    def cacheable(self, query):
+        """账号列表查询的结果是否只由快照决定，可以使用ETag"""
+        return not self._index.time_relative(query)
+
+    def list_accounts(self, snapshot, query, offset, limit):
+        """按顺序键排序、过滤并分页"""
+        accounts = self._index.filter_accounts(snapshot, query)
+        total = len(accounts)
+        if limit is not None:
+            accounts = accounts[offset:offset + limit]
+        elif offset:
+            accounts = accounts[offset:]
+        return {
+            "version": snapshot.version,
+            "total": total,
+            "offset": offset,
+            "accounts": [self.public(account) for account in accounts],
+        }
+
+    def stats(self, snapshot, refreshing=None):
+        """
+        账号总数、封禁数、段位分布
+        refreshing: 是否正在刷新，为None时读取刷新引擎的状态
+        """
+        if refreshing is None:
+            refreshing = self.service.engine.is_busy()
+        banned = sum(1 for account in snapshot.records if account.get("status"))
+        tpp_ranks = {}
+        fpp_ranks = {}
+        for account in snapshot.records:
+            tpp_ranks[account.get("tpp_rank", "未定级")] = tpp_ranks.get(account.get("tpp_rank", "未定级"), 0) + 1
+            fpp_ranks[account.get("fpp_rank", "未定级")] = fpp_ranks.get(account.get("fpp_rank", "未定级"), 0) + 1
+        return {
+            "version": snapshot.version,
+            "total": len(snapshot.records),
+            "banned": banned,
+            "normal": len(snapshot.records) - banned,
+            "extended": sum(1 for account in snapshot.records if account.get("extended_ban")),
+            # 按请求开始时的快照读取
+            "season": snapshot.records[0].get("season", DEFAULT_SEASON) if snapshot.records else DEFAULT_SEASON,
+            "refreshing": refreshing,
+            "tpp_ranks": tpp_ranks,
+            "fpp_ranks": fpp_ranks,
+        }
+
+    def public(self, account):
+        """去掉不对外返回的字段"""
+        return {key: value for key, value in account.items() if key not in self.HIDDEN_FIELDS}
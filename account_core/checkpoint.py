@@ -0,0 +1,104 @@
+import datetime
+import json
+import os
+import time
+
+
+class SweepCheckpoint:
+    """
+    刷新进度检查点
+    刷新过程中定期把已完成的账号写入数据文件旁的小文件，程序关闭或崩溃后
+    下一次同类刷新从检查点继续，已完成的账号不再重复查询
+    各类刷新的进度分别保存在同一个文件中，一类刷新不会覆盖另一类未完成的进度
+    """
+
+    def __init__(self, path, kind, clock=None, max_age=24 * 3600, flush_every=25, flush_interval=5.0):
+        self.path = path
+        # 刷新类型，只有同类刷新才会继续上次的进度
+        self.kind = kind
+        # 当前时间(返回datetime)，与AccountService.clock相同，模拟时为虚拟时钟
+        self.clock = clock or datetime.datetime.now
+        # 检查点超过该秒数视为失效，重新开始
+        self.max_age = max_age
+        # 每完成多少个账号或经过多少秒写一次检查点
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        # 已完成的账号唯一标识
+        self.done = set()
+        # 本次刷新开始时间，继续上次进度时沿用上次的开始时间
+        self.started_at = self.clock().strftime("%Y-%m-%d %H:%M:%S")
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def _read(self):
+        """读取文件中各类刷新的进度 {类型: {"started_at", "done"}}，文件不存在或损坏时为空"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        if "kind" in data:
+            # 旧格式：整个文件只有一类刷新的进度
+            return {data["kind"]: data}
+        sweeps = data.get("sweeps")
+        return sweeps if isinstance(sweeps, dict) else {}
+
+    def _write(self, sweeps):
+        """写入各类刷新的进度(先写临时文件再替换)，没有任何进度时删除文件"""
+        if not sweeps:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            return
+        temp_file = self.path + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({"sweeps": sweeps}, f)
+        os.replace(temp_file, self.path)
+
+    def resume(self):
+        """
+        读取上次未完成的同类刷新
+        返回: 已完成的账号数，没有可继续的进度时返回0
+        """
+        data = self._read().get(self.kind)
+        if not isinstance(data, dict):
+            return 0
+        try:
+            started = datetime.datetime.strptime(data["started_at"], "%Y-%m-%d %H:%M:%S")
+        except (KeyError, TypeError, ValueError):
+            return 0
+        if (self.clock() - started).total_seconds() > self.max_age:
+            return 0
+        self.started_at = data["started_at"]
+        self.done = set(data.get("done", []))
+        return len(self.done)
+
+    def mark(self, uid):
+        """
+        记录一个账号已完成
+        返回: 是否到了应该写检查点的时候
+        """
+        self.done.add(uid)
+        self._unflushed += 1
+        return (self._unflushed >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval)
+
+    def flush(self):
+        """写入本类刷新的检查点，保留其他类刷新的进度"""
+        sweeps = self._read()
+        sweeps[self.kind] = {"started_at": self.started_at, "done": sorted(self.done)}
+        self._write(sweeps)
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def clear(self):
+        """刷新完整结束后删除本类刷新的检查点"""
+        self.done = set()
+        self._unflushed = 0
+        sweeps = self._read()
+        if sweeps.pop(self.kind, None) is not None:
+            self._write(sweeps)
@@ -0,0 +1,461 @@
+"""
+命令行入口
+    python -m account_core sweep --bans --ranks --concurrency 8
+    python -m account_core expire
+    python -m account_core list --filter "status:banned unban<6h"
+    python -m account_core export --format csv --output accounts.csv
+    python -m account_core import backup.json
+    python -m account_core refresh 账号名或uid
+    python -m account_core history 账号名或uid --since 2026-10-01
+    python -m account_core --daemon --interval 600 --max-age 3600 --serve 8765
+    python -m account_core --record-fixtures fixtures sweep --bans --ranks
+    python -m account_core --metrics metrics.prom sweep
+
+--json 时stdout只输出一行一个JSON对象的事件(进度、状态、错误、结果)，
+日志输出到stderr；持有数据文件锁时同时写入数据文件旁的滚动日志文件(accounts.json.log)
+
+已有实例(图形界面或常驻模式)在使用同一个数据文件时，命令转发给该实例执行，
+刷新类命令在对方开始执行后即返回
+"""
+
+import argparse
+import contextlib
+import csv
+import datetime
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+from .api_server import AccountApiServer
+from .engine import RefreshEngine, SweepCancelled
+from .fixtures import RecordingTransport
+from .instance_lock import InstanceLock
+from .ipc import InstanceServer, send_command
+from .logs import configure_logging
+from .profiling import Profiler
+from .providers import PubgPlusProvider
+from .repository import default_data_file
+from .service import RANK_OPTIONS, AccountService
+
+# 退出码
+EXIT_OK = 0
+EXIT_ERROR = 1  # 执行出错
+EXIT_USAGE = 2  # 参数错误(argparse)
+EXIT_INCOMPLETE = 3  # 刷新被停止或超出时间预算，已完成部分已保存
+EXIT_LOCKED = 4  # 已有其他实例在修改同一个数据文件
+
+# 导出CSV时的列顺序
+EXPORT_FIELDS = ["uid", "name", "password", "level", "tpp_rank", "tpp_rank_point", "fpp_rank", "fpp_rank_point",
+                 "status", "unban_time", "extended_ban", "phone", "id", "account_id", "note", "checked_at"]
+
+
+class Reporter:
+    """输出命令执行过程中的事件：--json时为JSON行，否则为简短的文本"""
+
+    def __init__(self, stream, as_json):
+        self.stream = stream
+        self.as_json = as_json
+        self._lock = threading.Lock()
+        self._last_progress = 0.0
+
+    def __call__(self, event, data):
+        """作为AccountService的监听者"""
+        if event == "progress" and not self.as_json:
+            # 文本模式下进度每秒最多输出一次
+            now = time.monotonic()
+            if now - self._last_progress < 1 and data["done"] < data["total"]:
+                return
+            self._last_progress = now
+        self.emit(event, **data)
+
+    def emit(self, event, **data):
+        """输出一个事件"""
+        with self._lock:
+            if self.as_json:
+                payload = {"event": event, "time": time.time()}
+                payload.update(data)
+                self.stream.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            elif event == "progress":
+                self.stream.write(f"[{data['phase']}] {data['done']}/{data['total']} {data['name']}\n")
+            elif event in ("status", "error"):
+                self.stream.write(f"{data.get('text') or data.get('message')}\n")
+            elif event == "result":
+                self.stream.write(" ".join(f"{key}={value}" for key, value in data.items()) + "\n")
+            self.stream.flush()
+
+
+def build_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog="account_core", description="账号管理器命令行")
+    parser.add_argument("--data", default=None, help="数据文件路径(默认与程序同目录的accounts.json)")
+    parser.add_argument("--json", action="store_true", help="以JSON行输出事件和结果")
+    parser.add_argument("--daemon", action="store_true", help="常驻运行，定时刷新过期账号")
+    parser.add_argument("--interval", type=float, default=600, help="常驻模式下两次检查的间隔(秒)")
+    parser.add_argument("--max-age", type=float, default=3600, help="常驻模式下超过该秒数未查询的账号视为过期")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT", help="常驻模式下在本机该端口提供HTTP接口")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的网络请求数")
+    parser.add_argument("--record-fixtures", default=None, metavar="DIR",
+                        help="把封禁/段位接口的响应匿名化后保存到该目录，供离线回放")
+    parser.add_argument("--metrics", default=None, metavar="FILE",
+                        help="命令结束时(常驻模式为每次刷新后)把运行指标写入该文件，.json为JSON，否则为Prometheus文本格式")
+    parser.add_argument("--log-level", default=None, choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="日志级别(默认读取环境变量ACCOUNT_MANAGER_LOG_LEVEL，再默认INFO)")
+    parser.add_argument("--log-payloads", action="store_true", default=None,
+                        help="以DEBUG级别记录接口返回的完整数据")
+
+    subparsers = parser.add_subparsers(dest="command")
+
+    sweep = subparsers.add_parser("sweep", help="在线刷新封禁状态和/或段位")
+    sweep.add_argument("--bans", action="store_true", help="查询封禁状态")
+    sweep.add_argument("--ranks", action="store_true", help="查询段位")
+    sweep.add_argument("--concurrency", dest="sweep_concurrency", type=int, default=None, help="同时进行的网络请求数")
+    sweep.add_argument("--budget", type=float, default=None, help="本次刷新的总时间预算(秒)")
+
+    subparsers.add_parser("expire", help="按本地时间解除已到期的封禁")
+
+    list_parser = subparsers.add_parser("list", help="列出账号")
+    list_parser.add_argument("--filter", default="", help="过滤条件，语法与界面搜索框相同")
+
+    export = subparsers.add_parser("export", help="导出账号")
+    export.add_argument("--format", choices=("json", "csv"), default="json")
+    export.add_argument("--output", default="-", help="输出文件，默认为标准输出")
+    export.add_argument("--filter", default="", help="过滤条件，语法与界面搜索框相同")
+    export.add_argument("--no-passwords", action="store_true", help="不导出密码")
+
+    import_parser = subparsers.add_parser("import", help="从JSON文件导入账号")
+    import_parser.add_argument("file", help="accounts.json或export导出的JSON文件")
+
+    refresh = subparsers.add_parser("refresh", help="刷新单个账号")
+    refresh.add_argument("account", help="账号的uid或名称")
+
+    history = subparsers.add_parser("history", help="查看单个账号的段位历史")
+    history.add_argument("account", help="账号的uid或名称")
+    history.add_argument("--season", type=int, default=None, help="赛季，默认为当前赛季")
+    history.add_argument("--since", type=parse_time, default=None, help="开始时间(YYYY-MM-DD或YYYY-MM-DD HH:MM:SS)")
+    history.add_argument("--until", type=parse_time, default=None, help="结束时间，格式同上")
+    return parser
+
+
+def parse_time(text):
+    """命令行中的时间 -> 时间戳"""
+    for time_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text, time_format).timestamp()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"无法识别的时间: {text}")
+
+
+def main(argv=None):
+    """命令行主函数，返回退出码"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.daemon and not args.command:
+        parser.print_help()
+        return EXIT_USAGE
+
+    # 事件写到真正的标准输出；--json时库中的调试输出转到stderr，保证stdout可被程序解析
+    reporter = Reporter(sys.stdout, args.json)
+    configure_logging(level=args.log_level, payloads=args.log_payloads)
+    redirect = contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.ExitStack()
+    with redirect:
+        try:
+            return run(args, reporter)
+        except BrokenPipeError:
+            # 输出被管道另一端提前关闭(如 | head)
+            return EXIT_ERROR
+        except Exception as e:
+            reporter.emit("error", title="命令执行出错", message=f"{type(e).__name__}: {str(e)}")
+            return EXIT_ERROR
+
+
+def run(args, reporter):
+    """执行命令"""
+    data_file = args.data or default_data_file()
+    concurrency = getattr(args, "sweep_concurrency", None) or args.concurrency
+    provider = PubgPlusProvider()
+    if args.record_fixtures:
+        provider.transport = RecordingTransport(provider.transport, args.record_fixtures)
+    # 设置了环境变量ACCOUNT_MANAGER_PROFILE时分析刷新、保存和加载，命令结束时写出结果
+    service = AccountService(data_file, provider=provider, engine=RefreshEngine(concurrency=concurrency),
+                             profiler=Profiler.from_env(data_file))
+    service.add_listener(reporter)
+
+    lock = InstanceLock(service.repository.lock_file)
+    if not lock.acquire():
+        # 已有实例在使用该数据文件，把命令转发给它，不再重复加载
+        return forward(args, service, reporter, lock)
+    try:
+        # 持有锁后才写日志文件，避免多个进程同时滚动同一个文件
+        configure_logging(level=args.log_level, log_file=service.repository.log_file, payloads=args.log_payloads)
+        service.load()
+        if args.command in ("list", "export") and not args.daemon:
+            # 与界面未排序时一致，按顺序键输出
+            accounts = sorted(service.accounts, key=lambda account: account["order"])
+            return output_accounts(args, reporter, service.search_index.filter_accounts(args.filter, accounts))
+        # 缺少赛季时写入默认值，只在持有锁的进程中进行；转发命令和只读命令只读取
+        service.ensure_season()
+        if args.daemon:
+            return run_daemon(args, service, reporter)
+        if args.command == "expire":
+            updated = service.update_ban_status()
+            reporter.emit("result", command="expire", updated=updated)
+            return EXIT_OK
+        if args.command == "import":
+            added, replaced = service.import_accounts(args.file)
+            reporter.emit("result", command="import", added=added, replaced=replaced)
+            return EXIT_OK
+        if args.command == "refresh":
+            return run_refresh_account(args, service, reporter)
+        if args.command == "history":
+            return run_history(args, service, reporter)
+        return run_sweep_command(args, service, reporter)
+    finally:
+        if args.metrics:
+            export_metrics(service, args.metrics, reporter)
+        service.profiler.stop()
+        lock.release()
+
+
+def forward(args, service, reporter, lock):
+    """把命令转发给持有单实例锁的实例"""
+    if args.daemon:
+        reporter.emit("error", title="已有实例在运行", message=f"数据文件正被其他进程使用(pid {lock.owner()})")
+        return EXIT_LOCKED
+    if args.command == "history":
+        # 段位历史只追加，其他实例写入时也可以直接读取
+        service.load()
+        return run_history(args, service, reporter)
+    if args.command == "sweep":
+        command, arguments = "refresh", {"kind": sweep_kind(args)}
+    elif args.command == "list":
+        command, arguments = "list", {"filter": args.filter}
+    elif args.command == "export":
+        command, arguments = "list", {"filter": args.filter, "passwords": not args.no_passwords}
+    elif args.command == "import":
+        command, arguments = "import", {"path": os.path.abspath(args.file)}
+    elif args.command == "refresh":
+        command, arguments = "refresh_account", {"account": args.account}
+    else:
+        command, arguments = args.command, {}
+
+    try:
+        reply = send_command(service.repository.endpoint_file, command, **arguments)
+    except OSError as e:
+        if command == "list":
+            # 持有锁的实例不接受命令(如另一个命令行刷新)时，只读命令直接读取文件
+            service.load()
+            accounts = sorted(service.accounts, key=lambda account: account["order"])
+            return output_accounts(args, reporter, service.search_index.filter_accounts(args.filter, accounts))
+        reporter.emit("error", title="已有实例在运行",
+                      message=f"数据文件正被其他进程使用(pid {lock.owner()})，且无法转发命令: {str(e)}")
+        return EXIT_LOCKED
+    if not reply.get("ok"):
+        reporter.emit("error", title="命令执行出错", message=reply.get("error", ""))
+        return EXIT_ERROR
+    if command == "list":
+        return output_accounts(args, reporter, reply["accounts"])
+    result = {key: value for key, value in reply.items() if key != "ok"}
+    reporter.emit("result", command=args.command, forwarded=True, **result)
+    return EXIT_OK
+
+
+def output_accounts(args, reporter, accounts):
+    """list和export的输出"""
+    if args.command == "list":
+        for account in accounts:
+            if args.json:
+                # 列表不输出密码，需要密码时使用export
+                reporter.emit("account", **{key: value for key, value in account.items() if key != "password"})
+            else:
+                status = "封禁" if account.get("status") else "正常"
+                reporter.stream.write(f"{account.get('name', '')}\t{status}\t{account.get('unban_time', '')}\t"
+                                      f"{account.get('tpp_rank', '')}\t{account.get('fpp_rank', '')}\n")
+        reporter.emit("result", command="list", count=len(accounts))
+        return EXIT_OK
+
+    records = []
+    for account in accounts:
+        record = dict(account)
+        if args.no_passwords:
+            record.pop("password", None)
+        records.append(record)
+    with open_output(args.output) as stream:
+        if args.format == "json":
+            json.dump(records, stream, ensure_ascii=False, indent=2)
+        else:
+            fields = [field for field in EXPORT_FIELDS if not (args.no_passwords and field == "password")]
+            writer = csv.DictWriter(stream, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(records)
+    if args.output != "-":
+        reporter.emit("result", command="export", count=len(records), output=args.output)
+    return EXIT_OK
+
+
+@contextlib.contextmanager
+def open_output(path):
+    """"-"表示标准输出"""
+    if path == "-":
+        yield sys.__stdout__
+        sys.__stdout__.flush()
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            yield f
+
+
+def sweep_kind(args):
+    """sweep命令的刷新类型：两个参数都给或都不给时刷新全部"""
+    if args.bans == args.ranks:
+        return "full"
+    return "bans" if args.bans else "ranks"
+
+
+def run_refresh_account(args, service, reporter):
+    """refresh命令：查询单个账号并保存"""
+    account = service.find_account(args.account)
+    if account is None:
+        reporter.emit("error", title="找不到账号", message=f"找不到账号: {args.account}")
+        return EXIT_ERROR
+    if not (account.get("account_id") or account.get("id")):
+        reporter.emit("error", title="无法查询", message=f"账号 {account.get('name', '')} 没有设置ID")
+        return EXIT_ERROR
+
+    service.start()
+    try:
+        future = service.engine.submit(service.refresh_single_account(service.engine, account["uid"]))
+        ban_updated, rank_updated = future.result()
+    finally:
+        service.shutdown()
+    reporter.emit("result", command="refresh", name=account.get("name", ""),
+                  updated_ban=ban_updated, updated_rank=rank_updated)
+    return EXIT_OK
+
+
+def run_history(args, service, reporter):
+    """history命令：按时间顺序输出账号在一个赛季中的段位变化"""
+    account = service.find_account(args.account)
+    if account is None:
+        reporter.emit("error", title="找不到账号", message=f"找不到账号: {args.account}")
+        return EXIT_ERROR
+    series = service.rank_series(account["uid"], args.season)
+    points = series.range(args.since, args.until) if series is not None else []
+    for timestamp, tpp_tier, tpp_points, fpp_tier, fpp_points in points:
+        time_text = datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        if args.json:
+            reporter.emit("point", time=time_text, tpp_rank=RANK_OPTIONS[tpp_tier], tpp_rank_point=tpp_points,
+                          fpp_rank=RANK_OPTIONS[fpp_tier], fpp_rank_point=fpp_points)
+        else:
+            reporter.stream.write(f"{time_text}\tTPP {RANK_OPTIONS[tpp_tier]}({tpp_points})\t"
+                                  f"FPP {RANK_OPTIONS[fpp_tier]}({fpp_points})\n")
+    reporter.emit("result", command="history", name=account.get("name", ""), count=len(points))
+    return EXIT_OK
+
+
+def run_sweep_command(args, service, reporter):
+    """sweep命令"""
+    sweep = service.sweep_for(sweep_kind(args))
+    if args.budget is not None:
+        service.engine.sweep_budget = args.budget
+
+    service.start()
+    try:
+        result, error = run_sweep_blocking(service, sweep)
+    finally:
+        service.shutdown()
+    return report_sweep(reporter, "sweep", result, error)
+
+
+def run_daemon(args, service, reporter):
+    """常驻模式：每隔interval秒刷新一次超过max_age未查询的账号，收到终止信号后保存进度退出"""
+    stop = threading.Event()
+
+    def handle_signal(signum, frame):
+        stop.set()
+        service.engine.cancel()
+
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), handle_signal)
+
+    reporter.emit("status", text=f"常驻模式启动，每{args.interval:g}秒刷新超过{args.max_age:g}秒未查询的账号")
+    service.start()
+    server = None
+    if args.serve is not None:
+        server = AccountApiServer(service, port=args.serve)
+        try:
+            server.start()
+        except OSError as e:
+            service.shutdown()
+            reporter.emit("error", title="本机接口启动失败", message=f"端口 {args.serve}: {str(e)}")
+            return EXIT_ERROR
+        reporter.emit("status", text=f"本机接口: http://127.0.0.1:{server.port}/")
+    # 其他命令行调用转发到常驻进程
+    instance_server = InstanceServer(service)
+    instance_server.start()
+    exit_code = EXIT_OK
+    try:
+        while not stop.is_set():
+            result, error = run_sweep_blocking(service, service.stale_sweep(args.max_age), stop)
+            code = report_sweep(reporter, "daemon", result, error)
+            if code == EXIT_ERROR:
+                exit_code = code
+            if args.metrics:
+                export_metrics(service, args.metrics, reporter)
+            stop.wait(args.interval)
+    finally:
+        if server is not None:
+            server.stop()
+        instance_server.stop()
+        service.shutdown()
+    return exit_code
+
+
+def export_metrics(service, path, reporter):
+    """把运行指标写入文件，失败时只报告错误"""
+    try:
+        service.metrics.export(path)
+    except OSError as e:
+        reporter.emit("error", title="导出指标失败", message=f"{path}: {str(e)}")
+
+
+def run_sweep_blocking(service, sweep, stop=None):
+    """
+    启动一次刷新并等待结束
+    返回: (结果, 错误)；按Ctrl+C时停止刷新，已完成部分会保存
+    """
+    finished = threading.Event()
+    outcome = {}
+
+    def on_done(result, error):
+        outcome["result"] = result
+        outcome["error"] = error
+        finished.set()
+
+    if service.start_sweep(sweep, on_done=on_done) is None:
+        return None, RuntimeError("已有刷新在执行")
+    try:
+        # 带超时等待，使Windows上也能响应Ctrl+C
+        while not finished.wait(0.5):
+            if stop is not None and stop.is_set():
+                service.engine.cancel()
+    except KeyboardInterrupt:
+        service.engine.cancel()
+        finished.wait(10)
+    return outcome.get("result"), outcome.get("error", SweepCancelled("已停止"))
+
+
+def report_sweep(reporter, command, result, error):
+    """输出刷新结果并返回退出码"""
+    if isinstance(error, SweepCancelled):
+        reporter.emit("result", command=command, completed=False, reason=str(error))
+        return EXIT_INCOMPLETE
+    if error is not None:
+        reporter.emit("error", title="刷新出错", message=f"{type(error).__name__}: {str(error)}")
+        return EXIT_ERROR
+    updated_ban, updated_rank = result
+    reporter.emit("result", command=command, completed=True, updated_ban=updated_ban, updated_rank=updated_rank)
+    return EXIT_OK
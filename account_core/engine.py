@@ -0,0 +1,247 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+
+class SweepCancelled(Exception):
+    """刷新任务被停止或超出总时间预算"""
+
+
+class RefreshEngine:
+    """
+    后台刷新引擎
+    在独立线程中运行asyncio事件循环，封禁/段位刷新作为任务在其中执行；
+    网络请求放到有限大小的线程池中，同时进行的请求数由信号量限制，
+    每个请求有单独的超时，整个刷新有总时间预算，并且可以随时停止；
+    超时或被停止的请求在线程真正结束前仍占用名额，线程池不会被卡住的请求占满
+    """
+
+    def __init__(self, concurrency=4, request_timeout=15, min_interval=0.25, sweep_budget=900):
+        # 同时进行的网络请求数
+        self.concurrency = concurrency
+        # 单个请求的超时(秒)
+        self.request_timeout = request_timeout
+        # 相邻两个请求开始的最小间隔(秒)，避免请求过快
+        self.min_interval = min_interval
+        # 一次刷新的总时间预算(秒)，为None时不限制
+        self.sweep_budget = sweep_budget
+
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._semaphore = None
+        # 低优先级请求(如预取)的额外限制：同时最多一个，且仍受全局并发和请求间隔限制
+        self._background = None
+        # 下一个请求最早的开始时间(事件循环时间)
+        self._next_slot = 0.0
+        # 当前正在执行的刷新任务
+        self._sweep = None
+        self._sweep_lock = threading.Lock()
+
+    def start(self):
+        """启动事件循环线程"""
+        if self._thread is not None:
+            return
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency)
+        self._loop = self._new_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="refresh-engine", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def shutdown(self, timeout=3):
+        """停止当前刷新并关闭事件循环，最多等待timeout秒"""
+        if self._thread is None:
+            return
+        self.cancel()
+        # 取消所有剩余任务并等待它们处理完取消(如保存已完成的进度)，再停止循环
+        try:
+            asyncio.run_coroutine_threadsafe(self._cancel_all(timeout), self._loop).result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        # 正在进行的网络请求有自身的超时，不等待它们结束
+        self._executor.shutdown(wait=False)
+        self._thread = None
+
+    def is_busy(self):
+        """是否有刷新任务正在执行"""
+        with self._sweep_lock:
+            return self._sweep is not None and not self._sweep.done()
+
+    def run_sweep(self, coroutine_function, *args, on_done=None):
+        """
+        在事件循环中启动一个刷新任务，已有任务在执行时返回None
+        coroutine_function: 协程函数，以(engine, *args)调用
+        on_done: 任务结束后在事件循环线程中调用 on_done(result, error)，
+                 被停止时error为SweepCancelled
+        返回: concurrent.futures.Future
+        """
+        with self._sweep_lock:
+            if self._sweep is not None and not self._sweep.done():
+                return None
+            future = asyncio.run_coroutine_threadsafe(
+                self._guard(coroutine_function(self, *args), on_done), self._loop)
+            self._sweep = future
+            return future
+
+    def submit(self, coroutine):
+        """在事件循环中执行单个协程(不占用刷新任务)，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def cancel(self):
+        """停止当前刷新任务(可在任意线程调用)"""
+        with self._sweep_lock:
+            sweep = self._sweep
+        if sweep is not None and not sweep.done():
+            sweep.cancel()
+            return True
+        return False
+
+    async def call(self, function, *args, timeout=None, low_priority=False):
+        """
+        在线程池中执行阻塞的网络请求
+        受并发数和请求间隔限制，超过timeout(默认request_timeout)秒抛出asyncio.TimeoutError
+        low_priority: 低优先级请求同时只执行一个，不会占满并发
+        """
+        if low_priority:
+            async with self._background:
+                return await self.call(function, *args, timeout=timeout)
+        await self._semaphore.acquire()
+        try:
+            await self._wait_slot()
+            request = asyncio.ensure_future(self._execute(function, *args))
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # 超时或被停止时线程池中的线程仍在执行请求，名额要等请求真正结束后才归还；
+        # 否则新的请求会排在线程池队列中，还没开始执行就已超时
+        request.add_done_callback(self._request_done)
+        return await asyncio.wait_for(asyncio.shield(request), timeout or self.request_timeout)
+
+    async def map(self, worker, items, on_result=None, window=None):
+        """
+        对items中的每一项并发执行 await worker(item)，并发请求数由call()限制
+        同时处理中的项数不超过window(默认并发数的2倍)，使多级查询的后一级
+        能紧跟前一级执行，而不是排在所有项的第一级请求之后
+        on_result(item, result, error) 在每一项完成时调用；单项出错不影响其他项
+        返回: 按完成顺序排列的 [(item, result, error)]
+        """
+        async def run(item):
+            try:
+                return item, await worker(item), None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return item, None, e
+
+        window = window or self.concurrency * 2
+        remaining = iter(items)
+        pending = set()
+        results = []
+        try:
+            while True:
+                for item in remaining:
+                    pending.add(self._loop.create_task(run(item)))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    item, result, error = task.result()
+                    results.append((item, result, error))
+                    if on_result is not None:
+                        on_result(item, result, error)
+        finally:
+            # 被停止或超出预算时取消尚未完成的项
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+        return results
+
+    async def _guard(self, coroutine, on_done):
+        """为刷新任务加上总时间预算，并在结束时回调"""
+        result = error = None
+        try:
+            if self.sweep_budget:
+                result = await asyncio.wait_for(coroutine, self.sweep_budget)
+            else:
+                result = await coroutine
+        except asyncio.CancelledError:
+            error = SweepCancelled("已停止")
+        except asyncio.TimeoutError:
+            error = SweepCancelled(f"超出时间预算({self.sweep_budget}秒)")
+        except Exception as e:
+            error = e
+        if on_done is not None:
+            try:
+                on_done(result, error)
+            except Exception as e:
+                log.error("刷新任务回调出错: %s", e)
+        return result
+
+    async def _cancel_all(self, timeout):
+        """取消除自身以外的全部任务，最多等待timeout秒"""
+        current = _current_task(self._loop)
+        tasks = [task for task in _all_tasks(self._loop) if task is not current and not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def _new_loop(self):
+        """创建事件循环(模拟时替换为虚拟时钟的事件循环)"""
+        return asyncio.new_event_loop()
+
+    def _execute(self, function, *args):
+        """执行一个请求，返回可等待对象(模拟时替换为按虚拟时间返回的假接口)"""
+        return self._loop.run_in_executor(self._executor, function, *args)
+
+    def _request_done(self, request):
+        """请求结束(包括已超时放弃的请求)后归还并发名额"""
+        self._semaphore.release()
+        if not request.cancelled():
+            # 已放弃的请求出错时没有人读取结果，在这里读取以免事件循环提示未读取的异常
+            request.exception()
+
+    async def _wait_slot(self):
+        """保证相邻两个请求开始之间至少间隔min_interval秒"""
+        if not self.min_interval:
+            return
+        now = self._loop.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _run_loop(self, ready):
+        """事件循环线程"""
+        asyncio.set_event_loop(self._loop)
+        # 信号量需要在所属的事件循环中创建
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._background = asyncio.Semaphore(1)
+        self._loop.call_soon(ready.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+
+def _all_tasks(loop):
+    """兼容Python 3.6的获取全部任务"""
+    if hasattr(asyncio, "all_tasks"):
+        return asyncio.all_tasks(loop)
+    return asyncio.Task.all_tasks(loop)
+
+
+def _current_task(loop):
+    """兼容Python 3.6的获取当前任务"""
+    if hasattr(asyncio, "current_task"):
+        return asyncio.current_task(loop)
+    return asyncio.Task.current_task(loop)
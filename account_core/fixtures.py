@@ -0,0 +1,190 @@
+"""
+接口响应样本的录制和回放
+录制: 包装真实的transport，把每个封禁/段位接口的响应匿名化后保存为样本文件
+回放: 按请求中的(匿名)标识返回保存的样本，不访问网络，结果确定
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+# 接口路径 -> (样本类型, 作为标识的查询参数)
+ENDPOINTS = {
+    "banv2": ("ban", "player_id"),
+    "season_r": ("rank", "acc_id"),
+}
+
+# 响应中按字段名匿名化的字段(玩家名称、各类标识)
+SENSITIVE_KEYS = {"id", "name", "nickname", "playerName", "player_id", "playerId", "accountId", "account_id",
+                  "acc_id", "steamId", "steam_id", "shardId"}
+
+
+def parse_request(url):
+    """
+    解析接口地址
+    返回: (样本类型, 标识, 查询参数)；不是已知接口时样本类型为None
+    """
+    parts = urlsplit(url)
+    params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+    endpoint = ENDPOINTS.get(parts.path.rstrip("/").rsplit("/", 1)[-1])
+    if endpoint is None:
+        return None, None, params
+    kind, key_param = endpoint
+    return kind, params.get(key_param, ""), params
+
+
+class Anonymizer:
+    """
+    把标识和名称替换为稳定的化名：同一次录制中相同的值得到相同的化名，
+    封禁接口返回的account_id与段位接口请求中的acc_id仍然对应；盐只保存在内存中，化名无法还原
+    """
+
+    def __init__(self, salt=None):
+        self._salt = salt or os.urandom(16)
+        self._names = {}
+
+    def alias(self, value):
+        """值的化名，保留account.前缀等形状"""
+        value = str(value)
+        if value not in self._names:
+            digest = hashlib.sha256(self._salt + value.encode("utf-8")).hexdigest()
+            if value.startswith("account."):
+                self._names[value] = "account." + digest[:32]
+            else:
+                self._names[value] = "anon-" + digest[:12]
+        return self._names[value]
+
+    def scrub(self, data, secrets):
+        """
+        递归匿名化响应数据
+        secrets: 需要在任意字符串中替换的原始值(如请求中的标识)
+        """
+        if isinstance(data, dict):
+            result = {}
+            for key, value in data.items():
+                if key in SENSITIVE_KEYS and isinstance(value, str) and value:
+                    secrets.add(value)
+                    result[key] = self.alias(value)
+                else:
+                    result[key] = self.scrub(value, secrets)
+            return result
+        if isinstance(data, list):
+            return [self.scrub(value, secrets) for value in data]
+        if isinstance(data, str):
+            for secret in secrets:
+                if secret and secret in data:
+                    data = data.replace(secret, self.alias(secret))
+            return data
+        return data
+
+
+class FixtureResponse:
+    """回放时的响应，提供provider用到的status_code、text和json()"""
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class RecordingTransport:
+    """
+    录制模式：请求交给inner(如requests)，同时把匿名化后的响应保存到directory
+    每个(样本类型, 化名, 状态码)保存一个文件，重复请求覆盖旧样本
+    """
+
+    def __init__(self, inner, directory, anonymizer=None):
+        self.inner = inner
+        self.directory = directory
+        self.anonymizer = anonymizer or Anonymizer()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, url, **kwargs):
+        response = self.inner.get(url, **kwargs)
+        try:
+            self.record(url, response.status_code, response.text)
+        except Exception as e:
+            # 录制失败不影响正常查询
+            log.warning("保存接口样本失败: %s", e)
+        return response
+
+    def record(self, url, status_code, text):
+        """保存一个响应样本"""
+        kind, key, params = parse_request(url)
+        if kind is None:
+            return None
+        with self._lock:
+            secrets = {key} if key else set()
+            alias = self.anonymizer.alias(key) if key else "none"
+            # 请求参数中除季节外都是标识
+            params = {name: (value if name == "season" else self.anonymizer.alias(value))
+                      for name, value in params.items()}
+            try:
+                body = self.anonymizer.scrub(json.loads(text), secrets)
+                text = None
+            except ValueError:
+                body = None
+                text = self.anonymizer.scrub(text, secrets)
+            fixture = {
+                "kind": kind,
+                "params": params,
+                "status": status_code,
+                "body": body,
+                "text": text,
+                "recorded_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            path = os.path.join(self.directory, f"{kind}-{alias}-{status_code}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(fixture, f, ensure_ascii=False, indent=2)
+        return path
+
+
+def load_fixtures(directory):
+    """按文件名顺序读取目录中的全部样本，返回[(路径, 样本)]"""
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(directory, name)
+        with open(path, 'r', encoding='utf-8') as f:
+            fixtures.append((path, json.load(f)))
+    return fixtures
+
+
+def fixture_text(fixture):
+    """样本中保存的原始响应文本"""
+    if fixture.get("body") is not None:
+        return json.dumps(fixture["body"], ensure_ascii=False)
+    return fixture.get("text") or ""
+
+
+class ReplayTransport:
+    """
+    回放模式：按请求的样本类型和标识返回保存的样本，找不到时返回404
+    同一个标识有多个状态码的样本时，优先返回200的样本
+    """
+
+    def __init__(self, directory):
+        self.responses = {}
+        for _, fixture in load_fixtures(directory):
+            key_param = dict(ENDPOINTS.values()).get(fixture["kind"])
+            key = (fixture["kind"], fixture["params"].get(key_param, ""))
+            if key not in self.responses or fixture["status"] == 200:
+                self.responses[key] = FixtureResponse(fixture["status"], fixture_text(fixture))
+
+    def get(self, url, **kwargs):
+        kind, key, _ = parse_request(url)
+        response = self.responses.get((kind, key))
+        if response is None:
+            return FixtureResponse(404, json.dumps({"error": "没有对应的样本"}))
+        return response
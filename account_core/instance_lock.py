@@ -0,0 +1,69 @@
+import os
+
+try:
+    import msvcrt  # Windows
+except ImportError:
+    msvcrt = None
+    import fcntl  # Linux/macOS
+
+
+class InstanceLock:
+    """
+    单实例锁
+    在数据文件旁的锁文件上加操作系统级的排他锁，进程退出(包括崩溃)后自动释放；
+    锁文件中写入持有者的进程号，便于排查
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """尝试加锁，已被其他进程持有时返回False(不等待)"""
+        if self._file is not None:
+            return True
+        f = open(self.path, 'a+')
+        try:
+            if msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        # 记录持有者的进程号
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        """释放锁"""
+        if self._file is None:
+            return
+        try:
+            if msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def owner(self):
+        """返回锁文件中记录的进程号，无法读取时返回None"""
+        try:
+            with open(self.path, 'r') as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,174 @@
+import hmac
+import json
+import os
+import socket
+import socketserver
+import threading
+
+from .search import SnapshotSearchIndex
+from .service import RANK_MAP
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+
+
+class InstanceServer:
+    """
+    进程间命令服务
+    持有单实例锁的实例(图形界面或常驻模式)在本机随机端口监听，并把端口和随机令牌写入
+    数据文件旁的.ipc文件；后启动的实例或命令行读取该文件，把命令转发过来后直接退出，
+    不再重复加载全部账号。每个连接发送一行JSON命令，收到一行JSON回复:
+        {"token": ..., "command": "refresh", "kind": "bans"}
+        {"ok": true, ...} 或 {"ok": false, "error": "..."}
+    """
+
+    def __init__(self, service, refresh=None, refresh_account=None, handlers=None):
+        """
+        refresh、refresh_account: 同AccountApiServer，默认直接使用service
+        handlers: 可选的 {命令: handler(request)}，覆盖或增加默认的命令处理，
+                  handler在连接线程中调用，返回回复字典(不含ok)，出错时抛出异常
+        """
+        self.service = service
+        self.endpoint_file = service.repository.endpoint_file
+        self.refresh = refresh or service.start_refresh
+        self.refresh_account = refresh_account or service.start_account_refresh
+        self.handlers = {
+            "ping": self.handle_ping,
+            "refresh": self.handle_refresh,
+            "refresh_account": self.handle_refresh_account,
+            "expire": self.handle_expire,
+            "list": self.handle_list,
+            "import": self.handle_import,
+        }
+        self.handlers.update(handlers or {})
+        self._token = os.urandom(16).hex()
+        self._index = SnapshotSearchIndex(RANK_MAP)
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """开始监听并写入连接信息"""
+        if self._server is not None:
+            return
+        handler = type("InstanceCommandHandler", (_CommandHandler,), {"instance": self})
+        self._server = _ThreadingTCPServer(("127.0.0.1", 0), handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="instance-ipc", daemon=True)
+        self._thread.start()
+        endpoint = {"pid": os.getpid(), "port": self._server.server_address[1], "token": self._token}
+        temp_file = self.endpoint_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(endpoint, f)
+        os.replace(temp_file, self.endpoint_file)
+
+    def stop(self):
+        """停止监听，删除连接信息"""
+        if self._server is None:
+            return
+        try:
+            with open(self.endpoint_file, 'r', encoding='utf-8') as f:
+                mine = json.load(f).get("token") == self._token
+            if mine:
+                os.remove(self.endpoint_file)
+        except (OSError, ValueError):
+            pass
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(3)
+        self._server = None
+        self._thread = None
+
+    def dispatch(self, request):
+        """执行一条命令，返回回复字典"""
+        if not hmac.compare_digest(str(request.get("token", "")), self._token):
+            return {"ok": False, "error": "令牌无效"}
+        handler = self.handlers.get(request.get("command"))
+        if handler is None:
+            return {"ok": False, "error": f"未知的命令: {request.get('command')}"}
+        try:
+            reply = handler(request) or {}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}
+        reply.setdefault("ok", True)
+        return reply
+
+    def account_for(self, request):
+        """按命令中的account(唯一标识或名称)查找账号，找不到时抛出LookupError"""
+        account = self.service.find_account(request.get("account", ""))
+        if account is None:
+            raise LookupError(f"找不到账号: {request.get('account', '')}")
+        return account
+
+    def handle_ping(self, request):
+        return {"pid": os.getpid()}
+
+    def handle_refresh(self, request):
+        kind = request.get("kind", "full")
+        if self.service.sweep_for(kind) is None:
+            raise ValueError(f"未知的刷新类型: {kind}")
+        if self.service.engine.is_busy() or not self.refresh(kind):
+            return {"ok": False, "error": "已有刷新在执行"}
+        return {"started": kind}
+
+    def handle_refresh_account(self, request):
+        account = self.account_for(request)
+        if not (account.get("account_id") or account.get("id")):
+            raise ValueError(f"账号 {account.get('name', '')} 没有设置ID，无法查询")
+        self.refresh_account(account["uid"])
+        return {"started": account["uid"], "name": account.get("name", "")}
+
+    def handle_expire(self, request):
+        return {"updated": self.service.update_ban_status()}
+
+    def handle_list(self, request):
+        """过滤后的账号；只有请求带passwords(导出时)才包含密码"""
+        accounts = self._index.filter_accounts(self.service.store.snapshot(), request.get("filter", ""))
+        if request.get("passwords"):
+            return {"accounts": list(accounts)}
+        return {"accounts": [{key: value for key, value in account.items() if key != "password"}
+                             for account in accounts]}
+
+    def handle_import(self, request):
+        added, replaced = self.service.import_accounts(request["path"])
+        return {"added": added, "replaced": replaced}
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """读取一行命令，回复一行结果；instance由InstanceServer.start设置"""
+
+    instance = None
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line.decode("utf-8"))
+        except ValueError:
+            reply = {"ok": False, "error": "无法解析命令"}
+        else:
+            reply = self.instance.dispatch(request if isinstance(request, dict) else {})
+        self.wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+def send_command(endpoint_file, command, timeout=10, **arguments):
+    """
+    把命令发送给持有单实例锁的实例
+    返回: 回复字典；没有正在运行的实例(连接信息不存在或无法连接)时抛出OSError
+    """
+    try:
+        with open(endpoint_file, 'r', encoding='utf-8') as f:
+            endpoint = json.load(f)
+    except ValueError:
+        raise OSError(f"连接信息无法解析: {endpoint_file}")
+    request = dict(arguments, token=endpoint.get("token"), command=command)
+    with socket.create_connection(("127.0.0.1", endpoint["port"]), timeout=timeout) as connection:
+        connection.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    try:
+        return json.loads(data.decode("utf-8"))
+    except ValueError:
+        raise OSError("正在运行的实例没有返回有效的回复")
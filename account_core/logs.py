@@ -0,0 +1,124 @@
+"""
+分级日志：输出到控制台(标准错误)和数据文件旁的滚动日志文件
+    ACCOUNT_MANAGER_LOG_LEVEL     日志级别 DEBUG/INFO/WARNING/ERROR，默认INFO
+    ACCOUNT_MANAGER_LOG_PAYLOADS  设为1时以DEBUG级别记录接口返回的完整数据，默认不记录
+
+日志参数在输出前才格式化，被过滤掉的日志几乎没有开销；
+每个账号一条的重复日志带有extra={"sample": 类别}，按类别抽样输出
+"""
+
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+
+ROOT_LOGGER = "account_core"
+# 接口返回的完整数据单独使用一个日志对象，默认关闭
+PAYLOAD_LOGGER = "account_core.payload"
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 日志文件达到该大小后滚动，保留的旧文件数
+LOG_FILE_BYTES = 2 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# 关闭时使用的级别，高于所有标准级别
+DISABLED = logging.CRITICAL + 1
+
+
+def get_logger(name):
+    """模块使用的日志对象，统一挂在account_core下，便于一次配置"""
+    if name != ROOT_LOGGER and not name.startswith(ROOT_LOGGER + "."):
+        name = f"{ROOT_LOGGER}.{name}"
+    return logging.getLogger(name)
+
+
+def payload_logger():
+    """记录接口完整返回数据的日志对象"""
+    return logging.getLogger(PAYLOAD_LOGGER)
+
+
+class SampleFilter(logging.Filter):
+    """
+    抽样输出重复日志：带有sample属性的日志，每个类别每interval秒只输出前burst条，
+    其余只计数，该类别下一条输出的日志后附上省略的条数；没有sample属性的日志全部输出
+    每个处理器使用单独的实例
+    """
+
+    def __init__(self, burst=20, interval=10.0, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._clock = clock
+        # 类别 -> [窗口开始时间, 窗口内已输出条数, 未报告的省略条数]
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None:
+            return True
+        with self._lock:
+            now = self._clock()
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                window = self._windows[key] = [now, 0, window[2] if window else 0]
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            dropped, window[2] = window[2], 0
+        if dropped:
+            record.msg = f"{record.msg} (已省略 {dropped} 条同类日志)"
+        return True
+
+
+def _level(value, default):
+    """日志级别名称或数字 -> 数字"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).strip().upper())
+    return level if isinstance(level, int) else default
+
+
+def configure_logging(level=None, log_file=None, payloads=None, stream=None):
+    """
+    配置account_core下全部日志，可以重复调用(替换之前的配置)
+    level: 日志级别，默认读取环境变量ACCOUNT_MANAGER_LOG_LEVEL，再默认INFO
+    log_file: 滚动日志文件路径，为None时只输出到控制台
+    payloads: 是否记录接口完整返回数据，默认读取环境变量ACCOUNT_MANAGER_LOG_PAYLOADS
+    stream: 控制台输出流，默认标准错误；为False时不输出到控制台
+    """
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    root.setLevel(_level(level if level is not None else os.environ.get("ACCOUNT_MANAGER_LOG_LEVEL"), logging.INFO))
+    root.propagate = False
+    if payloads is None:
+        payloads = os.environ.get("ACCOUNT_MANAGER_LOG_PAYLOADS", "").strip() not in ("", "0")
+    payload_logger().setLevel(logging.DEBUG if payloads else DISABLED)
+
+    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    handlers = []
+    if stream is not False:
+        handlers.append(logging.StreamHandler(stream or sys.stderr))
+    if log_file:
+        try:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_FILE_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8", delay=True))
+        except OSError as e:
+            root.warning("无法打开日志文件 %s: %s", log_file, e)
+    if not handlers:
+        handlers.append(logging.NullHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(SampleFilter())
+        root.addHandler(handler)
+    return root
@@ -0,0 +1,239 @@
+"""
+运行指标：接口请求延迟分布、状态码、重试、缓存命中和刷新各阶段的吞吐量
+可以在界面的诊断窗口中查看，也可以导出为Prometheus文本格式或JSON，用于根据数据调整并发数
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+
+from .fixtures import parse_request
+
+# 请求延迟直方图的桶上限(秒)，与引擎默认的单请求超时(15秒)相配
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+
+# Prometheus指标名前缀
+PREFIX = "account_manager"
+
+
+class Histogram:
+    """固定分桶的直方图，分位数在桶内线性插值"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # 最后一个桶为超过最大上限的部分
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """分位数估计，没有数据时返回None"""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        cumulative = 0
+        lower = 0.0
+        for index, count in enumerate(self.counts):
+            upper = self.buckets[index] if index < len(self.buckets) else self.max
+            if count and cumulative + count >= rank:
+                return min(lower + (upper - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+            lower = upper
+        return self.max
+
+    def cumulative(self):
+        """[(上限, 累计数)]，最后一项上限为+Inf"""
+        result = []
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            result.append((self.buckets[index] if index < len(self.buckets) else float("inf"), total))
+        return result
+
+
+class MetricsRegistry:
+    """
+    线程安全的指标登记
+    请求指标由MeteredTransport在网络请求线程中记录，刷新阶段由AccountService记录，
+    缓存命中由使用缓存的地方记录(按上次查询时间跳过新鲜的账号、HTTP接口的ETag)，
+    启动耗时由界面记录
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started = clock()
+        self._latency = {}  # 接口 -> Histogram
+        self._statuses = {}  # (接口, 状态码) -> 次数
+        self._retries = {}  # 接口 -> 次数
+        self._failed = set()  # 上次请求失败的(接口, 标识)，再次请求时计为重试
+        self._cache = {}  # 缓存名称 -> [命中, 未命中]
+        self._phases = {}  # 刷新阶段 -> 统计
+        self._startup = {}  # 启动阶段 -> 从开始导入起的秒数
+
+    def observe_request(self, endpoint, seconds, status, key=None):
+        """
+        记录一次接口请求
+        status: HTTP状态码，或请求未完成时的"timeout"/"error"
+        key: 请求的账号标识，同一标识上次失败时本次计为重试
+        """
+        with self._lock:
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+            status = str(status)
+            self._statuses[(endpoint, status)] = self._statuses.get((endpoint, status), 0) + 1
+            if key:
+                if (endpoint, key) in self._failed:
+                    self._retries[endpoint] = self._retries.get(endpoint, 0) + 1
+                if status == "200":
+                    self._failed.discard((endpoint, key))
+                else:
+                    self._failed.add((endpoint, key))
+
+    def record_cache(self, name, hit):
+        """记录一次缓存查找"""
+        with self._lock:
+            counts = self._cache.setdefault(name, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def record_phase(self, phase, accounts, seconds):
+        """记录刷新的一个阶段(如本地检查、在线查询)处理的账号数和耗时"""
+        with self._lock:
+            stats = self._phases.setdefault(phase, {"runs": 0, "accounts": 0, "seconds": 0.0, "last": None})
+            stats["runs"] += 1
+            stats["accounts"] += accounts
+            stats["seconds"] += seconds
+            stats["last"] = {
+                "accounts": accounts,
+                "seconds": seconds,
+                "accounts_per_second": accounts / seconds if seconds > 0 else None,
+            }
+
+    def record_startup(self, stage, seconds):
+        """记录启动到某一阶段(如首次显示、全部启动)的耗时"""
+        with self._lock:
+            self._startup[stage] = seconds
+
+    def snapshot(self):
+        """当前全部指标，可以直接序列化为JSON"""
+        with self._lock:
+            endpoints = {}
+            for endpoint, histogram in self._latency.items():
+                statuses = {status: count for (name, status), count in self._statuses.items() if name == endpoint}
+                errors = sum(count for status, count in statuses.items() if status != "200")
+                endpoints[endpoint] = {
+                    "requests": histogram.count,
+                    "errors": errors,
+                    "error_rate": errors / histogram.count if histogram.count else 0.0,
+                    "retries": self._retries.get(endpoint, 0),
+                    "statuses": statuses,
+                    "latency": {
+                        "p50": histogram.percentile(0.50),
+                        "p95": histogram.percentile(0.95),
+                        "p99": histogram.percentile(0.99),
+                        "max": histogram.max,
+                        "mean": histogram.sum / histogram.count if histogram.count else None,
+                    },
+                }
+            cache = {}
+            for name, (hits, misses) in self._cache.items():
+                cache[name] = {"hits": hits, "misses": misses,
+                               "hit_ratio": hits / (hits + misses) if hits + misses else None}
+            phases = {}
+            for phase, stats in self._phases.items():
+                phases[phase] = dict(stats)
+                phases[phase]["accounts_per_second"] = (stats["accounts"] / stats["seconds"]
+                                                        if stats["seconds"] > 0 else None)
+            return {
+                "uptime_seconds": self._clock() - self.started,
+                "endpoints": endpoints,
+                "cache": cache,
+                "phases": phases,
+                "startup": dict(self._startup),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus文本格式"""
+        with self._lock:
+            lines = [
+                f"# TYPE {PREFIX}_uptime_seconds gauge",
+                f"{PREFIX}_uptime_seconds {self._clock() - self.started:.3f}",
+                f"# TYPE {PREFIX}_request_duration_seconds histogram",
+            ]
+            for endpoint, histogram in sorted(self._latency.items()):
+                for upper, count in histogram.cumulative():
+                    le = "+Inf" if upper == float("inf") else repr(upper)
+                    lines.append(f'{PREFIX}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {count}')
+                lines.append(f'{PREFIX}_request_duration_seconds_sum{{endpoint="{endpoint}"}} {histogram.sum:.6f}')
+                lines.append(f'{PREFIX}_request_duration_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+            lines.append(f"# TYPE {PREFIX}_requests_total counter")
+            for (endpoint, status), count in sorted(self._statuses.items()):
+                lines.append(f'{PREFIX}_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+            lines.append(f"# TYPE {PREFIX}_request_retries_total counter")
+            for endpoint, count in sorted(self._retries.items()):
+                lines.append(f'{PREFIX}_request_retries_total{{endpoint="{endpoint}"}} {count}')
+            lines.append(f"# TYPE {PREFIX}_cache_lookups_total counter")
+            for name, (hits, misses) in sorted(self._cache.items()):
+                lines.append(f'{PREFIX}_cache_lookups_total{{cache="{name}",result="hit"}} {hits}')
+                lines.append(f'{PREFIX}_cache_lookups_total{{cache="{name}",result="miss"}} {misses}')
+            lines.append(f"# TYPE {PREFIX}_sweep_phase_runs_total counter")
+            lines.extend(f'{PREFIX}_sweep_phase_runs_total{{phase="{phase}"}} {stats["runs"]}'
+                         for phase, stats in sorted(self._phases.items()))
+            lines.append(f"# TYPE {PREFIX}_sweep_phase_accounts_total counter")
+            lines.extend(f'{PREFIX}_sweep_phase_accounts_total{{phase="{phase}"}} {stats["accounts"]}'
+                         for phase, stats in sorted(self._phases.items()))
+            lines.append(f"# TYPE {PREFIX}_sweep_phase_seconds_total counter")
+            lines.extend(f'{PREFIX}_sweep_phase_seconds_total{{phase="{phase}"}} {stats["seconds"]:.3f}'
+                         for phase, stats in sorted(self._phases.items()))
+            lines.append(f"# TYPE {PREFIX}_sweep_phase_last_accounts_per_second gauge")
+            for phase, stats in sorted(self._phases.items()):
+                rate = stats["last"]["accounts_per_second"]
+                if rate is not None:
+                    lines.append(f'{PREFIX}_sweep_phase_last_accounts_per_second{{phase="{phase}"}} {rate:.3f}')
+            lines.append(f"# TYPE {PREFIX}_startup_seconds gauge")
+            lines.extend(f'{PREFIX}_startup_seconds{{stage="{stage}"}} {seconds:.3f}'
+                         for stage, seconds in sorted(self._startup.items()))
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """写入文件：扩展名为.json时为JSON，否则为Prometheus文本格式；先写临时文件再替换"""
+        text = self.to_json() if path.lower().endswith(".json") else self.to_prometheus()
+        temp_file = path + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_file, path)
+
+
+class MeteredTransport:
+    """包装provider的transport，记录每个请求的接口、延迟和状态码"""
+
+    def __init__(self, inner, metrics):
+        self.inner = inner
+        self.metrics = metrics
+
+    def get(self, url, **kwargs):
+        endpoint, key, _ = parse_request(url)
+        endpoint = endpoint or "other"
+        start = time.perf_counter()
+        try:
+            response = self.inner.get(url, **kwargs)
+        except Exception as e:
+            status = "timeout" if "timeout" in type(e).__name__.lower() else "error"
+            self.metrics.observe_request(endpoint, time.perf_counter() - start, status, key)
+            raise
+        self.metrics.observe_request(endpoint, time.perf_counter() - start, response.status_code, key)
+        return response
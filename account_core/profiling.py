@@ -0,0 +1,215 @@
+"""
+可选的性能分析：包装刷新、表格刷新、保存和加载等热点路径
+    ACCOUNT_MANAGER_PROFILE=sample    采样分析(默认间隔5毫秒)，输出折叠栈(.folded)，可直接生成火焰图
+    ACCOUNT_MANAGER_PROFILE=cprofile  cProfile确定性分析，每个路径输出一个.pstats文件
+    ACCOUNT_MANAGER_PROFILE_DIR       输出目录，默认为数据文件所在目录下的profiles
+
+未开启时被包装的函数只多一次属性判断；界面的诊断窗口也可以在运行中开启和停止
+"""
+
+import contextlib
+import cProfile
+import datetime
+import functools
+import os
+import sys
+import threading
+
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+MODES = ("sample", "cprofile")
+
+
+def frame_label(code):
+    """折叠栈中的一帧：函数名(文件名:首行)"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    按路径名称分析被包装的代码
+    sample模式：后台线程定期读取正在执行被包装路径的线程的调用栈，按路径累计折叠栈；
+    cprofile模式：每个路径一个cProfile.Profile，同一时间只有一个路径被分析(cProfile不能嵌套)，
+    其他线程同时进入的路径不计入
+    """
+
+    def __init__(self, mode=None, directory=None, interval=0.005):
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"未知的性能分析模式: {mode}")
+        self.mode = mode
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        # 线程id -> [路径名称, 嵌套深度]，只有最外层的路径被记录
+        self._active = {}
+        # sample模式：折叠栈 -> 采样次数
+        self._stacks = {}
+        self._sampler = None
+        self._stop = threading.Event()
+        # cprofile模式：路径名称 -> cProfile.Profile，以及当前正在分析的线程
+        self._profiles = {}
+        self._profiling_thread = None
+        self.started_at = None
+
+    @classmethod
+    def from_env(cls, data_file):
+        """按环境变量创建，未设置时返回未开启的分析器"""
+        mode = os.environ.get("ACCOUNT_MANAGER_PROFILE", "").strip().lower()
+        if mode in ("1", "true", "yes"):
+            mode = "sample"
+        directory = os.environ.get("ACCOUNT_MANAGER_PROFILE_DIR", "").strip() or default_directory(data_file)
+        profiler = cls(directory=directory)
+        if mode:
+            try:
+                profiler.start(mode)
+            except ValueError as e:
+                log.warning("%s，不进行性能分析", e)
+        return profiler
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    def start(self, mode="sample"):
+        """开始分析，之前的结果被清空"""
+        if mode not in MODES:
+            raise ValueError(f"未知的性能分析模式: {mode}")
+        with self._lock:
+            self._stacks = {}
+            self._profiles = {}
+            self.started_at = datetime.datetime.now()
+            self.mode = mode
+        if mode == "sample" and self._sampler is None:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+            self._sampler.start()
+        log.info("性能分析已开启(%s)", mode)
+
+    def stop(self):
+        """停止分析并写出结果，返回写出的文件列表；未开启时返回空列表"""
+        if not self.enabled:
+            return []
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join(1)
+            self._sampler = None
+        try:
+            return self.dump()
+        finally:
+            # 写出失败(如磁盘已满、目录不可写)时也要停止，否则无法再次停止或重新开启
+            with self._lock:
+                self.mode = None
+
+    def wrap(self, name, function):
+        """包装同步函数"""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if self.mode is None:
+                return function(*args, **kwargs)
+            with self.section(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def wrap_sweep(self, name, coroutine_function):
+        """包装刷新使用的协程函数 sweep(engine, *args)；分析期间同一事件循环中的其他任务也会被计入"""
+        @functools.wraps(coroutine_function)
+        async def wrapper(engine, *args):
+            if self.mode is None:
+                return await coroutine_function(engine, *args)
+            with self.section(name):
+                return await coroutine_function(engine, *args)
+        return wrapper
+
+    def section(self, name):
+        """分析with语句中的代码"""
+        if self.mode is None:
+            return contextlib.ExitStack()
+        return self._section(name)
+
+    @contextlib.contextmanager
+    def _section(self, name):
+        ident = threading.get_ident()
+        profile = None
+        with self._lock:
+            entry = self._active.get(ident)
+            if entry is not None:
+                # 嵌套在其他路径中，由外层路径记录
+                entry[1] += 1
+            else:
+                self._active[ident] = [name, 1]
+                if self.mode == "cprofile" and self._profiling_thread is None:
+                    profile = self._profiles.get(name)
+                    if profile is None:
+                        profile = self._profiles[name] = cProfile.Profile()
+                    self._profiling_thread = ident
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # 已有其他分析工具(如调试器)在运行
+                profile = None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                if self._profiling_thread == ident and self._active[ident][1] == 1:
+                    self._profiling_thread = None
+                entry = self._active[ident]
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._active[ident]
+
+    def _sample_loop(self):
+        """采样线程：记录每个正在执行被包装路径的线程的调用栈"""
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                active = {ident: entry[0] for ident, entry in self._active.items() if ident != own}
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, name in active.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(name)
+                key = ";".join(reversed(stack))
+                with self._lock:
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+            del frames
+
+    def dump(self):
+        """写出目前的结果(不停止分析)，返回写出的文件列表"""
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = (self.started_at or datetime.datetime.now()).strftime("%Y%m%d-%H%M%S")
+        paths = []
+        with self._lock:
+            stacks = dict(self._stacks)
+            profiles = dict(self._profiles)
+        if stacks:
+            path = os.path.join(self.directory, f"{stamp}-sample.folded")
+            with open(path, 'w', encoding='utf-8') as f:
+                for key, count in sorted(stacks.items()):
+                    f.write(f"{key} {count}\n")
+            paths.append(path)
+        for name, profile in profiles.items():
+            path = os.path.join(self.directory, f"{stamp}-{name}.pstats")
+            profile.dump_stats(path)
+            paths.append(path)
+        for path in paths:
+            log.info("性能分析结果已写入: %s", path)
+        return paths
+
+
+def default_directory(data_file):
+    """默认的输出目录：数据文件所在目录下的profiles"""
+    return os.path.join(os.path.dirname(os.path.abspath(data_file)), "profiles")
+
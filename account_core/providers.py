@@ -0,0 +1,189 @@
+import logging
+
+from .logs import get_logger, payload_logger
+
+log = get_logger(__name__)
+# 接口返回的完整数据，默认不记录
+payload_log = payload_logger()
+
+
+class RequestsTransport:
+    """
+    默认的transport，第一次请求时才导入requests
+    requests及其依赖(urllib3、charset、certifi)导入需要几十毫秒，推迟到第一次请求，不影响启动
+    """
+
+    def get(self, url, **kwargs):
+        import requests  # 导入requests库用于网络请求
+        return requests.get(url, **kwargs)
+
+
+class PubgPlusProvider:
+    """
+    apiv1.pubg.plus 接口：封禁状态和赛季段位查询
+    独立成类，以便于未来更换API时只需修改这里
+    """
+
+    # 添加请求头，模拟浏览器
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+
+    def __init__(self, timeout=10, transport=None):
+        # 单个请求的超时(秒)
+        self.timeout = timeout
+        # 发送GET请求的对象，需要有 get(url, headers=..., timeout=...)，返回带status_code、json()、text的响应；
+        # 默认为requests(第一次请求时才导入)，录制和回放样本时替换为fixtures中的RecordingTransport/ReplayTransport
+        self.transport = transport or RequestsTransport()
+
+    def check_ban(self, player_id):
+        """
+        通过网络接口查询账号的封禁状态，出错时按查询失败处理
+        返回: (是否封禁, 是否查询成功, 玩家等级, account_id)
+        """
+        if not player_id:
+            return False, False, 0, None
+
+        try:
+            return self.query_ban(player_id)
+        except Exception as e:
+            log.warning("查询封禁状态出错: %s", e, extra={"sample": "ban_error"})
+            return False, False, 0, None
+
+    def query_ban(self, player_id):
+        """
+        独立的API查询函数，以便于未来更换API时只需修改此函数
+        返回: (是否封禁, 是否查询成功, 玩家等级, account_id)
+        """
+        url = f"https://apiv1.pubg.plus/steam/player/banv2?player_id={player_id}"
+        log.debug("正在请求API: %s", url)
+        try:
+            response = self.transport.get(url, headers=self.HEADERS, timeout=self.timeout)
+            log.debug("玩家 %s 封禁API响应状态码: %s", player_id, response.status_code)
+
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                    if payload_log.isEnabledFor(logging.DEBUG):
+                        # 比赛列表很长，只记录数量
+                        data_debug = data
+                        if "player" in data and "matches" in data:
+                            data_debug = data.copy()
+                            data_debug["matches"] = f"[{len(data['matches'])} matches]"
+                        payload_log.debug("API返回数据: %s", data_debug)
+
+                    # 初始化等级为0和account_id为None
+                    player_level = 0
+                    account_id = None
+
+                    # 获取API返回的account_id
+                    if "player" in data and "id" in data["player"]:
+                        account_id = data["player"]["id"]
+                        log.debug("从API获取到account_id: %s", account_id)
+
+                    # 如果有player信息，计算等级
+                    if "player" in data and "tier" in data["player"] and "level" in data["player"]:
+                        tier = data["player"]["tier"]
+                        level = data["player"]["level"]
+                        # 根据规则计算等级: (tier-1)*500+level
+                        player_level = (tier - 1) * 500 + level
+                        log.debug("玩家等级信息: tier=%s, level=%s, 计算后等级=%s", tier, level, player_level)
+
+                    if "ban" in data and "banType" in data["ban"]:
+                        # 检查封禁状态: TemporaryBan表示封禁，Innocent表示未封禁
+                        ban_type = data["ban"]["banType"]
+                        is_banned = ban_type == "TemporaryBan"
+                        log.debug("账号 %s 查询结果: ban_type=%s, %s", player_id, ban_type, "已封禁" if is_banned else "未封禁")
+                        return is_banned, True, player_level, account_id
+                    else:
+                        log.warning("API返回数据格式错误，缺少预期字段: %s", data, extra={"sample": "ban_format"})
+                except Exception as e:
+                    # 只记录前500个字符
+                    log.warning("解析API响应JSON出错: %s，原始响应内容: %.500s", e, response.text,
+                                extra={"sample": "ban_format"})
+            else:
+                log.warning("玩家 %s 封禁API请求失败，状态码: %s，响应内容: %.500s",
+                            player_id, response.status_code, response.text, extra={"sample": "ban_http"})
+        except Exception as e:
+            # 异常堆栈只在DEBUG级别记录
+            log.warning("玩家 %s 封禁API请求异常: %s", player_id, e, extra={"sample": "ban_error"},
+                        exc_info=log.isEnabledFor(logging.DEBUG))
+
+        return False, False, 0, None
+
+    def query_rank(self, account_id, season_num):
+        """
+        查询账号的段位信息
+        account_id: 账号的account_id
+        season_num: 赛季编号
+        返回: (是否成功, tpp段位信息, fpp段位信息)
+            段位信息格式为字典: {"tier": 段位名称, "subTier": 子段位, "rankPoint": 分数}
+            如: {"tier": "Gold", "subTier": "4", "rankPoint": 2165}
+        """
+        if not account_id:
+            log.debug("账号没有account_id，无法查询段位")
+            return False, None, None
+
+        # 构建season参数字符串
+        season = f"division.bro.official.pc-2018-{season_num}"
+        url = f"https://apiv1.pubg.plus/steam/player/season_r?acc_id={account_id}&season={season}"
+        log.debug("正在请求段位API: %s", url)
+
+        try:
+            response = self.transport.get(url, headers=self.HEADERS, timeout=self.timeout)
+            log.debug("%s 段位API响应状态码: %s", account_id, response.status_code)
+
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                    payload_log.debug("段位API返回数据: %s", data)
+
+                    # 初始化返回值
+                    tpp_rank = None
+                    fpp_rank = None
+
+                    if "attributes" in data and "rankedGameModeStats" in data["attributes"]:
+                        stats = data["attributes"]["rankedGameModeStats"]
+
+                        # 获取TPP段位信息
+                        if "squad" in stats:
+                            squad_data = stats["squad"]
+                            if "currentTier" in squad_data and "currentRankPoint" in squad_data:
+                                current_tier = squad_data["currentTier"]
+                                rank_point = squad_data["currentRankPoint"]
+
+                                tpp_rank = {
+                                    "tier": current_tier["tier"],
+                                    "subTier": current_tier["subTier"],
+                                    "rankPoint": rank_point
+                                }
+                                log.debug("获取到TPP段位: %s", tpp_rank)
+
+                        # 获取FPP段位信息
+                        if "squad-fpp" in stats:
+                            fpp_data = stats["squad-fpp"]
+                            if "currentTier" in fpp_data and "currentRankPoint" in fpp_data:
+                                current_tier = fpp_data["currentTier"]
+                                rank_point = fpp_data["currentRankPoint"]
+
+                                fpp_rank = {
+                                    "tier": current_tier["tier"],
+                                    "subTier": current_tier["subTier"],
+                                    "rankPoint": rank_point
+                                }
+                                log.debug("获取到FPP段位: %s", fpp_rank)
+
+                    return True, tpp_rank, fpp_rank
+                except Exception as e:
+                    # 只记录前500个字符
+                    log.warning("解析段位API响应JSON出错: %s，原始响应内容: %.500s", e, response.text,
+                                extra={"sample": "rank_format"})
+            else:
+                log.warning("%s 段位API请求失败，状态码: %s，响应内容: %.500s",
+                            account_id, response.status_code, response.text, extra={"sample": "rank_http"})
+        except Exception as e:
+            # 异常堆栈只在DEBUG级别记录
+            log.warning("%s 段位API请求异常: %s", account_id, e, extra={"sample": "rank_error"},
+                        exc_info=log.isEnabledFor(logging.DEBUG))
+
+        return False, None, None
@@ -0,0 +1,305 @@
+"""
+段位历史：每个账号每个赛季的段位和分数随时间的变化，只追加不修改
+保存在数据文件旁的.ranks文件中，格式为文件头b"RKH1"加连续的记录，记录的每个字段都是变长整数(varint)，
+第一个字段为记录类型：
+    SERIES  赛季, uid长度, uid的每个字节(UTF-8)                定义一个序列(账号+赛季)，按出现顺序编号
+    POINT   序列编号, 时间, TPP段位, TPP分数, FPP段位, FPP分数   序列中的一个点
+整个文件(文件头之后)是一串变长整数，读取时先一次解码全部整数，再按记录类型分配到各序列
+点的各字段都是与同一序列上一个点的差(第一个点与0的差)，用zigzag编码为非负数；时间为秒级时间戳，
+段位为RANK_OPTIONS中的位置。只有段位或分数变化时才追加点，一个点通常在10字节以内，
+几千个账号一个赛季的历史只有几MB
+
+读取时整个文件按序列解码为列(时间、段位、分数各一个数组)，时间列有序，范围查询用二分查找；
+第一次使用时才读取文件，界面在后台线程中提前读取，读取期间查询不等待
+"""
+
+import array
+import bisect
+import os
+import threading
+
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+MAGIC = b"RKH1"
+
+# 记录类型
+SERIES = 1
+POINT = 2
+
+
+def zigzag(value):
+    """有符号整数 -> 非负整数(0, -1, 1, -2 -> 0, 1, 2, 3)"""
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def write_varint(buffer, value):
+    """把非负整数按每字节7位、低位在前写入bytearray"""
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varints(data, offset=0):
+    """解码data[offset:]中的全部变长整数，末尾不完整的整数被忽略"""
+    values = []
+    append = values.append
+    value = 0
+    shift = 0
+    for byte in memoryview(data)[offset:]:
+        if byte < 0x80:
+            append(value | (byte << shift))
+            value = 0
+            shift = 0
+        else:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+    return values
+
+
+def varint_offset(data, offset, count):
+    """data[offset:]中前count个变长整数结束的位置"""
+    position = offset
+    while count and position < len(data):
+        if data[position] < 0x80:
+            count -= 1
+        position += 1
+    return position
+
+
+class RankSeries:
+    """一个账号一个赛季的段位历史，按时间顺序的五列"""
+
+    __slots__ = ("uid", "season", "times", "tpp_tier", "tpp_points", "fpp_tier", "fpp_points")
+
+    def __init__(self, uid, season):
+        self.uid = uid
+        self.season = season
+        self.times = array.array("q")
+        self.tpp_tier = array.array("b")
+        self.tpp_points = array.array("l")
+        self.fpp_tier = array.array("b")
+        self.fpp_points = array.array("l")
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, point):
+        self.times.append(point[0])
+        self.tpp_tier.append(point[1])
+        self.tpp_points.append(point[2])
+        self.fpp_tier.append(point[3])
+        self.fpp_points.append(point[4])
+
+    def copy(self):
+        series = RankSeries(self.uid, self.season)
+        for column in RankSeries.__slots__[2:]:
+            setattr(series, column, array.array(getattr(self, column).typecode, getattr(self, column)))
+        return series
+
+    def point(self, position):
+        """(时间, TPP段位, TPP分数, FPP段位, FPP分数)"""
+        return (self.times[position], self.tpp_tier[position], self.tpp_points[position],
+                self.fpp_tier[position], self.fpp_points[position])
+
+    def last(self):
+        """最后一个点，没有点时返回None"""
+        return self.point(len(self.times) - 1) if self.times else None
+
+    def range(self, start=None, end=None):
+        """时间在[start, end]之间的点，start/end为None时不限制"""
+        low = 0 if start is None else bisect.bisect_left(self.times, start)
+        high = len(self.times) if end is None else bisect.bisect_right(self.times, end)
+        return [self.point(position) for position in range(low, high)]
+
+
+class RankHistory:
+    """
+    段位历史存储(线程安全)
+    刷新中每个账号查询到段位后调用record，变化的点先放在内存中，flush时一次追加到文件
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._loading = None  # 正在读取文件时为threading.Event，读取完成后set
+        self._series = []  # 序列编号 -> RankSeries
+        self._index = {}  # (uid, 赛季) -> 序列编号
+        self._pending = bytearray()  # 还没写入文件的记录
+        self._valid_size = None  # 文件末尾有不完整的记录时，有效部分的长度
+
+    def load(self):
+        """
+        读取文件，只在第一次调用时读取；记录时会自动调用，也可以提前在后台线程中调用
+        解析时不持有锁，解析完成后才替换进来；其他线程同时调用时等待这次读取完成
+        """
+        with self._lock:
+            if self._loaded:
+                return
+            loading = self._loading
+            owner = loading is None
+            if owner:
+                loading = self._loading = threading.Event()
+        if not owner:
+            loading.wait()
+            return
+        try:
+            series, index, valid_size = self._read()
+            with self._lock:
+                self._series, self._index, self._valid_size = series, index, valid_size
+                self._loaded = True
+        finally:
+            with self._lock:
+                self._loading = None
+            loading.set()
+
+    @property
+    def loading(self):
+        """是否正在其他线程中读取文件"""
+        with self._lock:
+            return self._loading is not None
+
+    def _read(self):
+        """读取并解析文件，不修改self，返回(序列列表, 索引, 有效部分的长度)"""
+        series, index = [], {}
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return series, index, None
+        except OSError as e:
+            log.warning("读取段位历史失败: %s", e)
+            return series, index, None
+        if not data.startswith(MAGIC):
+            log.warning("段位历史文件格式不正确，将重新开始记录: %s", self.path)
+            return series, index, 0
+        values = read_varints(data, len(MAGIC))
+        used = self._decode(values, series, index)
+        valid_size = None
+        if used < len(values) or data[-1] >= 0x80:
+            # 程序异常退出时最后一条记录可能不完整，下次写入前截掉
+            valid_size = varint_offset(data, len(MAGIC), used)
+            log.warning("段位历史末尾有 %d 字节不完整的记录，已忽略", len(data) - valid_size)
+        log.info("已加载段位历史: %d 个序列，%d 个点", len(series), sum(len(s) for s in series))
+        return series, index, valid_size
+
+    @staticmethod
+    def _decode(values, series_list, index):
+        """
+        把整数序列分配到series_list和index中的各序列，
+        返回已使用的整数个数(不完整或无法识别的记录及之后的部分不使用)
+        """
+        size = len(values)
+        position = 0
+        states = [series.last() or (0, 0, 0, 0, 0) for series in series_list]
+        while position < size:
+            kind = values[position]
+            if kind == POINT:
+                if position + 7 > size:
+                    return position
+                number = values[position + 1]
+                if number >= len(states):
+                    log.warning("段位历史中引用了不存在的序列，之后的内容被忽略")
+                    return position
+                last = states[number]
+                point = tuple(base + unzigzag(delta) for base, delta in zip(last, values[position + 2:position + 7]))
+                series_list[number].append(point)
+                states[number] = point
+                position += 7
+            elif kind == SERIES:
+                if position + 3 > size or position + 3 + values[position + 2] > size:
+                    return position
+                season, length = values[position + 1], values[position + 2]
+                try:
+                    uid = bytes(values[position + 3:position + 3 + length]).decode("utf-8")
+                except (ValueError, UnicodeDecodeError):
+                    log.warning("段位历史中的账号标识无法解码，之后的内容被忽略")
+                    return position
+                index[(uid, season)] = len(series_list)
+                series_list.append(RankSeries(uid, season))
+                states.append((0, 0, 0, 0, 0))
+                position += 3 + length
+            else:
+                log.warning("段位历史中有未知的记录类型 %d，之后的内容被忽略", kind)
+                return position
+        return position
+
+    def record(self, uid, season, timestamp, tpp_tier, tpp_points, fpp_tier, fpp_points):
+        """
+        记录一次查询到的段位，与该序列最后一个点的段位和分数都相同时不记录
+        返回: 是否追加了新的点
+        """
+        self.load()
+        with self._lock:
+            key = (uid, season)
+            number = self._index.get(key)
+            if number is None:
+                number = self._index[key] = len(self._series)
+                self._series.append(RankSeries(uid, season))
+                encoded = uid.encode("utf-8")
+                write_varint(self._pending, SERIES)
+                write_varint(self._pending, season)
+                write_varint(self._pending, len(encoded))
+                for byte in encoded:
+                    write_varint(self._pending, byte)
+            series = self._series[number]
+            point = (int(timestamp), tpp_tier, tpp_points, fpp_tier, fpp_points)
+            previous = series.last()
+            if previous is not None and previous[1:] == point[1:]:
+                return False
+            series.append(point)
+            write_varint(self._pending, POINT)
+            write_varint(self._pending, number)
+            for value, base in zip(point, previous or (0, 0, 0, 0, 0)):
+                write_varint(self._pending, zigzag(value - base))
+            return True
+
+    def flush(self):
+        """把新记录追加到文件(失败时抛出异常，记录留在内存中下次再写)"""
+        with self._lock:
+            if not self._pending:
+                return
+            if self._valid_size is not None and os.path.exists(self.path):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(self._valid_size)
+            with open(self.path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(MAGIC)
+                f.write(self._pending)
+            self._valid_size = None
+            self._pending = bytearray()
+
+    def series(self, uid, season):
+        """
+        账号在该赛季的历史(副本，之后追加的点不会出现在其中)，没有记录时返回None
+        其他线程正在读取文件时不等待，同样返回None(可以先检查loading)
+        """
+        if not self._ensure_loaded():
+            return None
+        with self._lock:
+            number = self._index.get((uid, season))
+            return None if number is None else self._series[number].copy()
+
+    def seasons(self, uid):
+        """账号有历史记录的赛季，从小到大；其他线程正在读取文件时返回空列表"""
+        if not self._ensure_loaded():
+            return []
+        with self._lock:
+            return sorted(season for key_uid, season in self._index if key_uid == uid)
+
+    def _ensure_loaded(self):
+        """还没读取时在当前线程读取；其他线程正在读取时不等待，返回False"""
+        with self._lock:
+            if self._loaded:
+                return True
+            if self._loading is not None:
+                return False
+        self.load()
+        return True
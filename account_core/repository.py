@@ -0,0 +1,184 @@
+import json
+import os
+import sys
+import threading
+import uuid
+
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+
+def default_data_file():
+    """默认的数据文件路径：打包后为exe所在目录，开发环境为项目目录"""
+    if getattr(sys, 'frozen', False):
+        # 打包后，使用exe所在目录而不是临时目录
+        return os.path.join(os.path.dirname(sys.executable), "accounts.json")
+    # 开发环境，使用项目目录
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "accounts.json")
+
+
+def apply_defaults(account):
+    """补全账号缺少的字段"""
+    if "level" not in account:
+        account["level"] = 0
+    if "account_id" not in account:
+        account["account_id"] = ""
+    # 确保有rank分数字段
+    if "tpp_rank_point" not in account:
+        account["tpp_rank_point"] = 0
+    if "fpp_rank_point" not in account:
+        account["fpp_rank_point"] = 0
+    # 确保有段位字段
+    if "tpp_rank" not in account:
+        account["tpp_rank"] = "未定级"
+    if "fpp_rank" not in account:
+        account["fpp_rank"] = "未定级"
+    return account
+
+
+class AccountRepository:
+    """
+    账号数据的文件读写
+    完整数据保存在数据文件中；单个账号的修改先追加到同目录下的增量日志，
+    完整保存时合并进数据文件并清空日志
+    """
+
+    def __init__(self, data_file, journal_compact_threshold=1000):
+        self.data_file = data_file
+        # 增量日志文件：单个账号的新增、修改、移动和删除先追加到这里，完整保存时合并进数据文件
+        self.journal_file = data_file + ".journal"
+        # 刷新进度检查点文件：刷新中途关闭或崩溃后，下次从这里继续
+        self.checkpoint_file = data_file + ".sweep"
+        # 单实例锁文件：修改数据的进程持有它
+        self.lock_file = data_file + ".lock"
+        # 进程间命令的连接信息：持有锁的实例在这里写入端口，后启动的实例把命令转发过去
+        self.endpoint_file = data_file + ".ipc"
+        # 滚动日志文件
+        self.log_file = data_file + ".log"
+        # 段位历史(只追加的二进制文件，见rank_history.py)
+        self.rank_history_file = data_file + ".ranks"
+        # 运行状态(如各类刷新上次完成的时间)，用于决定启动时是否需要刷新
+        self.state_file = data_file + ".state"
+        self.journal_entries = 0  # 增量日志中的记录数
+        self.journal_compact_threshold = journal_compact_threshold  # 记录数超过该值时执行一次完整保存
+        self.base_needs_rewrite = False  # 数据文件缺少唯一标识或顺序键时，下次保存必须完整写入
+        self.lock = threading.RLock()  # 完整保存与增量写入互斥，可重入以便调用方在持锁时读取快照
+
+    def exists(self):
+        """数据文件或增量日志是否存在"""
+        return os.path.exists(self.data_file) or os.path.exists(self.journal_file)
+
+    def load(self):
+        """
+        读取数据文件并应用增量日志，补全缺少的字段
+        返回: 账号列表
+        """
+        accounts = []
+        if os.path.exists(self.data_file):
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                accounts = json.load(f)
+
+        # 应用上次完整保存之后的增量修改
+        accounts = self.replay_journal(accounts)
+        log.info("已加载 %d 个账号", len(accounts))
+
+        # 确保每个账号都有必要的字段
+        seen_uids = set()
+        for position, account in enumerate(accounts):
+            # 唯一标识，作为Treeview的行ID（重复时重新生成）
+            if not account.get("uid") or account["uid"] in seen_uids:
+                account["uid"] = uuid.uuid4().hex
+                self.base_needs_rewrite = True
+            seen_uids.add(account["uid"])
+            # 顺序键，未排序时按它从小到大显示（旧数据按文件中的位置生成）
+            if not isinstance(account.get("order"), (int, float)):
+                account["order"] = float(position)
+                self.base_needs_rewrite = True
+            apply_defaults(account)
+        return accounts
+
+    def replay_journal(self, accounts):
+        """将增量日志中的修改应用到已加载的账号数据，返回合并后的账号列表"""
+        self.journal_entries = 0
+        if not os.path.exists(self.journal_file):
+            return accounts
+
+        # 按唯一标识合并，保持原有顺序，新增的账号追加到末尾
+        records = {}
+        legacy = []  # 没有唯一标识的旧数据不会出现在日志中
+        for account in accounts:
+            if account.get("uid"):
+                records[account["uid"]] = account
+            else:
+                legacy.append(account)
+
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 程序异常退出时最后一行可能不完整，忽略即可
+                    log.warning("增量日志中有无法解析的记录，已忽略: %s", line[:100])
+                    continue
+                if entry.get("op") == "put":
+                    record = entry["record"]
+                    records[record["uid"]] = record
+                elif entry.get("op") == "delete":
+                    records.pop(entry.get("uid"), None)
+                self.journal_entries += 1
+
+        log.info("已应用增量日志中的 %d 条修改", self.journal_entries)
+        return legacy + list(records.values())
+
+    def save_all(self, records):
+        """完整保存账号数据（失败时抛出异常）"""
+        # 确保目录存在
+        directory = os.path.dirname(self.data_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self.lock:
+            # 先写临时文件再替换，避免写到一半时退出导致数据文件损坏
+            temp_file = self.data_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(list(records), f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.data_file)
+
+            # 完整数据已写入，增量日志可以清空
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self.journal_entries = 0
+            self.base_needs_rewrite = False
+        log.info("数据已成功保存到: %s", self.data_file)
+
+    def load_state(self):
+        """读取运行状态，文件不存在或损坏时返回空字典"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def save_state(self, state):
+        """写入运行状态(先写临时文件再替换，失败时抛出异常)"""
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_file, self.state_file)
+
+    def needs_full_save(self):
+        """增量日志过长或数据文件需要迁移时，应改为完整保存"""
+        return self.base_needs_rewrite or self.journal_entries >= self.journal_compact_threshold
+
+    def append(self, *entries):
+        """向增量日志追加记录（失败时抛出异常）"""
+        with self.lock:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.journal_entries += len(entries)
@@ -0,0 +1,445 @@
+import datetime
+import operator
+import re
+import threading
+import time
+
+
+class AccountSearchIndex:
+    """
+    账号搜索索引
+    对名称、ARS、ID、account_id、备注建立三元组(trigram)倒排索引，
+    并支持 status:banned、tier>=钻石5、unban<6h 这类结构化过滤条件
+    """
+
+    # 参与全文搜索的字段
+    SEARCH_FIELDS = ("name", "phone", "id", "account_id", "note")
+
+    # 结构化过滤条件: 字段 + 运算符 + 值
+    FILTER_PATTERN = re.compile(r"^(status|tier|tpp|fpp|level|unban)(>=|<=|:|=|>|<)(.+)$", re.IGNORECASE)
+
+    # 状态过滤的可选值
+    STATUS_VALUES = {
+        "banned": "banned", "ban": "banned", "封禁": "banned",
+        "normal": "normal", "ok": "normal", "unbanned": "normal", "正常": "normal",
+        "extended": "extended", "追封": "extended",
+    }
+
+    # 比较运算符
+    OPERATORS = {
+        ">=": operator.ge, "<=": operator.le, ">": operator.gt, "<": operator.lt, "=": operator.eq,
+    }
+
+    # 时长单位换算为秒
+    DURATION_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+    def __init__(self, rank_map):
+        # 段位名称 -> 排序值，用于 tier 过滤
+        self.rank_map = rank_map
+        # key -> 账号对象 (key为账号的唯一标识uid)
+        self._accounts = {}
+        # key -> 小写拼接后的搜索文本
+        self._texts = {}
+        # trigram -> 包含该trigram的key集合
+        self._grams = {}
+        # key -> 结构化过滤用的预计算字段 (封禁, 追封, TPP段位值, FPP段位值, 等级, 解封时间戳, 解封时间原文)
+        self._facets = {}
+        # 上一次查询的缓存，用于逐字输入时在上次结果上继续筛选
+        self._last_query = None
+        self._last_keys = None
+        # 倒排表是否已建立；defer之后、install之前只记录账号，查询时逐个账号匹配
+        self._ready = True
+        # 每次defer加1，丢弃按更早的账号列表建立的结果
+        self._generation = 0
+
+    def rebuild(self, accounts):
+        """根据账号列表重建整个索引"""
+        self.defer(accounts)
+        self.install(self.build(accounts))
+
+    def defer(self, accounts):
+        """
+        只记录账号列表，推迟建立倒排表(账号很多时建立倒排表比读取数据文件还慢)
+        之后用build在后台线程中建立、在使用索引的线程中install；在此之前查询按子串逐个账号匹配，结果相同
+        """
+        self._accounts = {account["uid"]: account for account in accounts}
+        self._texts = {}
+        self._grams = {}
+        self._facets = {}
+        self._ready = False
+        self._generation += 1
+        self._invalidate()
+
+    @property
+    def ready(self):
+        """倒排表是否已建立"""
+        return self._ready
+
+    def build(self, accounts):
+        """
+        为账号列表建立倒排表，不修改索引本身，可以在后台线程中执行
+        accounts: 建立时的账号快照(不能是会被其他线程修改的列表)
+        返回: 交给install的结果
+        """
+        generation = self._generation
+        texts = {}
+        grams = {}
+        facets = {}
+        indexed = {}
+        for account in accounts:
+            key = account["uid"]
+            text = self._build_text(account)
+            indexed[key] = account
+            texts[key] = text
+            facets[key] = self._build_facets(account, None)
+            for gram in self._trigrams(text):
+                grams.setdefault(gram, set()).add(key)
+        return generation, indexed, texts, grams, facets
+
+    def install(self, built):
+        """
+        使用build的结果(在使用索引的线程中调用)，并补上建立期间新增、修改和删除的账号
+        返回: 是否已使用；期间重新加载过账号或已经建立过时忽略并返回False
+        """
+        generation, indexed, texts, grams, facets = built
+        if self._ready or generation != self._generation:
+            return False
+        current = self._accounts
+        self._accounts, self._texts, self._grams, self._facets = indexed, texts, grams, facets
+        self._ready = True
+        for key in [key for key in indexed if key not in current]:
+            self.remove(indexed[key])
+        for key, account in current.items():
+            if indexed.get(key) is not account:
+                self.update(account)
+        self._invalidate()
+        return True
+
+    def add(self, account):
+        """将账号加入索引"""
+        key = account["uid"]
+        if not self._ready:
+            self._accounts[key] = account
+            self._invalidate()
+            return
+        if key in self._accounts:
+            self.update(account)
+            return
+        text = self._build_text(account)
+        self._accounts[key] = account
+        self._texts[key] = text
+        self._facets[key] = self._build_facets(account, None)
+        for gram in self._trigrams(text):
+            self._grams.setdefault(gram, set()).add(key)
+        self._invalidate()
+
+    def remove(self, account):
+        """将账号从索引中移除"""
+        key = account["uid"]
+        if key not in self._accounts:
+            return
+        if not self._ready:
+            del self._accounts[key]
+            self._invalidate()
+            return
+        for gram in self._trigrams(self._texts[key]):
+            postings = self._grams.get(gram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._grams[gram]
+        del self._accounts[key]
+        del self._texts[key]
+        del self._facets[key]
+        self._invalidate()
+
+    def update(self, account):
+        """账号字段被原地修改后调用，只在搜索文本变化时更新倒排表"""
+        key = account["uid"]
+        if key not in self._accounts or not self._ready:
+            self.add(account)
+            return
+        facets = self._build_facets(account, self._facets[key])
+        if facets != self._facets[key]:
+            self._facets[key] = facets
+            self._invalidate()
+        old_text = self._texts[key]
+        new_text = self._build_text(account)
+        # 写时复制时同一uid会对应新的账号对象
+        self._accounts[key] = account
+        if old_text == new_text:
+            return
+        old_grams = self._trigrams(old_text)
+        new_grams = self._trigrams(new_text)
+        for gram in old_grams - new_grams:
+            postings = self._grams.get(gram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._grams[gram]
+        for gram in new_grams - old_grams:
+            self._grams.setdefault(gram, set()).add(key)
+        self._texts[key] = new_text
+        self._invalidate()
+
+    def sync(self, accounts):
+        """批量同步(如后台检查结束后)，只有文本变化的账号才会重新建索引"""
+        for account in accounts:
+            self.update(account)
+
+    def filter_accounts(self, query, accounts):
+        """
+        按查询条件过滤账号列表，保持传入列表的顺序
+        query为空时原样返回
+        """
+        query = (query or "").strip()
+        if not query:
+            return accounts
+        keys = self.search(query)
+        return [account for account in accounts if account["uid"] in keys]
+
+    def search(self, query):
+        """执行查询，返回匹配账号的key集合"""
+        terms, filters = self.parse_query(query)
+
+        # 如果只是在上次查询的文本后继续输入，直接在上次结果中筛选；
+        # unban条件与当前时间有关，上次结果中没有的账号现在可能已满足，不能复用
+        candidates = None
+        if self._last_query is not None and not self._time_relative(filters):
+            last_terms, last_filters = self._last_query
+            if (last_filters == filters and len(terms) >= len(last_terms)
+                    and all(old in new for old, new in zip(last_terms, terms))):
+                candidates = self._last_keys
+
+        if not self._ready:
+            # 倒排表还没有建立，逐个账号匹配
+            candidates = self._scan(terms, candidates)
+        else:
+            for term in terms:
+                candidates = self._match_term(term, candidates)
+                if not candidates:
+                    break
+
+        if candidates is None:
+            candidates = set(self._accounts)
+
+        if filters and candidates:
+            facets = self._facets if self._ready else {
+                key: self._build_facets(self._accounts[key], None) for key in candidates}
+            for predicate in self._compile_filters(filters, time.time()):
+                candidates = {key for key in candidates if predicate(facets[key])}
+                if not candidates:
+                    break
+
+        self._last_query = (terms, filters)
+        self._last_keys = candidates
+        return candidates
+
+    def time_relative(self, query):
+        """查询结果是否与当前时间有关(含unban条件)，账号数据不变时结果也可能变化"""
+        _, filters = self.parse_query(query or "")
+        return self._time_relative(filters)
+
+    @staticmethod
+    def _time_relative(filters):
+        return any(field == "unban" for field, _, _ in filters)
+
+    def parse_query(self, query):
+        """
+        解析查询字符串
+        返回: (全文搜索词列表, 结构化过滤条件列表)
+        无法解析的过滤条件按普通搜索词处理
+        """
+        terms = []
+        filters = []
+        for token in query.split():
+            parsed = self._parse_filter(token)
+            if parsed:
+                filters.append(parsed)
+            else:
+                terms.append(token.lower())
+        return terms, filters
+
+    def _parse_filter(self, token):
+        """解析单个过滤条件，返回(字段, 运算符, 值)或None"""
+        match = self.FILTER_PATTERN.match(token)
+        if not match:
+            return None
+        field = match.group(1).lower()
+        op = match.group(2)
+        raw_value = match.group(3)
+
+        if field == "status":
+            value = self.STATUS_VALUES.get(raw_value.lower())
+            if value is None or op not in (":", "="):
+                return None
+            return field, "=", value
+
+        if op == ":":
+            op = "="
+
+        if field in ("tier", "tpp", "fpp"):
+            if raw_value not in self.rank_map:
+                return None
+            return field, op, self.rank_map[raw_value]
+
+        if field == "level":
+            try:
+                return field, op, int(raw_value)
+            except ValueError:
+                return None
+
+        if field == "unban":
+            unit = raw_value[-1:].lower()
+            if unit in self.DURATION_UNITS:
+                number = raw_value[:-1]
+            else:
+                # 未写单位时默认为小时
+                unit = "h"
+                number = raw_value
+            try:
+                seconds = float(number) * self.DURATION_UNITS[unit]
+            except ValueError:
+                return None
+            return field, op, seconds
+
+        return None
+
+    def _match_term(self, term, candidates):
+        """匹配单个搜索词，candidates为None时表示全部账号"""
+        grams = self._trigrams(term)
+        if grams:
+            # 从最短的倒排表开始求交集
+            postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+            keys = set(postings[0])
+            for other in postings[1:]:
+                keys &= other
+                if not keys:
+                    return keys
+            if candidates is not None:
+                keys &= candidates
+        else:
+            # 少于3个字符的搜索词无法使用trigram，直接扫描
+            keys = candidates if candidates is not None else self._texts.keys()
+        # 最终校验子串，排除trigram误命中
+        return {key for key in keys if term in self._texts[key]}
+
+    def _scan(self, terms, candidates):
+        """不使用倒排表，逐个账号检查是否包含全部搜索词；candidates为None时表示全部账号"""
+        if not terms:
+            return candidates
+        keys = candidates if candidates is not None else self._accounts.keys()
+        matched = set()
+        for key in keys:
+            text = self._build_text(self._accounts[key])
+            if all(term in text for term in terms):
+                matched.add(key)
+        return matched
+
+    def _compile_filters(self, filters, now):
+        """将过滤条件编译为作用于预计算字段的判断函数"""
+        predicates = []
+        for field, op, value in filters:
+            compare = self.OPERATORS[op]
+            if field == "status":
+                if value == "banned":
+                    predicates.append(lambda f: f[0])
+                elif value == "normal":
+                    predicates.append(lambda f: not f[0])
+                else:
+                    predicates.append(lambda f: f[1])
+            elif field == "tpp":
+                predicates.append(lambda f, c=compare, v=value: c(f[2], v))
+            elif field == "fpp":
+                predicates.append(lambda f, c=compare, v=value: c(f[3], v))
+            elif field == "tier":
+                # TPP或FPP任一模式满足即可
+                predicates.append(lambda f, c=compare, v=value: c(f[2], v) or c(f[3], v))
+            elif field == "level":
+                predicates.append(lambda f, c=compare, v=value: c(f[4], v))
+            elif field == "unban":
+                # 只有封禁中且解封时间有效的账号参与比较
+                predicates.append(lambda f, c=compare, v=value:
+                                  f[0] and f[5] is not None and c(f[5] - now, v))
+        return predicates
+
+    def _build_facets(self, account, old_facets):
+        """计算结构化过滤用的字段，解封时间未变化时复用上次的解析结果"""
+        banned = bool(account.get("status"))
+        unban_time = account.get("unban_time") or ""
+        if old_facets is not None and old_facets[6] == unban_time:
+            unban_ts = old_facets[5]
+        else:
+            unban_ts = None
+            if unban_time:
+                try:
+                    unban_ts = datetime.datetime.strptime(unban_time, "%Y-%m-%d %H:%M:%S").timestamp()
+                except ValueError:
+                    pass
+        try:
+            level = int(account.get("level", 0) or 0)
+        except (TypeError, ValueError):
+            level = 0
+        return (
+            banned,
+            account.get("extended_ban") == "追3天",
+            self.rank_map.get(account.get("tpp_rank", "未定级"), 0),
+            self.rank_map.get(account.get("fpp_rank", "未定级"), 0),
+            level,
+            unban_ts,
+            unban_time,
+        )
+
+    def _build_text(self, account):
+        """拼接参与搜索的字段，使用\\x00分隔避免跨字段匹配"""
+        return "\x00".join(str(account.get(field, "") or "") for field in self.SEARCH_FIELDS).lower()
+
+    @staticmethod
+    def _trigrams(text):
+        """提取文本中的所有trigram(不包含字段分隔符)"""
+        return {text[i:i + 3] for i in range(len(text) - 2) if "\x00" not in text[i:i + 3]}
+
+    def _invalidate(self):
+        """索引变化后清空查询缓存"""
+        self._last_query = None
+        self._last_keys = None
+
+
+class SnapshotSearchIndex:
+    """
+    可在多个线程中使用的搜索索引，按账号存储的快照同步
+    写时复制时被修改的账号会换成新对象，按对象是否相同即可找出变化的账号，
+    因此不需要订阅存储的提交；供本机接口、进程间命令等后台线程使用
+    """
+
+    def __init__(self, rank_map):
+        self._index = AccountSearchIndex(rank_map)
+        self._indexed = {}  # uid -> 已加入索引的账号对象
+        self._indexed_version = None
+        self._lock = threading.Lock()
+
+    def filter_accounts(self, snapshot, query):
+        """返回快照中按顺序键排序、符合查询条件的账号"""
+        accounts = sorted(snapshot.records, key=lambda account: account["order"])
+        if not (query or "").strip():
+            return accounts
+        with self._lock:
+            self._sync(snapshot)
+            return self._index.filter_accounts(query, accounts)
+
+    def time_relative(self, query):
+        """查询结果是否与当前时间有关，见AccountSearchIndex.time_relative"""
+        return self._index.time_relative(query)
+
+    def _sync(self, snapshot):
+        """把索引同步到指定快照(调用方持有_lock)"""
+        if snapshot.version == self._indexed_version:
+            return
+        for account in snapshot.records:
+            if self._indexed.get(account["uid"]) is not account:
+                self._index.update(account)
+                self._indexed[account["uid"]] = account
+        if len(self._indexed) != len(snapshot.records):
+            for uid in [uid for uid in self._indexed if snapshot.get(uid) is None]:
+                self._index.remove(self._indexed.pop(uid))
+        self._indexed_version = snapshot.version
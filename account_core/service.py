@@ -0,0 +1,844 @@
+import asyncio
+import datetime
+import json
+import logging
+import uuid
+
+from .checkpoint import SweepCheckpoint
+from .engine import RefreshEngine
+from .logs import get_logger
+from .metrics import MeteredTransport, MetricsRegistry
+from .profiling import Profiler, default_directory
+from .providers import PubgPlusProvider
+from .rank_history import RankHistory
+from .repository import AccountRepository, apply_defaults
+from .search import AccountSearchIndex
+from .store import AccountStore
+
+
+# 段位选项
+RANK_OPTIONS = ["未定级",
+                "青铜5", "青铜4", "青铜3", "青铜2", "青铜1",
+                "白银5", "白银4", "白银3", "白银2", "白银1",
+                "黄金5", "黄金4", "黄金3", "黄金2", "黄金1",
+                "铂金5", "铂金4", "铂金3", "铂金2", "铂金1",
+                "钻石5", "钻石4", "钻石3", "钻石2", "钻石1",
+                "大师"]
+
+# 段位映射值（用于排序）
+RANK_MAP = {rank: i for i, rank in enumerate(RANK_OPTIONS)}
+
+# 默认赛季
+DEFAULT_SEASON = 35
+
+# 封禁查询结果中，这些字段有修改时算作"封禁状态有更新"(等级随封禁查询返回，也计入)
+BAN_FIELDS = ("status", "unban_time", "extended_ban", "level")
+
+log = get_logger(__name__)
+
+# 接口返回的段位名称
+TIER_NAMES = {
+    "Bronze": "青铜",
+    "Silver": "白银",
+    "Gold": "黄金",
+    "Platinum": "铂金",
+    "Diamond": "钻石",
+    "Master": "大师"
+}
+
+
+def rank_fields(rank):
+    """
+    段位查询结果 -> (段位, 分数)，只保存基础段位格式如"黄金4"
+    没有获取到段位时为("未定级", 0)
+    """
+    if not rank:
+        return "未定级", 0
+    return f"{TIER_NAMES.get(rank['tier'], rank['tier'])}{rank['subTier']}", rank["rankPoint"]
+
+
+class AccountService:
+    """
+    账号管理的核心逻辑，不依赖任何界面
+    包括加载保存、封禁状态判断、接口查询和后台刷新；界面或命令行工具通过
+    add_listener注册监听者，接收状态、进度和错误事件:
+        listener(event, data)
+        event为"status"(data: text, clear_after)、"progress"(data: phase, done, total, name)
+        或"error"(data: title, message)；监听者可能在后台线程中被调用
+    """
+
+    def __init__(self, data_file, provider=None, engine=None, clock=None, profiler=None):
+        self.repository = AccountRepository(data_file)
+        # 当前时间(返回datetime)，用于封禁到期判断和查询时间；模拟时替换为虚拟时钟
+        self.clock = clock or datetime.datetime.now
+        # 账号数据：界面线程和后台线程共享同一个存储，读取快照、通过提交修改
+        self.store = AccountStore()
+        self.provider = provider or PubgPlusProvider()
+        # 运行指标：接口请求由包装后的transport记录，刷新各阶段在这里记录
+        self.metrics = MetricsRegistry()
+        if getattr(self.provider, "transport", None) is not None:
+            self.provider.transport = MeteredTransport(self.provider.transport, self.metrics)
+        # 后台刷新引擎：封禁/段位刷新在独立的事件循环线程中执行，可随时停止
+        self.engine = engine or RefreshEngine(concurrency=4, request_timeout=15, min_interval=0.25, sweep_budget=900)
+        # 搜索索引(不是线程安全的，只在使用它的线程中更新)
+        self.search_index = AccountSearchIndex(RANK_MAP)
+        # 段位历史，第一次使用时才读取文件；与账号数据一起保存
+        self.rank_history = RankHistory(self.repository.rank_history_file)
+        # 可选的性能分析，默认不开启
+        self.profiler = profiler or Profiler(directory=default_directory(data_file))
+        self._listeners = []
+
+    @property
+    def accounts(self):
+        """当前的账号快照（只读元组，修改必须通过self.store提交）"""
+        return self.store.snapshot().records
+
+    def add_listener(self, listener):
+        """注册事件监听者"""
+        self._listeners.append(listener)
+
+    def emit(self, event, **data):
+        """通知所有监听者，没有监听者时把状态和错误写入日志"""
+        if not self._listeners and event in ("status", "error"):
+            log.log(logging.ERROR if event == "error" else logging.INFO, "%s", data.get("text") or data.get("message"))
+        for listener in self._listeners:
+            try:
+                listener(event, data)
+            except Exception as e:
+                log.error("事件监听者出错: %s", e)
+
+    def report_status(self, text, clear_after=None):
+        """
+        报告状态文本
+        clear_after: 建议在指定毫秒数后清除
+        """
+        self.emit("status", text=text, clear_after=clear_after)
+
+    def start(self):
+        """启动后台刷新引擎"""
+        self.engine.start()
+
+    def shutdown(self):
+        """停止正在执行的刷新并关闭刷新引擎"""
+        self.engine.shutdown()
+        self.flush_rank_history()
+
+    def load(self):
+        """
+        从文件加载账号数据并发布到账号存储
+        搜索索引的倒排表不在这里建立(账号很多时比读取文件还慢)，界面在后台线程中用build_search_index建立，
+        建立之前的查询逐个账号匹配
+        """
+        with self.profiler.section("load"):
+            accounts = []
+            if self.repository.exists():
+                try:
+                    accounts = self.repository.load()
+                except Exception as e:
+                    log.error("加载账号数据出错: %s", e)
+                    accounts = []
+            self.store.reset(accounts)
+            self.search_index.defer(self.accounts)
+            return len(accounts)
+
+    def build_search_index(self):
+        """
+        为当前快照建立搜索索引的倒排表(可以在后台线程中调用)
+        返回: 交给self.search_index.install的结果，必须在使用索引的线程中安装
+        """
+        with self.profiler.section("build_search_index"):
+            return self.search_index.build(self.accounts)
+
+    def season(self):
+        """当前赛季，从第一个账户读取season字段，没有时为默认值(只读，不修改数据)"""
+        accounts = self.accounts
+        if not accounts:
+            return DEFAULT_SEASON
+        return accounts[0].get("season", DEFAULT_SEASON)
+
+    def ensure_season(self):
+        """
+        第一个账户没有season字段时写入默认值并保存，返回当前赛季
+        会写数据文件，只能在持有单实例锁的进程中调用
+        """
+        accounts = self.accounts
+        if not accounts or "season" in accounts[0]:
+            return self.season()
+        # 没有找到season字段，写入默认值
+        self.store.update(accounts[0]["uid"], {"season": DEFAULT_SEASON})
+        log.info("accounts.json中未找到season字段，写入默认值: %s", DEFAULT_SEASON)
+        self.save_accounts()
+        return DEFAULT_SEASON
+
+    def set_season(self, season_value):
+        """
+        更新游戏赛季并保存到第一个账户中
+        返回: True表示已更新并保存，False表示未修改或保存失败
+        没有账户时抛出ValueError
+        """
+        accounts = self.accounts
+        if not accounts:
+            raise ValueError("没有账户，无法保存赛季值")
+        # 如果与当前值相同，则不操作
+        if accounts[0].get("season") == season_value:
+            return False
+        self.store.update(accounts[0]["uid"], {"season": season_value})
+        return self.save_accounts()
+
+    def query_rank(self, account_id):
+        """按当前赛季查询账号的段位信息，返回值同PubgPlusProvider.query_rank"""
+        return self.provider.query_rank(account_id, self.season())
+
+    def start_sweep(self, sweep, on_done=None):
+        """
+        在刷新引擎中启动一次刷新，已有刷新在执行时返回None
+        sweep: 协程函数 sweep(engine)，如self.full_sweep、self.rank_sweep
+        """
+        sweep = self.profiler.wrap_sweep(getattr(sweep, "__name__", "sweep"), sweep)
+        return self.engine.run_sweep(sweep, on_done=on_done)
+
+    def sweep_for(self, kind):
+        """刷新类型("full"、"bans"、"ranks")对应的协程函数，未知类型返回None"""
+        return {
+            "full": self.full_sweep,
+            "bans": self.ban_sweep,
+            "ranks": self.rank_sweep,
+        }.get(kind)
+
+    def start_refresh(self, kind):
+        """按类型启动一次刷新，返回是否已启动(已有刷新在执行时为False)"""
+        return self.start_sweep(self.sweep_for(kind)) is not None
+
+    def start_account_refresh(self, uid):
+        """在后台刷新单个账号，有修改时追加到增量日志；返回是否已提交"""
+        self.engine.submit(self.refresh_single_account(self.engine, uid))
+        return True
+
+    def find_account(self, key):
+        """按唯一标识或名称查找账号(名称重复时取第一个)，找不到时返回None"""
+        account = self.store.get(key)
+        if account is not None:
+            return account
+        return next((account for account in self.accounts if account.get("name") == key), None)
+
+    def import_accounts(self, path):
+        """
+        从JSON文件(与accounts.json或导出文件格式相同)导入账号
+        uid与现有账号相同时整体替换，否则作为新账号追加到末尾
+        返回: (新增数, 替换数)
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ValueError("文件内容必须是账号对象的列表")
+
+        next_order = max((account["order"] for account in self.accounts), default=-1.0) + 1.0
+        added = replaced = 0
+        imported = []
+        for record in records:
+            record = dict(record)
+            existing = self.store.get(record.get("uid")) if record.get("uid") else None
+            if existing is not None:
+                # 保持原来的显示位置，导出时去掉的密码沿用原值
+                record.setdefault("order", existing["order"])
+                record.setdefault("password", existing.get("password", ""))
+                replaced += 1
+            else:
+                record["uid"] = uuid.uuid4().hex
+                record["order"] = next_order
+                next_order += 1.0
+                added += 1
+            # 只给出部分字段时，其余字段与界面新建账号时一致
+            for field, value in (("name", ""), ("password", ""), ("phone", ""), ("id", ""), ("status", False),
+                                 ("unban_time", ""), ("extended_ban", False), ("note", "")):
+                record.setdefault(field, value)
+            apply_defaults(record)
+            imported.append(self.store.put(record))
+        if imported:
+            self.save_records(imported)
+        log.info("从 %s 导入账号：新增 %d 个，替换 %d 个", path, added, replaced)
+        return added, replaced
+
+    def update_ban_status(self):
+        """检查并更新账号的封禁状态，返回是否有更新"""
+        log.debug("开始检查所有账号的本地封禁时间...")
+        current_time = self.clock()
+
+        # 遍历开始时的快照，期间界面的修改不会影响遍历；所有修改最后一次提交，只发布一个新快照
+        accounts = self.accounts
+        updates = []
+        # 本地封禁已到期的账号 uid -> 名称
+        expired = {}
+        for idx, account in enumerate(accounts):
+            account_name = account.get('name', '未命名')
+            log.debug("正在处理第%d个账号: %s", idx + 1, account_name)
+
+            # 更新状态栏显示当前正在检查的账号
+            self.emit("progress", phase="local", done=idx + 1, total=len(accounts), name=account_name)
+
+            changes = {}
+
+            # 为每个账号初始化追封字段（如果不存在）
+            if "extended_ban" not in account:
+                changes["extended_ban"] = ""
+
+            # 为每个账号初始化account_id字段（如果不存在）
+            if "account_id" not in account:
+                changes["account_id"] = ""
+
+            if changes:
+                updates.append((account["uid"], changes))
+
+            # 首先检查本地封禁时间
+            local_ban_expired = False
+            if account["status"] and account["unban_time"]:
+                log.debug("账号 %s 目前为封禁状态，解封时间: %s", account_name, account["unban_time"])
+                try:
+                    # 检查解封时间是否已过期
+                    unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
+                    if current_time >= unban_time:
+                        log.debug("账号 %s 本地解封时间已过期", account_name)
+                        local_ban_expired = True
+                except Exception as e:
+                    log.warning("处理账号 %s 解封时间时发生异常: %s", account_name, e, extra={"sample": "unban_time"})
+                    # 日期格式无效，标记为过期以重新判断
+                    local_ban_expired = True
+
+            # 基于本地封禁时间判断状态
+            if local_ban_expired:
+                expired[account["uid"]] = account_name
+                # 只有封禁状态仍与读取时一致才提交，避免覆盖界面刚做的修改
+                updates.append((
+                    account["uid"],
+                    {"status": False, "unban_time": "", "extended_ban": ""},
+                    {"status": account["status"], "unban_time": account["unban_time"]}
+                ))
+
+        committed = self.store.commit(updates)
+        # 初始化了account_id字段时也需要保存
+        status_updated = committed.touches("status", "account_id")
+        for change in committed:
+            if change.field == "status":
+                log.info("账号 %s 本地封禁已过期，设为未封禁", expired[change.uid], extra={"sample": "local_unban"})
+
+        log.debug("本地封禁时间检查完毕，状态更新: %s", status_updated)
+        self.record_phase("local", current_time, len(accounts))
+
+        # 如果有状态更新，保存到文件
+        if status_updated:
+            self.save_accounts()
+
+        return status_updated
+
+    async def full_sweep(self, engine):
+        """后台检查：先按本地时间更新封禁状态，再对每个账号依次查询封禁状态和段位"""
+        # 本地检查不涉及网络，直接执行
+        updated_local = self.update_ban_status()
+
+        log.info("本地封禁时间检查完成，开始查询封禁状态和段位信息...")
+        updated_ban, updated_rank = await self.update_accounts_online(engine)
+        return updated_local or updated_ban, updated_rank
+
+    async def local_sweep(self, engine):
+        """只按本地时间更新封禁状态，不在线查询(数据未过期时启动用)"""
+        return self.update_ban_status(), False
+
+    async def rank_sweep(self, engine):
+        """只查询段位"""
+        updated_rank = await self.update_account_ranks(engine)
+        return False, updated_rank
+
+    async def ban_sweep(self, engine):
+        """按本地时间更新封禁状态后只在线查询封禁状态，不查询段位"""
+        updated_local = self.update_ban_status()
+        updated_ban, _ = await self.update_accounts_online(engine, with_ranks=False)
+        return updated_local or updated_ban, False
+
+    def stale_sweep(self, max_age):
+        """
+        返回只刷新过期账号的协程函数（用于定时刷新）
+        max_age: 距上次在线查询超过该秒数的账号才会查询
+        """
+        async def sweep(engine):
+            updated_local = self.update_ban_status()
+            updated_ban, updated_rank = await self.update_accounts_online(
+                engine, accept=lambda account: self.is_stale_cached(account, max_age))
+            return updated_local or updated_ban, updated_rank
+        return sweep
+
+    async def update_accounts_online(self, engine, with_ranks=True, accept=None):
+        """
+        每个账号一个协程，依次执行封禁查询和段位查询：封禁查询返回的account_id直接用于
+        该账号的段位查询，新账号一次刷新即可得到段位。没有拆成封禁、段位两级队列：
+        两级请求共用引擎的并发名额，拆开后同时进行的请求数不会增加；engine.map同时处理
+        多个账号，一个账号的段位查询与其他账号的封禁查询本来就会交错进行，
+        账号的两次查询都结束后才记入检查点
+        with_ranks: 为False时只查询封禁状态
+        accept: 可选的 accept(account)，返回False的账号不查询
+        返回: (封禁状态是否有更新, 段位是否有更新)
+        """
+        # 上次同类刷新未完成时从检查点继续，已完成的账号不再查询
+        checkpoint = SweepCheckpoint(self.repository.checkpoint_file, "online" if with_ranks else "bans",
+                                     clock=self.clock)
+        resumed = checkpoint.resume()
+        if resumed:
+            log.info("继续上次未完成的检查，跳过已完成的 %d 个账号", resumed)
+
+        # 遍历开始时的快照；查询期间界面的修改通过提交时的比较保留
+        targets = []
+        for account in self.accounts:
+            if account["uid"] in checkpoint.done:
+                continue
+            if accept is not None and not accept(account):
+                continue
+            if account.get("account_id") or account.get("id"):
+                targets.append(account)
+            else:
+                log.debug("账号 %s 没有ID，跳过在线查询", account.get("name", "未命名"))
+
+        total = len(targets)
+        progress = {"done": 0, "ban": False, "rank": False, "changed": False}
+
+        # 有修改但还没写入增量日志的账号；没有任何字段变化的账号不需要保存
+        unsaved = set()
+
+        def record_changes(changes):
+            if changes:
+                progress["changed"] = True
+                unsaved.update(changes.uids())
+
+        async def process(account):
+            """返回这个账号的查询是否全部成功(封禁查询，以及with_ranks时的段位查询)"""
+            account_name = account.get('name', '未命名')
+
+            # 第一级：封禁查询，失败时仍用已有的account_id查询段位
+            player_id = account.get("account_id") or account.get("id")
+            ok = False
+            try:
+                result = await engine.call(self.provider.check_ban, player_id)
+                ok = result[1]
+                changes = self.apply_ban_result(account, result)
+                record_changes(changes)
+                if changes.touches(*BAN_FIELDS):
+                    progress["ban"] = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("查询账号 %s 封禁状态出错: %s %s", account_name, type(e).__name__, e,
+                            extra={"sample": "query_error"})
+
+            if not with_ranks:
+                return ok
+
+            # 第二级：读取提交后的账号，封禁查询刚得到的account_id在这里生效
+            latest = self.store.get(account["uid"])
+            if latest is None or not latest.get("account_id"):
+                log.debug("账号 %s 没有account_id，跳过段位查询", account_name)
+                return ok
+            success, tpp_rank, fpp_rank = await engine.call(self.query_rank, latest["account_id"])
+            if success:
+                changes = self.apply_rank_result(latest, tpp_rank, fpp_rank)
+                record_changes(changes)
+                if changes:
+                    progress["rank"] = True
+            return ok and success
+
+        def on_result(account, result, error):
+            progress["done"] += 1
+            # 更新状态栏显示查询进度
+            self.emit("progress", phase="online", done=progress["done"], total=total, name=account.get('name', '未命名'))
+            if error is not None:
+                log.warning("查询账号 %s 段位出错: %s %s", account.get("name", "未命名"), type(error).__name__, error,
+                            extra={"sample": "query_error"})
+            # 出错、超时或被限流(查询不成功)的账号不记入检查点，下次继续时重新查询
+            if error is None and result and checkpoint.mark(account["uid"]):
+                self.save_sweep_progress(checkpoint, unsaved)
+
+        started = self.clock()
+        try:
+            await self.run_checkpointed(engine, process, targets, on_result, checkpoint, unsaved,
+                                        lambda: progress["changed"])
+        finally:
+            self.record_phase("online" if with_ranks else "bans", started, progress["done"])
+        self.record_sweep_finished("online" if with_ranks else "bans")
+        return progress["ban"], progress["rank"]
+
+    async def update_account_ranks(self, engine):
+        """查询并更新所有账号的段位信息（在刷新引擎中并发查询）"""
+        log.info("开始查询所有账号段位信息...")
+
+        # 上次同类刷新未完成时从检查点继续，已完成的账号不再查询
+        checkpoint = SweepCheckpoint(self.repository.checkpoint_file, "ranks", clock=self.clock)
+        resumed = checkpoint.resume()
+        if resumed:
+            log.info("继续上次未完成的段位查询，跳过已完成的 %d 个账号", resumed)
+
+        # 遍历开始时的快照；查询期间界面新增、删除或调整顺序都不影响遍历
+        targets = []
+        for account in self.accounts:
+            if account["uid"] in checkpoint.done:
+                continue
+            if account.get('account_id', ''):
+                targets.append(account)
+            else:
+                log.debug("账号 %s 没有account_id，跳过段位查询", account.get("name", "未命名"))
+
+        total = len(targets)
+        progress = {"done": 0, "updated": False}
+
+        async def query(account):
+            log.debug("正在查询账号 %s 的段位信息...", account.get("name", "未命名"))
+            return await engine.call(self.query_rank, account["account_id"])
+
+        # 已有结果但还没写入增量日志的账号
+        unsaved = set()
+
+        def on_result(account, result, error):
+            account_name = account.get('name', '未命名')
+            progress["done"] += 1
+            # 更新状态栏显示查询进度
+            self.emit("progress", phase="ranks", done=progress["done"], total=total, name=account_name)
+            if error is not None:
+                log.warning("查询账号 %s 段位出错: %s %s", account_name, type(error).__name__, error,
+                            extra={"sample": "query_error"})
+                # 出错的账号不记入检查点，下次继续时重新查询
+                return
+            success, tpp_rank, fpp_rank = result
+            if not success:
+                # 查询失败或被限流，不记入检查点，下次继续时重新查询
+                return
+            if self.apply_rank_result(account, tpp_rank, fpp_rank):
+                progress["updated"] = True
+                unsaved.add(account["uid"])
+            if checkpoint.mark(account["uid"]):
+                self.save_sweep_progress(checkpoint, unsaved)
+
+        started = self.clock()
+        try:
+            await self.run_checkpointed(engine, query, targets, on_result, checkpoint, unsaved,
+                                        lambda: progress["updated"])
+        finally:
+            self.record_phase("ranks", started, progress["done"])
+        self.record_sweep_finished("ranks")
+
+        if progress["updated"]:
+            self.report_status("段位查询完成: 有段位更新", clear_after=3000)
+        else:
+            self.report_status("段位查询完成: 无段位变化", clear_after=3000)
+
+        return progress["updated"]
+
+    async def run_checkpointed(self, engine, worker, targets, on_result, checkpoint, unsaved, changed):
+        """
+        执行带检查点的刷新
+        正常结束时完整保存并删除检查点；被停止、关闭或出错时把已完成的部分
+        写入增量日志并保留检查点，下次同类刷新从这里继续
+        changed: 返回本次刷新是否修改过数据的函数
+        """
+        try:
+            await engine.map(worker, targets, on_result)
+        except BaseException:
+            self.save_sweep_progress(checkpoint, unsaved)
+            raise
+        if changed():
+            self.save_accounts()
+        checkpoint.clear()
+
+    def record_phase(self, phase, started, accounts):
+        """记录刷新阶段处理的账号数和耗时，started为阶段开始时self.clock()的返回值"""
+        self.metrics.record_phase(phase, accounts, (self.clock() - started).total_seconds())
+
+    def record_sweep_finished(self, kind):
+        """记录一类刷新完整结束的时间(被停止或出错时不记录)"""
+        try:
+            state = self.repository.load_state()
+            state.setdefault("sweeps", {})[kind] = self.clock().strftime("%Y-%m-%d %H:%M:%S")
+            self.repository.save_state(state)
+        except OSError as e:
+            log.warning("保存刷新完成时间失败: %s", e)
+
+    def last_sweep(self, kind):
+        """一类刷新("online"、"bans"、"ranks")上次完整结束的时间，没有记录时返回None"""
+        finished_at = self.repository.load_state().get("sweeps", {}).get(kind)
+        try:
+            return datetime.datetime.strptime(finished_at, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            return None
+
+    def save_sweep_progress(self, checkpoint, unsaved):
+        """先把已完成账号的结果写入增量日志，再写检查点，保证检查点中的账号结果已保存"""
+        try:
+            records = [self.store.get(uid) for uid in unsaved]
+            records = [record for record in records if record is not None]
+            if records:
+                self.save_records(records, quiet=True)
+            unsaved.clear()
+            checkpoint.flush()
+        except Exception as e:
+            log.error("保存刷新进度失败: %s", e)
+
+    async def refresh_single_account(self, engine, uid, low_priority=False):
+        """
+        查询单个账号的封禁状态，再用得到的account_id查询段位
+        low_priority: 预取时使用低优先级，不占满并发
+        有字段变化(包括查询时间)时写入增量日志
+        返回: (封禁状态是否有更新, 段位是否有更新)
+        """
+        account = self.store.get(uid)
+        if account is None:
+            return False, False
+
+        player_id = account.get("account_id") or account.get("id")
+        result = await engine.call(self.provider.check_ban, player_id, low_priority=low_priority)
+        changes = self.apply_ban_result(account, result)
+        ban_updated = changes.touches(*BAN_FIELDS)
+
+        # 读取提交后的账号，使用刚得到的account_id查询段位
+        latest = self.store.get(uid)
+        rank_updated = False
+        if latest is not None and latest.get("account_id"):
+            success, tpp_rank, fpp_rank = await engine.call(
+                self.query_rank, latest["account_id"], low_priority=low_priority)
+            if success:
+                rank_changes = self.apply_rank_result(latest, tpp_rank, fpp_rank)
+                rank_updated = bool(rank_changes)
+                changes += rank_changes
+
+        latest = self.store.get(uid)
+        if changes and latest is not None:
+            self.save_record(latest)
+        return ban_updated, rank_updated
+
+    def check_ban_real(self, account):
+        """
+        检查账号的真实封禁状态
+        account: 账号快照（只读），修改通过self.store提交
+        返回: 是否有更新
+        """
+        # 优先使用account_id，如果没有则使用id
+        player_id = account.get("account_id") or account.get("id")
+
+        # 如果两个ID都没有，不进行检查
+        if not player_id:
+            return False
+
+        # 查询网络接口（不持有任何锁）
+        return self.apply_ban_result(account, self.provider.check_ban(player_id)).touches(*BAN_FIELDS)
+
+    def apply_ban_result(self, account, result):
+        """
+        将封禁查询结果提交到账号存储，查询成功时同时记录查询时间
+        account: 查询前读到的账号快照
+        result: check_ban_status_online的返回值
+        返回: 这次提交的ChangeSet，没有字段变化时为空
+        """
+        is_banned, success, player_level, account_id = result
+
+        # 与封禁状态无关的字段，直接合并到最新的账号数据上
+        info_changes = {}
+
+        # 如果返回了新的account_id，保存到账号对象
+        if account_id and account_id != account.get("account_id"):
+            info_changes["account_id"] = account_id
+            log.debug("账号 %s 的account_id已更新: %s", account.get("name", "unknown"), account_id)
+
+        # 最近一次在线查询成功的时间，用于判断数据是否过期
+        if success:
+            info_changes["checked_at"] = self.clock().strftime("%Y-%m-%d %H:%M:%S")
+
+        # 更新账号的等级信息(无论查询封禁状态是否成功)
+        if player_level > 0:
+            if account.get("level", 0) != player_level:
+                info_changes["level"] = player_level
+                log.debug("账号 %s 等级已更新: %s", account.get("name", "unknown"), player_level)
+        elif player_level == 0 and "level" in account:
+            # 如果API返回0但账号已有等级值，保留原有等级
+            pass
+
+        # 封禁状态的修改基于查询前读到的状态计算
+        ban_changes = {}
+
+        # 如果查询成功且账号当前状态与API状态不一致
+        status_changed = success and account["status"] != is_banned
+        if status_changed:
+            account_name = account.get('name', '未命名')
+            if is_banned:  # API显示已封禁，但本地状态是未封禁
+                # 更新为封禁状态
+                ban_changes["status"] = True
+
+                # 检查当前是否有解封时间记录
+                if not account.get("unban_time") or not account["unban_time"]:
+                    # 没有解封时间记录，设置为24小时封禁
+                    ban_changes["extended_ban"] = ""  # 不是追封，是新封禁
+                    now = self.clock()
+                    unban_time = now + datetime.timedelta(hours=24)
+                    ban_changes["unban_time"] = unban_time.strftime("%Y-%m-%d %H:%M:%S")
+                    log.info("账号 %s 被检测到封禁，已设置为封禁24小时", account_name, extra={"sample": "ban_change"})
+                else:
+                    # 有解封时间记录，视为追封
+                    try:
+                        # 尝试解析当前解封时间
+                        current_unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
+
+                        # 解封时间未过期，在原解封时间基础上+2天
+                        ban_changes["extended_ban"] = "追3天"
+                        new_unban_time = current_unban_time + datetime.timedelta(days=2)
+                        ban_changes["unban_time"] = new_unban_time.strftime("%Y-%m-%d %H:%M:%S")
+                        log.info("账号 %s 被检测到追封，已延长封禁时间2天", account_name, extra={"sample": "ban_change"})
+                    except:
+                        # 解析失败，从当前时间开始计算24小时
+                        ban_changes["extended_ban"] = ""  # 解析失败不作为追封
+                        now = self.clock()
+                        unban_time = now + datetime.timedelta(hours=24)
+                        ban_changes["unban_time"] = unban_time.strftime("%Y-%m-%d %H:%M:%S")
+                        log.info("账号 %s 解封时间格式无效，重置为封禁24小时", account_name, extra={"sample": "ban_change"})
+            else:  # API显示未封禁，但本地状态是封禁
+                # 更新为未封禁状态
+                ban_changes["status"] = False
+                ban_changes["unban_time"] = ""
+                ban_changes["extended_ban"] = ""
+                log.info("账号 %s 已确认解封", account_name, extra={"sample": "ban_change"})
+
+        # 一次提交；查询期间封禁状态被界面修改过时放弃封禁状态的修改，以界面为准
+        updates = []
+        if info_changes:
+            updates.append((account["uid"], info_changes))
+        if ban_changes:
+            expect = {"status": account["status"], "unban_time": account.get("unban_time")}
+            updates.append((account["uid"], ban_changes, expect))
+        changes = self.store.commit(updates)
+
+        if ban_changes and not changes.touches(*ban_changes):
+            log.info("账号 %s 的封禁状态在查询期间已被修改，忽略本次查询结果", account.get("name", "未命名"))
+
+        return changes
+
+    def apply_rank_result(self, account, tpp_rank, fpp_rank):
+        """
+        将段位查询结果提交到账号存储，合并到最新数据上；账号已被删除时忽略
+        段位和分数逐个字段与当前值比较，只有分数变化也算作更新
+        account: 查询前读到的账号快照
+        返回: 这次提交的ChangeSet，段位和分数都没有变化时为空
+        """
+        changes = {}
+        changes["tpp_rank"], changes["tpp_rank_point"] = rank_fields(tpp_rank)
+        changes["fpp_rank"], changes["fpp_rank_point"] = rank_fields(fpp_rank)
+
+        # 提交后由存储的回调刷新对应的行
+        committed = self.store.commit([(account["uid"], changes)])
+        for change in committed:
+            log.debug("账号 %s 的 %s 已更新: %s -> %s", account.get('name', '未命名'), change.field, change.old, change.new)
+
+        # 段位历史：与该账号本赛季的最后一个点不同时才追加，随账号数据一起写入文件
+        self.rank_history.record(account["uid"], int(self.season()), self.clock().timestamp(),
+                                 RANK_MAP.get(changes["tpp_rank"], 0), changes["tpp_rank_point"],
+                                 RANK_MAP.get(changes["fpp_rank"], 0), changes["fpp_rank_point"])
+        return committed
+
+    def rank_series(self, uid, season=None):
+        """账号在某个赛季(默认当前赛季)的段位历史RankSeries，没有记录时返回None"""
+        return self.rank_history.series(uid, int(season if season is not None else self.season()))
+
+    def flush_rank_history(self):
+        """把新的段位历史追加到文件，失败时下次保存再写"""
+        try:
+            self.rank_history.flush()
+        except OSError as e:
+            log.warning("保存段位历史失败: %s", e)
+
+    def is_stale(self, account, max_age):
+        """账号距上次在线查询是否已超过max_age秒"""
+        checked_at = account.get("checked_at")
+        if not checked_at:
+            return True
+        try:
+            checked_time = datetime.datetime.strptime(checked_at, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return True
+        return (self.clock() - checked_time).total_seconds() > max_age
+
+    def is_stale_cached(self, account, max_age, cache="account_data"):
+        """与is_stale相同，同时把未过期(可以沿用上次查询结果)记为一次缓存命中"""
+        stale = self.is_stale(account, max_age)
+        self.metrics.record_cache(cache, not stale)
+        return stale
+
+    def save_accounts(self):
+        """保存账号数据到文件"""
+        try:
+            with self.repository.lock, self.profiler.section("save_accounts"):
+                # 保存同一时刻的快照，不会与其他线程的修改交错
+                self.repository.save_all(self.accounts)
+            self.flush_rank_history()
+            # 可能在后台线程中调用，界面更新由监听者处理
+            self.report_status("数据已保存", clear_after=3000)
+            return True
+        except Exception as e:
+            error_msg = f"保存失败: {str(e)}\n路径: {self.repository.data_file}"
+            log.error("%s", error_msg)
+            self.emit("error", title="保存错误", message=error_msg)
+            self.report_status("数据保存失败")
+            return False
+
+    def save_record(self, account):
+        """只保存单个账号（新增、修改或调整顺序），追加到增量日志"""
+        return self.append_journal({"op": "put", "record": account})
+
+    def save_record_deletion(self, account):
+        """只记录单个账号的删除，追加到增量日志"""
+        return self.append_journal({"op": "delete", "uid": account["uid"]})
+
+    def save_records(self, accounts, quiet=False):
+        """一次保存多个账号，追加到增量日志"""
+        return self.append_journal(*[{"op": "put", "record": account} for account in accounts], quiet=quiet)
+
+    def append_journal(self, *entries, quiet=False):
+        """
+        向增量日志追加记录，日志过长或数据文件需要迁移时改为完整保存
+        quiet: 不提示保存状态（刷新过程中保存进度时使用，避免覆盖进度显示）
+        """
+        if self.repository.needs_full_save():
+            return self.save_accounts()
+        try:
+            self.repository.append(*entries)
+            self.flush_rank_history()
+            if not quiet:
+                self.report_status("数据已保存", clear_after=3000)
+            return True
+        except Exception as e:
+            error_msg = f"保存失败: {str(e)}\n路径: {self.repository.journal_file}"
+            log.error("%s", error_msg)
+            self.emit("error", title="保存错误", message=error_msg)
+            self.report_status("数据保存失败")
+            return False
+
+    def order_key_beside(self, target, after, exclude=None):
+        """
+        计算紧挨着目标账号的顺序键（取与相邻账号顺序键的中间值）
+        after: True表示放在目标之后，False表示放在目标之前
+        """
+        target_order = target["order"]
+        exclude_uid = exclude["uid"] if exclude else None
+        if after:
+            neighbors = [a["order"] for a in self.accounts
+                         if a["uid"] != exclude_uid and a["order"] > target_order]
+            neighbor = min(neighbors) if neighbors else target_order + 2.0
+        else:
+            neighbors = [a["order"] for a in self.accounts
+                         if a["uid"] != exclude_uid and a["order"] < target_order]
+            neighbor = max(neighbors) if neighbors else target_order - 2.0
+
+        key = (target_order + neighbor) / 2
+        if key == target_order or key == neighbor:
+            # 浮点精度用尽，重新分配所有顺序键后再计算
+            self.rebalance_order_keys()
+            return self.order_key_beside(self.store.get(target["uid"]), after, exclude)
+        return key
+
+    def rebalance_order_keys(self):
+        """按当前顺序把所有顺序键重新分配为整数，需要完整保存一次"""
+        ordered = sorted(self.accounts, key=lambda a: a["order"])
+        self.store.update_many([(account["uid"], {"order": float(position)})
+                                for position, account in enumerate(ordered)])
+        self.repository.base_needs_rewrite = True
+        log.info("顺序键已重新分配")
@@ -0,0 +1,224 @@
+import collections
+import threading
+
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+# 一个字段的修改；删除账号时field为None，old为被删除的账号
+Change = collections.namedtuple("Change", ["uid", "field", "old", "new"])
+
+
+class ChangeSet:
+    """
+    一次提交产生的字段级修改，只包含值真正变化的字段
+    为空(假值)时表示没有任何修改，调用方据此决定是否保存、刷新界面或记录历史
+    """
+
+    __slots__ = ("changes",)
+
+    def __init__(self, changes=()):
+        self.changes = tuple(changes)
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __add__(self, other):
+        return ChangeSet(self.changes + tuple(other))
+
+    def uids(self):
+        """有修改的账号唯一标识，按修改顺序去重"""
+        return list(dict.fromkeys(change.uid for change in self.changes))
+
+    def fields(self, uid=None):
+        """被修改的字段集合，uid不为None时只包含该账号"""
+        return {change.field for change in self.changes if uid is None or change.uid == uid}
+
+    def touches(self, *fields):
+        """是否修改了其中任一字段"""
+        return any(change.field in fields for change in self.changes)
+
+
+class AccountSnapshot:
+    """
+    账号数据的只读快照
+    records中的账号字典在发布后不会再被修改，可以在任意线程中不加锁读取
+    """
+
+    __slots__ = ("records", "index", "version", "changes")
+
+    def __init__(self, records, index, version, changes=None):
+        self.records = records  # 账号元组，保持数据文件中的顺序
+        self.index = index      # uid -> 在records中的位置
+        self.version = version  # 每次提交加1
+        self.changes = changes  # 产生这个快照的ChangeSet，整体重新加载时为None
+
+    def get(self, uid):
+        """按唯一标识取账号，不存在时返回None"""
+        position = self.index.get(uid)
+        if position is None:
+            return None
+        return self.records[position]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class AccountStore:
+    """
+    写时复制的账号存储
+    读取方通过snapshot()拿到不可变快照；所有修改都经过同一把锁串行提交，
+    提交时复制被修改的账号并发布新快照。锁只在内存复制期间持有，不会跨越网络请求
+    提交时逐个字段与当前值比较，值没有变化的字段不算修改；没有任何修改时不发布快照、不通知订阅者
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = AccountSnapshot((), {}, 0)
+        # 提交后的回调: listener(snapshot, changed_uids)，changed_uids为None表示整体重新加载，
+        # 字段级的修改在snapshot.changes中
+        self._listeners = []
+
+    def snapshot(self):
+        """返回当前快照(读取无需加锁)"""
+        return self._snapshot
+
+    def get(self, uid):
+        """按唯一标识取当前的账号"""
+        return self._snapshot.get(uid)
+
+    def subscribe(self, listener):
+        """注册提交后的回调，回调在提交所在的线程中执行"""
+        self._listeners.append(listener)
+
+    def reset(self, records):
+        """用新的账号列表替换全部数据(加载文件时使用)"""
+        with self._lock:
+            records = tuple(dict(record) for record in records)
+            index = {record["uid"]: i for i, record in enumerate(records)}
+            snapshot = AccountSnapshot(records, index, self._snapshot.version + 1)
+            self._snapshot = snapshot
+        self._notify(snapshot, None)
+        return snapshot
+
+    def update(self, uid, changes, expect=None):
+        """
+        修改单个账号的部分字段
+        expect: 可选的{字段: 期望值}，当前值不一致时放弃修改(账号已被其他线程改动)
+        返回: 修改后的账号(字段值都没有变化时为当前账号)；账号不存在或期望值不满足时返回None
+        """
+        results, _ = self._commit([(uid, changes, expect)])
+        return results[0]
+
+    def update_many(self, updates):
+        """
+        一次提交多个账号的修改，只发布一个新快照
+        updates: [(uid, changes)] 或 [(uid, changes, expect)]
+        返回: 与updates一一对应的修改后账号(账号不存在或期望值不满足的为None)
+        """
+        results, _ = self._commit(updates)
+        return results
+
+    def commit(self, updates):
+        """
+        与update_many相同，返回这次提交的ChangeSet；期望值不满足的修改和值没有变化的字段不在其中
+        """
+        _, changes = self._commit(updates)
+        return changes
+
+    def _commit(self, updates):
+        results = []
+        changes = []
+        with self._lock:
+            current = self._snapshot
+            records = None
+            for update in updates:
+                uid, fields = update[0], update[1]
+                expect = update[2] if len(update) > 2 else None
+                position = current.index.get(uid)
+                if position is None:
+                    results.append(None)
+                    continue
+                # 同一批中多次修改同一账号时基于最新的副本
+                record = records[position] if records is not None else current.records[position]
+                if expect and any(record.get(field) != value for field, value in expect.items()):
+                    results.append(None)
+                    continue
+                diff = [Change(uid, field, record.get(field), value) for field, value in fields.items()
+                        if field not in record or record[field] != value]
+                if not diff:
+                    results.append(record)
+                    continue
+                new_record = dict(record)
+                new_record.update((change.field, change.new) for change in diff)
+                if records is None:
+                    records = list(current.records)
+                records[position] = new_record
+                results.append(new_record)
+                changes.extend(diff)
+            if records is None:
+                return results, ChangeSet()
+            change_set = ChangeSet(changes)
+            # 只修改字段时位置不变，索引可以直接共用
+            snapshot = AccountSnapshot(tuple(records), current.index, current.version + 1, change_set)
+            self._snapshot = snapshot
+        self._notify(snapshot, change_set.uids())
+        return results, change_set
+
+    def put(self, record):
+        """新增账号或整体替换同uid的账号，新账号追加到末尾；与已有账号完全相同时不提交"""
+        record = dict(record)
+        uid = record["uid"]
+        with self._lock:
+            current = self._snapshot
+            records = list(current.records)
+            position = current.index.get(uid)
+            old = {} if position is None else records[position]
+            changes = [Change(uid, field, old.get(field), value) for field, value in record.items()
+                       if field not in old or old[field] != value]
+            changes.extend(Change(uid, field, value, None) for field, value in old.items() if field not in record)
+            if not changes:
+                return old
+            if position is None:
+                index = dict(current.index)
+                index[uid] = len(records)
+                records.append(record)
+            else:
+                index = current.index
+                records[position] = record
+            snapshot = AccountSnapshot(tuple(records), index, current.version + 1, ChangeSet(changes))
+            self._snapshot = snapshot
+        self._notify(snapshot, [uid])
+        return record
+
+    def delete(self, uid):
+        """删除账号，返回被删除的账号(不存在时返回None)"""
+        with self._lock:
+            current = self._snapshot
+            position = current.index.get(uid)
+            if position is None:
+                return None
+            removed = current.records[position]
+            records = current.records[:position] + current.records[position + 1:]
+            index = {record["uid"]: i for i, record in enumerate(records)}
+            snapshot = AccountSnapshot(records, index, current.version + 1, ChangeSet([Change(uid, None, removed, None)]))
+            self._snapshot = snapshot
+        self._notify(snapshot, [uid])
+        return removed
+
+    def _notify(self, snapshot, changed_uids):
+        """通知所有订阅者(在锁外执行，避免回调中再次提交造成死锁)"""
+        for listener in self._listeners:
+            try:
+                listener(snapshot, changed_uids)
+            except Exception as e:
+                log.error("账号存储回调出错: %s", e)
@@ -0,0 +1,82 @@
+"""
+启动时的刷新策略：按上次在线刷新完成的时间和每个账号上次查询成功的时间(checked_at)，
+跳过或缩小启动后的在线查询，短时间内重启不会再把所有账号查询一遍
+    ACCOUNT_MANAGER_STARTUP_SWEEP=stale    默认，只查询超过max_age秒未查询的账号
+    ACCOUNT_MANAGER_STARTUP_SWEEP=full     查询全部账号
+    ACCOUNT_MANAGER_STARTUP_SWEEP=off      启动时只按本地时间更新封禁状态
+    ACCOUNT_MANAGER_STARTUP_MAX_AGE        账号数据的有效期(秒)，默认1800
+    ACCOUNT_MANAGER_STARTUP_SKIP_WITHIN    上次在线刷新在该秒数内完成时只做本地检查(秒)，默认600
+"""
+
+import os
+
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+MODES = ("stale", "full", "off")
+
+
+def _env_seconds(name, default):
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        log.warning("%s不是数字: %s", name, value)
+        return default
+
+
+class WarmStartPolicy:
+    """
+    决定启动后的第一次刷新查询哪些账号
+    mode: "stale"只查询过期账号，"full"查询全部账号，"off"不进行在线查询
+    max_age: 距上次查询成功超过该秒数的账号视为过期
+    skip_within: stale模式下上次在线刷新完成不到该秒数时不进行在线查询(查询失败的账号也等到下次)
+    """
+
+    def __init__(self, mode="stale", max_age=30 * 60, skip_within=10 * 60):
+        if mode not in MODES:
+            raise ValueError(f"未知的启动刷新策略: {mode}")
+        self.mode = mode
+        self.max_age = max_age
+        self.skip_within = skip_within
+
+    @classmethod
+    def from_env(cls):
+        """按环境变量创建，未设置时使用默认策略"""
+        mode = os.environ.get("ACCOUNT_MANAGER_STARTUP_SWEEP", "").strip().lower() or "stale"
+        if mode not in MODES:
+            log.warning("未知的启动刷新策略: %s，使用stale", mode)
+            mode = "stale"
+        return cls(mode,
+                   max_age=_env_seconds("ACCOUNT_MANAGER_STARTUP_MAX_AGE", 30 * 60),
+                   skip_within=_env_seconds("ACCOUNT_MANAGER_STARTUP_SKIP_WITHIN", 10 * 60))
+
+    def choose(self, service):
+        """
+        返回(协程函数 sweep(engine), 状态栏提示)
+        不需要在线查询时返回service.local_sweep，仍然按本地时间更新封禁状态
+        """
+        accounts = service.accounts
+        if self.mode == "full":
+            return service.full_sweep, f"正在准备检查 {len(accounts)} 个账号状态..."
+        if self.mode == "off":
+            log.info("启动刷新策略为off，只检查本地封禁时间")
+            return service.local_sweep, "启动时只检查本地封禁时间"
+
+        last_sweep = service.last_sweep("online")
+        if last_sweep is not None:
+            elapsed = (service.clock() - last_sweep).total_seconds()
+            if 0 <= elapsed < self.skip_within:
+                log.info("上次在线刷新在 %.0f 秒前完成，启动时只检查本地封禁时间", elapsed)
+                return service.local_sweep, f"上次刷新在 {elapsed / 60:.0f} 分钟前完成，跳过在线查询"
+
+        stale = sum(1 for account in accounts
+                    if (account.get("account_id") or account.get("id")) and service.is_stale(account, self.max_age))
+        if not stale:
+            log.info("所有账号都在 %.0f 秒内查询过，启动时只检查本地封禁时间", self.max_age)
+            return service.local_sweep, "账号数据都未过期，跳过在线查询"
+        log.info("启动时查询 %d 个过期账号(共 %d 个)", stale, len(accounts))
+        return service.stale_sweep(self.max_age), f"正在准备检查 {stale}/{len(accounts)} 个过期账号..."
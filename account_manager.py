@@ -1,29 +1,58 @@
+import time
+STARTED = time.perf_counter()  # 开始导入的时间，用于统计启动到首次显示的耗时
 import tkinter as tk
 from tkinter import ttk, messagebox
 import datetime
-import json
 import os
 import sys
-import requests  # 导入requests库用于网络请求
-import time  # 用于添加请求延迟
-import threading  # 用于实现后台任务
+import threading  # 用于判断当前是否为主线程
+import uuid  # 用于生成账号的唯一标识
+from account_core import (  # 不依赖界面的核心逻辑
+    AccountApiServer, AccountRepository, AccountService, InstanceLock, InstanceServer, Profiler, RecordingTransport,
+    SweepCancelled, WarmStartPolicy, default_data_file, send_command, DEFAULT_SEASON, RANK_MAP, RANK_OPTIONS
+)
+from account_core.logs import configure_logging, get_logger  # 分级日志
+from rank_sparkline import RankSparkline  # 账号详情中的段位走势
+from stall_detector import StallDetector  # 界面主循环阻塞检测
+from tree_renderer import TreeRenderer  # 差量渲染Treeview
+from ui_queue import UiUpdateQueue  # 后台线程的界面更新队列
+
+log = get_logger("account_manager")
+
+# 不在表格中显示、修改后不需要重绘行的字段
+HIDDEN_FIELDS = {"checked_at", "season"}
 
 class AccountManager:
-    def __init__(self, root):
+    def __init__(self, root, data_file=None):
         self.root = root
         self.root.title("账号管理器")
         self.root.geometry("1400x710")  # 修改窗口高度为710
         self.root.resizable(True, True)
         
-        # 数据文件路径 - 完全修改这部分
-        if getattr(sys, 'frozen', False):
-            # 打包后，使用exe所在目录而不是临时目录
-            self.data_file = os.path.join(os.path.dirname(sys.executable), "accounts.json")
-        else:
-            # 开发环境，使用脚本所在目录
-            self.data_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "accounts.json")
+        # 数据文件路径：打包后为exe所在目录，开发环境为脚本所在目录（基准测试等可以指定其他文件）
+        self.data_file = data_file or default_data_file()
+        
+        log.info("数据文件位置: %s", self.data_file)
         
-        print(f"数据文件位置: {self.data_file}")  # 添加调试信息
+        # 核心逻辑（加载保存、封禁判断、接口查询、后台刷新），界面只负责显示和操作
+        # 设置了环境变量ACCOUNT_MANAGER_PROFILE时分析刷新、表格刷新、保存和加载，也可以在诊断窗口中开启
+        self.core = AccountService(self.data_file, profiler=Profiler.from_env(self.data_file))
+        self.core.add_listener(self.on_core_event)
+        self.profiler = self.core.profiler
+        self.update_treeview = self.profiler.wrap("update_treeview", self.update_treeview)
+        self.load_accounts_only = self.profiler.wrap("load_accounts_only", self.load_accounts_only)
+        
+        # 开启性能分析或设置了ACCOUNT_MANAGER_STALL_MS时，记录阻塞主循环超过阈值的回调
+        self.stall_detector = StallDetector.from_env(self.root, enabled=self.profiler.enabled)
+        if self.stall_detector is not None:
+            self.stall_detector.start()
+        # 阻塞检测是否由诊断窗口开启性能分析时创建；停止分析时只停止这种
+        self.stall_detector_from_toggle = False
+        
+        # 设置了环境变量时，把封禁/段位接口的响应匿名化后保存为样本，供离线回放
+        fixture_dir = os.environ.get("ACCOUNT_MANAGER_RECORD_FIXTURES", "").strip()
+        if fixture_dir:
+            self.core.provider.transport = RecordingTransport(self.core.provider.transport, fixture_dir)
         
         # 先初始化状态变量，防止加载账号时出错
         self.status_var = tk.StringVar()
@@ -32,20 +61,14 @@ class AccountManager:
         # 初始化赛季变量
         self.season_var = tk.StringVar(value="35")  # 默认赛季为35
         
-        # 账号数据
-        self.accounts = []
+        # 账号数据：界面线程和后台线程共享同一个存储，读取快照、通过提交修改
+        self.store = self.core.store
         
         # 段位选项
-        self.rank_options = ["未定级", 
-                           "青铜5", "青铜4", "青铜3", "青铜2", "青铜1", 
-                           "白银5", "白银4", "白银3", "白银2", "白银1", 
-                           "黄金5", "黄金4", "黄金3", "黄金2", "黄金1", 
-                           "铂金5", "铂金4", "铂金3", "铂金2", "铂金1", 
-                           "钻石5", "钻石4", "钻石3", "钻石2", "钻石1", 
-                           "大师"]
+        self.rank_options = list(RANK_OPTIONS)
         
         # 段位映射值（用于排序）
-        self.rank_map = {rank: i for i, rank in enumerate(self.rank_options)}
+        self.rank_map = RANK_MAP
         
         # 封禁时长选项 - 添加"无"选项和"自定义"选项
         self.ban_duration_options = ["无", "24小时", "72小时", "7天", "15天", "30天", "追3天", "自定义"]
@@ -62,11 +85,41 @@ class AccountManager:
         
         # 拖放功能相关变量
         self.drag_item = None
-        self.drag_source_index = None
-        self.custom_order = {}  # 用于保存用户自定义的顺序
+        self.drag_source_uid = None  # 被拖动账号的唯一标识
+        self.drag_highlight_item = None  # 当前高亮的目标行
+        
+        # 后台刷新引擎：封禁/段位刷新在独立的事件循环线程中执行，可随时停止；在界面首次显示后启动
+        self.engine = self.core.engine
+        
+        # 启动时的刷新策略：默认只查询过期的账号，上次刷新刚完成时不在线查询(见account_core/warm_start.py)
+        self.warm_start = WarmStartPolicy.from_env()
         
-        # 后台任务标志
-        self.background_task_running = False
+        # 正在单独查询的账号(唯一标识)，只在主线程中读写；这些行的状态列显示"查询中…"
+        self.checking_uids = set()
+        
+        # 预取：选中、悬停或滚动到可见区域的账号数据过期时，在后台以低优先级刷新
+        self.prefetch_var = tk.BooleanVar(value=True)  # 是否启用预取
+        self.prefetch_max_age = 30 * 60  # 距上次在线查询超过该秒数视为过期
+        self.prefetch_limit = 10  # 同时等待中的预取数量上限
+        self.prefetching_uids = set()  # 正在预取的账号，只在主线程中读写
+        self.hover_item = None  # 鼠标悬停的行
+        self.hover_after_id = None  # 悬停预取的延迟任务
+        self.view_prefetch_after_id = None  # 可见区域预取的延迟任务
+        
+        # 诊断窗口（运行指标），打开时才创建
+        self.diagnostics_window = None
+        
+        # 界面更新队列，后台线程通过它提交界面更新，主线程每50毫秒统一处理一次
+        self.ui_queue = UiUpdateQueue(self.root, interval=50)
+        self.ui_queue.start()
+        
+        # 账号数据有提交时刷新对应的行
+        self.store.subscribe(self.on_store_committed)
+        
+        # 搜索索引和搜索框变量
+        self.search_index = self.core.search_index
+        self.search_var = tk.StringVar()
+        self.visible_count = 0  # 过滤后显示的账号数
         
         # 仅加载账号数据，不执行检查
         self.load_accounts_only()
@@ -80,26 +133,82 @@ class AccountManager:
         # 更新表格显示
         self.update_treeview()
         
+        # 设置了环境变量ACCOUNT_MANAGER_API_PORT时，在本机该端口提供HTTP接口；在界面首次显示后启动
+        self.api_server = None
+        
+        # 后启动的实例和命令行把命令转发到这里，不会再加载一份账号数据
+        self.instance_server = InstanceServer(
+            self.core,
+            refresh=self.on_remote_refresh, refresh_account=self.on_remote_refresh_account,
+            handlers={
+                "activate": lambda request: self.call_on_ui(self.activate_window),
+                "import": lambda request: self.call_on_ui(lambda: self.import_accounts_file(request["path"])),
+            }
+        )
+        
+        # 关闭窗口时的清理工作
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 先显示窗口和已保存的账号列表，刷新引擎、HTTP接口和进程间命令服务等界面空闲后再启动
+        self.root.after_idle(self.finish_startup)
+    
+    def finish_startup(self):
+        """界面首次显示后启动其余部分，记录启动耗时"""
+        # 处理完尚未完成的绘制，此时窗口和账号列表已显示
+        self.root.update_idletasks()
+        first_paint = time.perf_counter() - STARTED
+        self.core.metrics.record_startup("first_paint", first_paint)
+        
+        self.core.start()
+        # 段位历史在后台读取，选中账号时不需要等待
+        threading.Thread(target=self.load_rank_history, name="rank-history", daemon=True).start()
+        # 搜索索引在后台建立，建立之前的搜索逐个账号匹配
+        threading.Thread(target=self.build_search_index, name="search-index", daemon=True).start()
+        self.start_api_server()
+        try:
+            self.instance_server.start()
+        except OSError as e:
+            log.warning("进程间命令服务启动失败: %s", e)
+        ready = time.perf_counter() - STARTED
+        self.core.metrics.record_startup("ready", ready)
+        
         # 启动时打印信息
-        print("程序启动完成，准备就绪。")
+        log.info("程序启动完成，准备就绪。首次显示 %.0fms，全部启动 %.0fms", first_paint * 1000, ready * 1000)
         
-        # 在界面显示后延迟启动后台检查任务，现在只执行本地时间检查
-        self.root.after(1000, self.start_background_check)
+        # 在界面显示后延迟启动后台检查任务，等界面空闲时执行
+        self.root.after(1000, lambda: self.root.after_idle(self.start_background_check))
+    
+    def load_rank_history(self):
+        """读取段位历史（在后台线程中执行），完成后显示当前账号的段位走势"""
+        self.core.rank_history.load()
+        self.ui_queue.post(self.show_rank_sparkline, key="rank_sparkline")
+    
+    def show_rank_sparkline(self, uid=None):
+        """显示账号（默认为表单中的账号）本赛季的段位走势，段位历史还在读取时显示提示"""
+        uid = uid or getattr(self, 'current_account_uid', None)
+        if uid is None:
+            return
+        if self.core.rank_history.loading:
+            self.rank_sparkline.clear("正在读取段位历史...")
+            return
+        self.rank_sparkline.show(self.core.rank_series(uid))
+    
+    def build_search_index(self):
+        """建立搜索索引（在后台线程中执行），完成后在主线程中使用"""
+        built = self.core.build_search_index()
+        self.ui_queue.post(lambda: self.search_index.install(built))
     
     def initialize_season(self):
         """初始化赛季值，从第一个账户读取season字段"""
-        if self.accounts and len(self.accounts) > 0:
-            # 检查第一个账户是否有season字段
-            if "season" in self.accounts[0]:
-                season_num = self.accounts[0]["season"]
-                print(f"从accounts.json中读取赛季: {season_num}")
-                # 将赛季值设置到season_var（如果已初始化）
-                if hasattr(self, 'season_var'):
-                    self.season_var.set(str(season_num))
-            else:
-                # 没有找到season字段，写入默认值
-                self.accounts[0]["season"] = 35
-                self.save_accounts()
+        if self.accounts:
+            season_num = self.core.ensure_season()
+            log.info("从accounts.json中读取赛季: %s", season_num)
+            self.season_var.set(str(season_num))
+    
+    @property
+    def accounts(self):
+        """当前的账号快照（只读元组，修改必须通过self.store提交）"""
+        return self.store.snapshot().records
     
     def update_season(self):
         """更新游戏赛季并保存到第一个账户中"""
@@ -115,354 +224,176 @@ class AccountManager:
             season_value = int(season_input)
             
             # 确保有至少一个账户
-            if not self.accounts or len(self.accounts) == 0:
+            if not self.accounts:
                 messagebox.showwarning("警告", "没有账户，无法保存赛季值")
                 return
                 
-            # 如果与当前值相同，则不操作
-            if "season" in self.accounts[0] and self.accounts[0]["season"] == season_value:
-                return
-                
-            # 更新第一个账户的season字段
-            self.accounts[0]["season"] = season_value
-            
-            # 保存到文件
-            if self.save_accounts():
+            # 更新第一个账户的season字段并保存到文件
+            if self.core.set_season(season_value):
                 self.status_message.set(f"赛季已更新为: {season_value}")
                 # 更新界面上的赛季显示
                 self.season_var.set(str(season_value))
                 self.root.after(3000, lambda: self.status_message.set(""))
         except ValueError:
             # 如果不是有效数字，恢复为原有值
-            if self.accounts and len(self.accounts) > 0 and "season" in self.accounts[0]:
+            if self.accounts and "season" in self.accounts[0]:
                 self.season_var.set(str(self.accounts[0]["season"]))
             else:
-                self.season_var.set("35")  # 默认值
+                self.season_var.set(str(DEFAULT_SEASON))  # 默认值
             messagebox.showerror("错误", "请输入有效的赛季数字")
         except Exception as e:
             messagebox.showerror("错误", f"更新赛季失败: {str(e)}")
     
     def load_accounts_only(self):
         """仅从文件加载账号数据，不执行检查"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.accounts = json.load(f)
-                print(f"已加载 {len(self.accounts)} 个账号")
-                
-                # 确保每个账号都有必要的字段
-                for account in self.accounts:
-                    if "level" not in account:
-                        account["level"] = 0
-                    if "account_id" not in account:
-                        account["account_id"] = ""
-                    # 确保有rank分数字段
-                    if "tpp_rank_point" not in account:
-                        account["tpp_rank_point"] = 0
-                    if "fpp_rank_point" not in account:
-                        account["fpp_rank_point"] = 0
-                    # 确保有段位字段
-                    if "tpp_rank" not in account:
-                        account["tpp_rank"] = "未定级"
-                    if "fpp_rank" not in account:
-                        account["fpp_rank"] = "未定级"
-                        
-            except Exception as e:
-                print(f"加载账号数据出错: {str(e)}")
-                self.accounts = []
-    
-    def load_accounts(self):
-        """从文件加载账号数据并检查状态"""
-        self.load_accounts_only()
-        # 启动时检查并更新封禁状态
-        self.update_ban_status()
+        self.core.load()
     
     def start_background_check(self):
-        """启动后台检查任务"""
-        if not self.background_task_running:
-            total_accounts = len(self.accounts)
-            self.status_message.set(f"正在准备检查 {total_accounts} 个账号状态...")
-            # 启动后台线程执行检查
-            self.background_task_running = True
-            threading.Thread(target=self.background_check_task, daemon=True).start()
-    
-    def background_check_task(self):
-        """后台线程执行账号状态检查"""
-        try:
-            # 执行状态更新 - 只根据本地时间判断
-            updated_ban = self.update_ban_status()
-            
-            # 执行段位更新
-            print("封禁状态检查完成，开始查询段位信息...")
-            updated_rank = self.update_account_ranks()
-            
-            # 在主线程中更新UI
-            self.root.after(0, lambda: self.finish_background_check(updated_ban, updated_rank))
-        except Exception as e:
-            print(f"后台检查任务异常: {str(e)}")
-            # 在主线程中更新状态
-            self.root.after(0, lambda: self.status_message.set(f"检查过程出错: {str(e)}"))
-            self.background_task_running = False
+        """启动后的后台检查任务，按启动刷新策略跳过或只查询数据过期的账号"""
+        sweep, message = self.warm_start.choose(self.core)
+        self.start_sweep(sweep, message)
+    
+    def start_sweep(self, sweep, message):
+        """
+        在刷新引擎中启动一次刷新，已有刷新在执行时只提示
+        sweep: 协程函数 sweep(engine)，返回(封禁是否有更新, 段位是否有更新)
+        """
+        if self.engine.is_busy():
+            self.status_message.set("正在检查账号状态，请稍候...")
+            return False
+        self.status_message.set(message)
+        self.set_sweep_buttons(running=True)
+        self.core.start_sweep(
+            sweep,
+            on_done=lambda result, error: self.ui_queue.post(lambda: self.finish_background_check(result, error))
+        )
+        return True
+    
+    def stop_sweep(self):
+        """停止按钮：取消正在执行的刷新，已完成的账号结果会保留"""
+        if self.engine.cancel():
+            self.status_message.set("正在停止刷新...")
     
-    def finish_background_check(self, updated_ban, updated_rank):
-        """完成后台检查，更新界面"""
+    def set_sweep_buttons(self, running):
+        """刷新执行期间禁用刷新按钮、启用停止按钮"""
+        if not hasattr(self, 'refresh_btn'):
+            return
+        self.refresh_btn.configure(state="disabled" if running else "normal")
+        self.stop_btn.configure(state="normal" if running else "disabled")
+    
+    def finish_background_check(self, result, error):
+        """完成后台检查，更新界面（在主线程中执行）"""
+        self.set_sweep_buttons(running=False)
+        
+        # 后台检查可能更新了account_id，同步搜索索引
+        self.search_index.sync(self.accounts)
+        
         # 更新表格
         self.update_treeview()
         
         # 更新状态信息
-        if updated_ban and updated_rank:
-            self.status_message.set("账号检查完成：封禁状态和段位均有更新")
-        elif updated_ban:
-            self.status_message.set("账号检查完成：封禁状态有更新")
-        elif updated_rank:
-            self.status_message.set("账号检查完成：段位有更新")
+        if isinstance(error, SweepCancelled):
+            self.status_message.set(f"账号检查{error}，已完成部分的结果已保存")
+            log.info("后台检查任务中止: %s", error)
+        elif error is not None:
+            self.status_message.set(f"检查过程出错: {str(error)}")
+            log.error("后台检查任务异常: %s", error)
         else:
-            self.status_message.set("账号检查完成：无状态变化")
+            updated_ban, updated_rank = result
+            if updated_ban and updated_rank:
+                self.status_message.set("账号检查完成：封禁状态和段位均有更新")
+            elif updated_ban:
+                self.status_message.set("账号检查完成：封禁状态有更新")
+            elif updated_rank:
+                self.status_message.set("账号检查完成：段位有更新")
+            else:
+                self.status_message.set("账号检查完成：无状态变化")
+            log.info("后台检查任务完成")
         
         # 3秒后清空状态栏
         self.root.after(3000, lambda: self.status_message.set(""))
-        
-        # 重置后台任务标志
-        self.background_task_running = False
-        
-        print("后台检查任务完成")
     
-    def update_single_account_ui(self, idx):
+    def on_store_committed(self, snapshot, changed_uids):
+        """账号数据提交后的回调（可能在后台线程中执行），把对应行的刷新交给界面更新队列"""
+        if changed_uids is None:
+            # 整体重新加载时由调用方刷新表格
+            return
+        changes = snapshot.changes
+        for uid in changed_uids:
+            # 只修改了不在表格中显示的字段(如查询时间)时不需要重绘
+            if changes is not None and not changes.fields(uid) - HIDDEN_FIELDS:
+                continue
+            self.ui_queue.post(lambda u=uid: self.refresh_account_row(u), key=("row", uid))
+    
+    def refresh_account_row(self, uid):
         """更新单个账号的UI显示"""
         # 这个方法会在主线程中被调用
-        # 获取要更新的账号信息
-        if idx < 0 or idx >= len(self.accounts):
+        # 按唯一标识读取最新的账号数据，账号已被删除时不处理
+        account = self.store.get(uid)
+        if account is None:
             return
-            
-        account = self.accounts[idx]
         account_name = str(account["name"])
         
-        # 在树视图中查找对应的项目（通过账号名称匹配）
-        items = self.tree.get_children()
-        target_item = None
+        # 同步搜索索引
+        self.search_index.update(account)
         
-        for item_id in items:
-            values = self.tree.item(item_id, "values")
-            if values and len(values) > 1 and str(values[1]) == account_name:
-                target_item = item_id
-                break
-        
-        if not target_item:
-            print(f"警告：在树视图中找不到账号 {account_name}")
+        # 通过唯一标识找到对应的行，保持当前显示的序号
+        position = self.tree_renderer.index_of(uid)
+        if position is None:
+            # 账号被搜索条件过滤掉或刚新增时不在列表中，属于正常情况
+            if not self.search_var.get().strip():
+                log.debug("提示：表格中暂无账号 %s", account_name)
             return
-            
-        # 获取状态和解封时间显示
-        status = "❌" if account["status"] else "✅"
-        unban_time_display = ""
-        if account["status"] and account["unban_time"]:
-            try:
-                unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
-                unban_time_display = unban_time.strftime("%m-%d %H:%M")
-            except:
-                unban_time_display = account["unban_time"]
         
-        # 获取等级，如果等级为0则显示为空
-        level_display = ""
-        if "level" in account and account["level"] > 0:
-            level_display = str(account["level"])
+        self.tree_renderer.update_row(uid, self.format_account_row(account, position + 1))
         
-        # 构建TPP段位显示，结合段位和分数
-        tpp_rank_display = account.get("tpp_rank", "未定级")
-        tpp_rank_point = account.get("tpp_rank_point", 0)
-        if tpp_rank_display != "未定级" and tpp_rank_point > 0:
-            tpp_rank_display = f"{tpp_rank_display}({tpp_rank_point})"
-        
-        # 构建FPP段位显示，结合段位和分数
-        fpp_rank_display = account.get("fpp_rank", "未定级")
-        fpp_rank_point = account.get("fpp_rank_point", 0)
-        if fpp_rank_display != "未定级" and fpp_rank_point > 0:
-            fpp_rank_display = f"{fpp_rank_display}({fpp_rank_point})"
-        
-        # 获取当前项目的序号（在排序后的位置）
-        current_values = self.tree.item(target_item, "values")
-        display_number = current_values[0] if current_values else "1"
-        
-        # 更新表项
-        self.tree.item(target_item, values=(
-            display_number,  # 保持当前显示的序号
-            str(account["name"]),
-            level_display,  # 没有等级或等级为0时显示为空
-            fpp_rank_display,  # 使用组合的FPP段位显示
-            tpp_rank_display,  # 使用组合的TPP段位显示
-            status,
-            unban_time_display,
-            str(account.get("extended_ban", "")),
-            str(account["phone"]),
-            str(account.get("id", "")),
-            str(account.get("note", ""))
-        ))
+        # 表单正显示该账号时更新段位走势(刷新中可能追加了新的点)
+        if uid == self.current_account_uid:
+            self.rank_sparkline.show(self.core.rank_series(uid))
         
-        # 更新统计信息
-        self.update_stats_info()
+        # 更新统计信息（需要遍历全部账号，多行更新时合并为一次）
+        self.ui_queue.post(self.update_stats_info, key="stats")
     
-    def check_ban_real(self, account):
-        """
-        检查账号的真实封禁状态
-        account: 账号对象
-        返回: 是否有更新
-        """
-        # 优先使用account_id，如果没有则使用id
-        player_id = account.get("account_id") or account.get("id")
-        
-        # 如果两个ID都没有，不进行检查
-        if not player_id:
-            return False
-            
-        # 查询网络接口
-        is_banned, success, player_level, account_id = self.check_ban_status_online(player_id)
-        
-        # 如果返回了有效的account_id，保存到账号对象
-        if account_id:
-            account["account_id"] = account_id
-            print(f"账号 {account.get('name', 'unknown')} 的account_id已更新: {account_id}")
-        
-        # 更新账号的等级信息(无论查询封禁状态是否成功)
-        level_updated = False
-        if player_level > 0:
-            if account.get("level", 0) != player_level:
-                account["level"] = player_level
-                level_updated = True
-                print(f"账号 {account.get('name', 'unknown')} 等级已更新: {player_level}")
-        elif player_level == 0 and "level" in account:
-            # 如果API返回0但账号已有等级值，保留原有等级
-            pass
-        
-        # 如果查询失败，仅返回等级更新状态
-        if not success:
-            return level_updated
-            
-        # 如果查询成功且账号当前状态与API状态不一致，或者仅更新了等级信息
-        status_changed = account["status"] != is_banned
-        if status_changed:
-            account_name = account.get('name', '未命名')
-            if is_banned:  # API显示已封禁，但本地状态是未封禁
-                # 更新为封禁状态
-                account["status"] = True
-                
-                # 检查当前是否有解封时间记录
-                if not account.get("unban_time") or not account["unban_time"]:
-                    # 没有解封时间记录，设置为24小时封禁
-                    account["extended_ban"] = ""  # 不是追封，是新封禁
-                    now = datetime.datetime.now()
-                    unban_time = now + datetime.timedelta(hours=24)
-                    account["unban_time"] = unban_time.strftime("%Y-%m-%d %H:%M:%S")
-                    print(f"账号 {account_name} 被检测到封禁，已设置为封禁24小时")
-                else:
-                    # 有解封时间记录，视为追封
-                    try:
-                        # 尝试解析当前解封时间
-                        current_unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
-                        # 检查解封时间是否已过期
-                        now = datetime.datetime.now()
-                        
-                        # 解封时间未过期，在原解封时间基础上+2天
-                        account["extended_ban"] = "追3天"
-                        new_unban_time = current_unban_time + datetime.timedelta(days=2)
-                        account["unban_time"] = new_unban_time.strftime("%Y-%m-%d %H:%M:%S")
-                        print(f"账号 {account_name} 被检测到追封，已延长封禁时间2天")
-                    except:
-                        # 解析失败，从当前时间开始计算24小时
-                        account["extended_ban"] = ""  # 解析失败不作为追封
-                        now = datetime.datetime.now()
-                        unban_time = now + datetime.timedelta(hours=24)
-                        account["unban_time"] = unban_time.strftime("%Y-%m-%d %H:%M:%S")
-                        print(f"账号 {account_name} 解封时间格式无效，重置为封禁24小时")
-            else:  # API显示未封禁，但本地状态是封禁
-                # 更新为未封禁状态
-                account["status"] = False
-                account["unban_time"] = ""
-                account["extended_ban"] = ""
-                print(f"账号 {account_name} 已确认解封")
-                
-            return True  # 状态有更新
-            
-        return level_updated  # 如果状态未更新，返回是否有等级更新
+    def save_accounts(self):
+        """保存账号数据到文件"""
+        return self.core.save_accounts()
     
-    def update_ban_status(self):
-        """检查并更新账号的封禁状态，返回是否有更新"""
-        print("开始执行update_ban_status()，准备检查所有账号状态...")
-        current_time = datetime.datetime.now()
-        status_updated = False
-        
-        for idx, account in enumerate(self.accounts):
-            account_name = account.get('name', '未命名')
-            print(f"正在处理第{idx+1}个账号: {account_name}...")
-            
-            # 更新状态栏显示当前正在检查的账号
-            self.root.after(0, lambda name=account_name, i=idx+1, total=len(self.accounts): 
-                           self.status_message.set(f"正在检查账号 ({i}/{total}): {name}"))
-            
-            # 为每个账号初始化追封字段（如果不存在）
-            if "extended_ban" not in account:
-                account["extended_ban"] = ""
-                
-            # 为每个账号初始化account_id字段（如果不存在）
-            if "account_id" not in account:
-                account["account_id"] = ""
-                status_updated = True  # 确保初始化了新字段时会保存
-            
-            # 首先检查本地封禁时间
-            local_ban_expired = False
-            if account["status"] and account["unban_time"]:
-                print(f"账号 {account_name} 目前为封禁状态，解封时间: {account['unban_time']}")
-                try:
-                    # 检查解封时间是否已过期
-                    unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
-                    if current_time >= unban_time:
-                        print(f"账号 {account_name} 本地解封时间已过期")
-                        local_ban_expired = True
-                except Exception as e:
-                    print(f"处理账号 {account_name} 解封时间时发生异常: {str(e)}")
-                    # 日期格式无效，标记为过期以重新判断
-                    local_ban_expired = True
+    def save_record(self, account):
+        """只保存单个账号（新增、修改或调整顺序），追加到增量日志"""
+        return self.core.save_record(account)
+    
+    def save_record_deletion(self, account):
+        """只记录单个账号的删除，追加到增量日志"""
+        return self.core.save_record_deletion(account)
+    
+    def on_core_event(self, event, data):
+        """核心逻辑的事件（可能在后台线程中），转为界面更新"""
+        if event == "status":
+            self.post_status(data["text"], clear_after=data.get("clear_after"))
+        elif event == "progress":
+            if data["phase"] == "ranks":
+                self.post_status(f"正在查询账号段位 ({data['done']}/{data['total']}): {data['name']}")
             else:
-                print(f"账号 {account_name} 目前为正常状态或无解封时间")
-                
-            # 基于本地封禁时间判断状态
-            if local_ban_expired:
-                old_status = account["status"]
-                account["status"] = False
-                account["unban_time"] = ""
-                account["extended_ban"] = ""
-                status_updated = True
-                print(f"账号 {account_name} 本地封禁已过期，设为未封禁")
-                
-                # 在主线程中更新UI显示
-                self.root.after(0, lambda i=idx: self.update_single_account_ui(i))
-        
-        print(f"所有账号处理完毕，状态更新: {status_updated}")
-        
-        # 如果有状态更新，保存到文件
-        if status_updated:
-            self.save_accounts()
-            
-        return status_updated
+                self.post_status(f"正在检查账号 ({data['done']}/{data['total']}): {data['name']}")
+        elif event == "error":
+            self.run_on_ui(lambda: messagebox.showerror(data["title"], data["message"]))
     
-    def save_accounts(self):
-        """保存账号数据到文件"""
-        try:
-            # 确保目录存在
-            directory = os.path.dirname(self.data_file)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory)
-            
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.accounts, f, ensure_ascii=False, indent=2)
-            print(f"数据已成功保存到: {self.data_file}")  # 添加调试信息
-            self.status_message.set(f"数据已保存")
-            self.root.after(3000, lambda: self.status_message.set(""))
-            return True
-        except Exception as e:
-            error_msg = f"保存失败: {str(e)}\n路径: {self.data_file}"
-            print(error_msg)  # 添加调试信息
-            messagebox.showerror("保存错误", error_msg)
-            self.status_message.set("数据保存失败")
-            return False
+    def post_status(self, text, clear_after=None):
+        """
+        更新状态栏文本，可在任意线程调用
+        同一周期内的多次更新只显示最后一条
+        clear_after: 指定毫秒数后清空状态栏
+        """
+        self.ui_queue.post(lambda: self.status_message.set(text), key="status")
+        if clear_after:
+            self.ui_queue.post(lambda: self.root.after(clear_after, lambda: self.status_message.set("")))
+    
+    def run_on_ui(self, callback):
+        """在主线程中执行回调：当前就是主线程时立即执行，否则提交到界面更新队列"""
+        if threading.current_thread() is threading.main_thread():
+            callback()
+        else:
+            self.ui_queue.post(callback)
     
     def create_widgets(self):
         """创建界面元素"""
@@ -476,6 +407,10 @@ class AccountManager:
         self.refresh_btn = ttk.Button(self.root, text="刷新状态", command=self.refresh_ban_status, width=10)
         self.refresh_btn.place(x=550, y=0)
         
+        # 停止按钮，刷新执行期间可用
+        self.stop_btn = ttk.Button(self.root, text="停止", command=self.stop_sweep, width=6, state="disabled")
+        self.stop_btn.place(x=630, y=0)
+        
         # 添加游戏赛季控件（位于刷新状态按钮后面）
         ttk.Label(self.root, text="游戏赛季:").place(x=700, y=5)
         season_entry = ttk.Entry(self.root, textvariable=self.season_var, width=5)
@@ -483,6 +418,12 @@ class AccountManager:
         # 绑定回车键事件，使按回车键时触发update_season并将焦点转移到主窗口
         season_entry.bind("<Return>", lambda event: [self.update_season(), self.root.focus_set()])
         
+        # 预取开关
+        ttk.Checkbutton(self.root, text="自动预取", variable=self.prefetch_var).place(x=810, y=2)
+        
+        # 诊断按钮，查看接口延迟、错误率和刷新吞吐量
+        ttk.Button(self.root, text="诊断", command=self.show_diagnostics, width=5).place(x=895, y=0)
+        
         # 创建状态栏
         status_bar = ttk.Label(self.root, textvariable=self.status_message, relief=tk.SUNKEN, anchor=tk.W)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
@@ -493,6 +434,9 @@ class AccountManager:
         self.list_frame = ttk.LabelFrame(self.root, text="账号列表")
         self.list_frame.place(x=10, y=10, width=950, height=680)  # 增加高度
         
+        # 创建搜索栏，位于表格上方
+        self.create_search_bar()
+        
         # 创建Treeview - 将note列移到id列后面
         columns = ("number", "name", "level", "fpp_rank", "tpp_rank", "status", "unban_time", "extended_ban", "phone", "id", "note")
         self.tree = ttk.Treeview(self.list_frame, columns=columns, show="headings", selectmode="browse")
@@ -527,8 +471,12 @@ class AccountManager:
         self.tree.column("note", width=145)  # 略微减小备注列宽度
         
         # 添加滚动条
-        scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical")
+        
+        # 差量渲染器负责表格内容和滚动条联动，行数较多时只渲染可见区域
+        self.tree_renderer = TreeRenderer(self.tree, scrollbar)
+        # 可见区域变化时预取可见的账号
+        self.tree_renderer.on_view_changed = self.schedule_view_prefetch
         
         # 放置组件
         self.tree.pack(side="left", fill="both", expand=True)
@@ -544,6 +492,33 @@ class AccountManager:
         self.tree.bind("<ButtonPress-1>", self.on_drag_start)
         self.tree.bind("<B1-Motion>", self.on_drag_motion)
         self.tree.bind("<ButtonRelease-1>", self.on_drag_release)
+        
+        # 鼠标悬停在某行上一段时间后预取该账号
+        self.tree.bind("<Motion>", self.on_tree_hover)
+        self.tree.bind("<Leave>", self.on_tree_hover)
+    
+    def create_search_bar(self):
+        """创建搜索过滤栏"""
+        search_frame = ttk.Frame(self.list_frame)
+        search_frame.pack(side="top", fill="x", padx=5, pady=(0, 5))
+        
+        ttk.Label(search_frame, text="搜索:").pack(side="left")
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=60)
+        search_entry.pack(side="left", padx=5)
+        # 每次输入都立即刷新过滤结果
+        self.search_var.trace_add("write", self.on_search_changed)
+        # 按Esc清空搜索条件
+        search_entry.bind("<Escape>", lambda event: self.search_var.set(""))
+        
+        ttk.Button(search_frame, text="清除", width=6, command=lambda: self.search_var.set("")).pack(side="left")
+        
+        # 提示支持的过滤语法
+        ttk.Label(search_frame, text="支持 status:banned  tier>=钻石5  unban<6h  level>=100",
+                  foreground="gray").pack(side="left", padx=10)
+    
+    def on_search_changed(self, *args):
+        """搜索条件变化时刷新表格"""
+        self.update_treeview()
     
     def create_account_form(self):
         """创建账号表单"""
@@ -651,9 +626,14 @@ class AccountManager:
         self.note_text = tk.Text(form_frame, width=34, height=3)
         self.note_text.grid(row=11, column=1, padx=10, pady=10, sticky="w")
         
+        # 段位走势 - 本赛季的段位历史
+        ttk.Label(form_frame, text="段位走势:").grid(row=12, column=0, padx=10, pady=5, sticky="w")
+        self.rank_sparkline = RankSparkline(form_frame)
+        self.rank_sparkline.grid(row=12, column=1, padx=10, pady=5, sticky="w")
+        
         # 按钮区域
         btn_frame = ttk.Frame(form_frame)
-        btn_frame.grid(row=12, column=0, columnspan=2, pady=20)
+        btn_frame.grid(row=13, column=0, columnspan=2, pady=10)
         
         ttk.Button(btn_frame, text="新建", command=self.clear_form).pack(side="left", padx=10)
         ttk.Button(btn_frame, text="保存", command=self.save_account).pack(side="left", padx=10)
@@ -684,16 +664,10 @@ class AccountManager:
             
         # 如果点击的是状态列，执行API查询
         if column_name == "status":
-            # 通过账号名称查找对应的账号索引
+            # 行ID就是账号的唯一标识
             account_name = str(values[1])  # 账号名称在第二列
-            account_index = None
-            for i, account in enumerate(self.accounts):
-                if str(account["name"]) == account_name:
-                    account_index = i
-                    break
-                    
-            if account_index is not None:
-                self.check_single_account_ban_status(account_index)
+            if self.store.get(item) is not None:
+                self.check_single_account_ban_status(item)
             else:
                 messagebox.showerror("错误", f"找不到账号: {account_name}")
             return
@@ -745,7 +719,8 @@ class AccountManager:
     
     def clear_form(self):
         """清空表单"""
-        self.current_account_id = None
+        self.current_account_uid = None
+        self.form_baseline = None
         self.name_var.set("")
         self.level_var.set("")  # 清空等级
         self.password_var.set("")
@@ -760,6 +735,7 @@ class AccountManager:
         
         # 清空备注文本框
         self.note_text.delete("1.0", tk.END)
+        self.rank_sparkline.clear()
         
         # 注意：不清空赛季值，保持当前设置
         
@@ -926,25 +902,122 @@ class AccountManager:
             messagebox.showwarning("警告", "账号名称不能为空")
             return
         
+        # 如果是更新现有账号
+        old_account = None
+        if getattr(self, 'current_account_uid', None) is not None:
+            # 获取原账号
+            old_account = self.store.get(self.current_account_uid)
+        if old_account is not None:
+            self.save_account_edits(old_account)
+            return
+        
         # 确保如果是封禁状态，强制计算一次解封时间
         if self.status_var.get():
             self.calculate_unban_time()
         
-        # 获取备注文本
-        note_text = self.note_text.get("1.0", tk.END).strip()
+        # 创建基本账号信息，初始化account_id字段为空字符串
+        account = self.form_fields()
+        account["account_id"] = ""
+        
+        # 添加新账号
+        # 如果是第一个账号，添加当前赛季值
+        if len(self.accounts) == 0 and self.season_var.get():
+            try:
+                account["season"] = int(self.season_var.get())
+            except ValueError:
+                pass
+            
+        # 初始化段位分数为0
+        account["tpp_rank_point"] = 0
+        account["fpp_rank_point"] = 0
+        
+        # 生成唯一标识
+        account["uid"] = uuid.uuid4().hex
+        
+        # 新账号显示在未排序列表的顶部：顺序键比现有最小值小1，其他账号不受影响
+        account["order"] = min((a["order"] for a in self.accounts), default=1.0) - 1.0
+        self.store.put(account)
+        
+        # 更新搜索索引
+        self.search_index.update(account)
+        
+        # 只保存这一个账号
+        self.save_record(account)
+        
+        # 更新表格
+        self.update_treeview()
+        
+        # 清空表单
+        self.clear_form()
+    
+    def save_account_edits(self, old_account):
+        """
+        保存对现有账号的修改：只提交表单中被修改过的字段
+        表单打开期间后台刷新写入的封禁状态、等级、段位和查询时间等其他字段保持不变；
+        被修改的字段在此期间也被刷新改动过时不覆盖，提示后显示最新数据
+        """
+        form_baseline = getattr(self, 'form_baseline', None)
+        if form_baseline is not None and form_baseline[0]["uid"] == old_account["uid"]:
+            loaded, baseline = form_baseline
+        else:
+            loaded, baseline = old_account, {field: old_account.get(field, "") for field in self.form_fields()}
+        
+        # 只有修改过封禁设置时才按封禁时长重新计算解封时间
+        ban_fields = ("status", "unban_time", "extended_ban")
+        if self.status_var.get() and any(self.form_fields()[field] != baseline[field] for field in ban_fields):
+            self.calculate_unban_time()
+        
+        form = self.form_fields()
+        changes = {field: value for field, value in form.items() if value != baseline[field]}
+        if not changes:
+            log.debug("账号 %s 没有修改", form["name"])
+            self.clear_form()
+            return
         
+        # 名称变更时清空account_id
+        if "name" in changes:
+            log.info("账号名称已变更: %s -> %s，清空account_id", loaded.get("name", ""), changes["name"])
+            changes["account_id"] = ""
+        
+        # 段位变更时分数设为0
+        for mode in ("tpp", "fpp"):
+            if f"{mode}_rank" in changes:
+                changes[f"{mode}_rank_point"] = 0
+                log.debug("%s段位已变更: %s -> %s，分数重置为0", mode.upper(),
+                          loaded.get(f"{mode}_rank", "未定级"), changes[f"{mode}_rank"])
+        
+        # 被修改的字段仍是打开表单时的值才提交，避免覆盖后台刷新在此期间写入的结果
+        expect = {field: loaded.get(field) for field in changes}
+        account = self.store.update(old_account["uid"], changes, expect=expect)
+        if account is None:
+            latest = self.store.get(old_account["uid"])
+            messagebox.showwarning("警告", "编辑期间该账号已被后台刷新修改，请确认最新数据后重新修改")
+            if latest is not None:
+                self.fill_form(latest)
+                self.update_extend_button_state()
+            return
+        
+        # 更新搜索索引
+        self.search_index.update(account)
+        
+        # 只保存这一个账号
+        self.save_record(account)
+        
+        # 更新表格
+        self.update_treeview()
+        
+        # 清空表单
+        self.clear_form()
+    
+    def form_fields(self):
+        """右侧表单中可编辑的账号字段"""
         # 获取等级（如果为空，则设为0）
         try:
             level = int(self.level_var.get()) if self.level_var.get() else 0
         except ValueError:
             level = 0
-        
-        # 初始化account_id字段为空字符串
-        account_id = ""
-        
-        # 创建基本账号信息
-        account = {
-            "name": name,
+        return {
+            "name": str(self.name_var.get()).strip(),
             "password": self.password_var.get(),
             "tpp_rank": self.tpp_rank_var.get(),
             "fpp_rank": self.fpp_rank_var.get(),
@@ -954,90 +1027,13 @@ class AccountManager:
             "unban_time": self.unban_time_var.get(),
             "extended_ban": self.extended_ban_var.get(),
             "level": level,
-            "note": note_text,
-            "account_id": account_id
+            # 获取备注文本
+            "note": self.note_text.get("1.0", tk.END).strip(),
         }
-        
-        # 如果是更新现有账号
-        if hasattr(self, 'current_account_id') and self.current_account_id is not None:
-            # 获取原账号
-            old_account = self.accounts[self.current_account_id]
-            
-            # 检查名称是否变更
-            old_name = old_account.get("name", "")
-            # 如果名称没有变化，保留原来的account_id值
-            if old_name == name:
-                account["account_id"] = old_account.get("account_id", "")
-                print(f"账号名称未变更，保留原有account_id: {account['account_id']}")
-            else:
-                print(f"账号名称已变更: {old_name} -> {name}，清空account_id")
-            
-            # 处理TPP段位分数
-            old_tpp_rank = old_account.get("tpp_rank", "未定级")
-            new_tpp_rank = account["tpp_rank"]
-            
-            if old_tpp_rank == new_tpp_rank:
-                # 如果段位没变，保留原分数
-                account["tpp_rank_point"] = old_account.get("tpp_rank_point", 0)
-                print(f"TPP段位未变更，保留原分数: {account['tpp_rank_point']}")
-            else:
-                # 段位变更，分数设为0
-                account["tpp_rank_point"] = 0
-                print(f"TPP段位已变更: {old_tpp_rank} -> {new_tpp_rank}，分数重置为0")
-            
-            # 处理FPP段位分数
-            old_fpp_rank = old_account.get("fpp_rank", "未定级")
-            new_fpp_rank = account["fpp_rank"]
-            
-            if old_fpp_rank == new_fpp_rank:
-                # 如果段位没变，保留原分数
-                account["fpp_rank_point"] = old_account.get("fpp_rank_point", 0)
-                print(f"FPP段位未变更，保留原分数: {account['fpp_rank_point']}")
-            else:
-                # 段位变更，分数设为0
-                account["fpp_rank_point"] = 0
-                print(f"FPP段位已变更: {old_fpp_rank} -> {new_fpp_rank}，分数重置为0")
-            
-            # 保留赛季字段
-            if "season" in old_account:
-                account["season"] = old_account["season"]
-                
-            # 更新现有账号
-            self.accounts[self.current_account_id] = account
-        else:
-            # 添加新账号
-            # 如果是第一个账号，添加当前赛季值
-            if len(self.accounts) == 0 and self.season_var.get():
-                try:
-                    account["season"] = int(self.season_var.get())
-                except ValueError:
-                    pass
-                
-            # 初始化段位分数为0
-            account["tpp_rank_point"] = 0
-            account["fpp_rank_point"] = 0
-            
-            # 如果未排序状态，新账号添加到列表顶部
-            if not self.sort_column:
-                self.accounts.insert(0, account)
-                # 更新自定义顺序
-                self.save_custom_order()
-            else:
-                # 处于排序状态，直接添加到列表末尾，排序会在update_treeview中进行
-                self.accounts.append(account)
-        
-        # 保存到文件
-        self.save_accounts()
-        
-        # 更新表格
-        self.update_treeview()
-        
-        # 清空表单
-        self.clear_form()
     
     def delete_account(self):
         """删除账号"""
-        if not hasattr(self, 'current_account_id') or self.current_account_id is None:
+        if getattr(self, 'current_account_uid', None) is None:
             messagebox.showwarning("警告", "请先选择要删除的账号")
             return
         
@@ -1052,36 +1048,23 @@ class AccountManager:
         values = item["values"]
         selected_name = str(values[1])
         
-        # 再次确认current_account_id指向的是正确的账号
-        if str(self.accounts[self.current_account_id]["name"]) != selected_name:
+        # 再次确认current_account_uid指向的是正确的账号
+        if selection[0] != self.current_account_uid or self.store.get(self.current_account_uid) is None:
             messagebox.showerror("错误", "账号选择不匹配，请重新选择要删除的账号")
             return
         
         if messagebox.askyesno("确认", f"确定要删除账号 '{selected_name}' 吗？"):
-            del self.accounts[self.current_account_id]
-            self.save_accounts()
+            account = self.store.delete(self.current_account_uid)
+            if account is not None:
+                self.search_index.remove(account)
+                self.save_record_deletion(account)
             self.update_treeview()
             self.clear_form()
     
     def update_treeview(self):
         """更新账号列表"""
-        # 清空现有数据
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # 计算统计数据
-        total_accounts = len(self.accounts)
-        banned_accounts = sum(1 for account in self.accounts if account["status"])
-        unbanned_accounts = total_accounts - banned_accounts
-        extended_bans = sum(1 for account in self.accounts if account.get("extended_ban") == "追3天")
-        accounts_with_level = sum(1 for account in self.accounts if account.get("level", 0) > 0)
-        
-        # 更新统计信息
-        stats_text = f"账号列表 (共{total_accounts}个账号，封禁中{banned_accounts}个，未封禁{unbanned_accounts}个，追封{extended_bans}个)"
-        self.list_frame.configure(text=stats_text)
-        
-        # 排序账号数据
-        sorted_accounts = self.accounts.copy()
+        # 排序账号数据，未排序时按顺序键排列
+        sorted_accounts = sorted(self.accounts, key=lambda account: account["order"])
         
         # 检查是否所有账号都是未封禁状态
         all_unbanned = all(not account["status"] for account in sorted_accounts)
@@ -1162,134 +1145,148 @@ class AccountManager:
                     reverse=self.sort_reverse
                 )
         
-        # 添加账号数据，包括ID列和追封列
-        for i, account in enumerate(sorted_accounts):
-            status = "❌" if account["status"] else "✅"
-            # 确保账号对象有备注字段、ID字段和追封字段
-            note = account.get("note", "")
-            account_id = account.get("id", "")
-            extended_ban = account.get("extended_ban", "")
-            
-            # 获取等级，如果等级为0则显示为空
-            level_display = ""
-            if "level" in account and account["level"] > 0:
-                level_display = str(account["level"])
-            
-            # 格式化解封时间为简略格式
-            unban_time_display = ""
-            if account["status"] and account["unban_time"]:
-                try:
-                    unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
-                    unban_time_display = unban_time.strftime("%m-%d %H:%M")
-                except:
-                    unban_time_display = account["unban_time"]
-            
-            # 构建TPP段位显示，结合段位和分数
-            tpp_rank_display = account.get("tpp_rank", "未定级")
-            tpp_rank_point = account.get("tpp_rank_point", 0)
-            if tpp_rank_display != "未定级" and tpp_rank_point > 0:
-                tpp_rank_display = f"{tpp_rank_display}({tpp_rank_point})"
-            
-            # 构建FPP段位显示，结合段位和分数
-            fpp_rank_display = account.get("fpp_rank", "未定级")
-            fpp_rank_point = account.get("fpp_rank_point", 0)
-            if fpp_rank_display != "未定级" and fpp_rank_point > 0:
-                fpp_rank_display = f"{fpp_rank_display}({fpp_rank_point})"
-            
-            # 插入数据的顺序需要与列顺序一致
-            self.tree.insert("", "end", values=(
-                i + 1,  # 序号从1开始
-                str(account["name"]),
-                level_display,  # 等级列，没有值时为空
-                fpp_rank_display,  # 使用组合的FPP段位显示
-                tpp_rank_display,  # 使用组合的TPP段位显示
-                status,
-                unban_time_display,
-                str(extended_ban),  # 追封列
-                str(account["phone"]),
-                str(account_id),
-                str(note)
-            ))
+        # 按搜索条件过滤
+        search_query = self.search_var.get().strip()
+        if search_query:
+            sorted_accounts = self.search_index.filter_accounts(search_query, sorted_accounts)
+        self.visible_count = len(sorted_accounts)
+        
+        # 只把与上次显示不同的部分写入表格
+        rows = [(account["uid"], self.format_account_row(account, i + 1))
+                for i, account in enumerate(sorted_accounts)]
+        self.tree_renderer.render(rows)
         
         # 更新统计信息
         self.update_stats_info()
     
+    def format_account_row(self, account, number):
+        """生成账号在表格中的一行数据，顺序与列顺序一致"""
+        status = "❌" if account["status"] else "✅"
+        if account.get("uid") in self.checking_uids:
+            status = "查询中…"
+        
+        # 获取等级，如果等级为0则显示为空
+        level_display = ""
+        if "level" in account and account["level"] > 0:
+            level_display = str(account["level"])
+        
+        # 格式化解封时间为简略格式
+        unban_time_display = ""
+        if account["status"] and account["unban_time"]:
+            try:
+                unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
+                unban_time_display = unban_time.strftime("%m-%d %H:%M")
+            except:
+                unban_time_display = account["unban_time"]
+        
+        # 构建TPP段位显示，结合段位和分数
+        tpp_rank_display = account.get("tpp_rank", "未定级")
+        tpp_rank_point = account.get("tpp_rank_point", 0)
+        if tpp_rank_display != "未定级" and tpp_rank_point > 0:
+            tpp_rank_display = f"{tpp_rank_display}({tpp_rank_point})"
+        
+        # 构建FPP段位显示，结合段位和分数
+        fpp_rank_display = account.get("fpp_rank", "未定级")
+        fpp_rank_point = account.get("fpp_rank_point", 0)
+        if fpp_rank_display != "未定级" and fpp_rank_point > 0:
+            fpp_rank_display = f"{fpp_rank_display}({fpp_rank_point})"
+        
+        return (
+            number,  # 序号从1开始
+            str(account["name"]),
+            level_display,  # 等级列，没有值时为空
+            fpp_rank_display,  # 使用组合的FPP段位显示
+            tpp_rank_display,  # 使用组合的TPP段位显示
+            status,
+            unban_time_display,
+            str(account.get("extended_ban", "")),  # 追封列
+            str(account["phone"]),
+            str(account.get("id", "")),
+            str(account.get("note", ""))
+        )
+    
     def on_account_selected(self, event):
         """选中账号时的处理"""
         selection = self.tree.selection()
         if not selection:
             return
         
-        item = self.tree.item(selection[0])
-        values = item["values"]
-        selected_name = str(values[1])  # 确保selected_name是字符串类型
+        # 行ID就是账号的唯一标识
+        account = self.store.get(selection[0])
+        if account is not None:
+            self.current_account_uid = selection[0]
+            self.fill_form(account)
+            # 数据过期时在后台刷新，结果返回后更新表单
+            self.prefetch_account(selection[0])
         
-        # 查找对应的账号
-        for i, account in enumerate(self.accounts):
-            if str(account["name"]) == selected_name:  # 确保比较时两边都是字符串
-                self.current_account_id = i
-                self.name_var.set(account["name"])
-                
-                # 设置等级，如果等级为0则显示为空
-                level_value = ""
-                if "level" in account and account["level"] > 0:
-                    level_value = str(account["level"])
-                self.level_var.set(level_value)  # 设置等级
-                self.password_var.set(account["password"])
-                self.tpp_rank_var.set(account["tpp_rank"])
-                self.fpp_rank_var.set(account["fpp_rank"])
-                self.phone_var.set(account["phone"])
-                self.id_var.set(account.get("id", ""))  # 设置ID
-                self.status_var.set(account["status"])
-                self.unban_time_var.set(account["unban_time"])
-                self.extended_ban_var.set(account.get("extended_ban", ""))  # 设置追封状态
-                
-                # 设置备注（如果有）- 使用Text控件
-                self.note_text.delete("1.0", tk.END)
-                if "note" in account and account["note"]:
-                    self.note_text.insert("1.0", account["note"])
-                
-                # 根据状态和解封时间设置封禁时长
-                if not account["status"]:
-                    self.ban_duration_var.set("无")
-                elif account["unban_time"]:
-                    # 尝试根据解封时间推断封禁时长
-                    try:
-                        unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
-                        now = datetime.datetime.now()
-                        delta = unban_time - now
-                        hours = delta.total_seconds() / 3600
-                        
-                        # 检查是否匹配标准时长
-                        if hours <= 0:
-                            self.ban_duration_var.set("无")
-                        elif abs(hours - 24) < 1:
-                            self.ban_duration_var.set("24小时")
-                        elif abs(hours - 72) < 1:
-                            self.ban_duration_var.set("72小时")
-                        elif abs(hours - 7*24) < 3:
-                            self.ban_duration_var.set("7天")
-                        elif abs(hours - 15*24) < 5:
-                            self.ban_duration_var.set("15天")
-                        elif abs(hours - 30*24) < 10:
-                            self.ban_duration_var.set("30天")
-                        else:
-                            self.ban_duration_var.set("自定义")
-                    except:
-                        # 如果解析失败，使用自定义
-                        self.ban_duration_var.set("自定义")
-                else:
-                    self.ban_duration_var.set("24小时")
-                
-                # 确保season_var已更新为当前设置的赛季值（从第一个账户读取）
-                if self.accounts and len(self.accounts) > 0 and "season" in self.accounts[0]:
-                    self.season_var.set(str(self.accounts[0]["season"]))
-                
-                break
-                
         # 更新"追3天"按钮状态
         self.update_extend_button_state()
     
+    def fill_form(self, account):
+        """用账号数据填充右侧表单"""
+        self.name_var.set(account["name"])
+    
+        # 设置等级，如果等级为0则显示为空
+        level_value = ""
+        if "level" in account and account["level"] > 0:
+            level_value = str(account["level"])
+        self.level_var.set(level_value)  # 设置等级
+        self.password_var.set(account["password"])
+        self.tpp_rank_var.set(account["tpp_rank"])
+        self.fpp_rank_var.set(account["fpp_rank"])
+        self.phone_var.set(account["phone"])
+        self.id_var.set(account.get("id", ""))  # 设置ID
+        self.status_var.set(account["status"])
+        self.unban_time_var.set(account["unban_time"])
+        self.extended_ban_var.set(account.get("extended_ban", ""))  # 设置追封状态
+    
+        # 设置备注（如果有）- 使用Text控件
+        self.note_text.delete("1.0", tk.END)
+        if "note" in account and account["note"]:
+            self.note_text.insert("1.0", account["note"])
+        
+        # 本赛季的段位走势
+        self.show_rank_sparkline(account["uid"])
+    
+        # 根据状态和解封时间设置封禁时长
+        if not account["status"]:
+            self.ban_duration_var.set("无")
+        elif account["unban_time"]:
+            # 尝试根据解封时间推断封禁时长
+            try:
+                unban_time = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
+                now = datetime.datetime.now()
+                delta = unban_time - now
+                hours = delta.total_seconds() / 3600
+            
+                # 检查是否匹配标准时长
+                if hours <= 0:
+                    self.ban_duration_var.set("无")
+                elif abs(hours - 24) < 1:
+                    self.ban_duration_var.set("24小时")
+                elif abs(hours - 72) < 1:
+                    self.ban_duration_var.set("72小时")
+                elif abs(hours - 7*24) < 3:
+                    self.ban_duration_var.set("7天")
+                elif abs(hours - 15*24) < 5:
+                    self.ban_duration_var.set("15天")
+                elif abs(hours - 30*24) < 10:
+                    self.ban_duration_var.set("30天")
+                else:
+                    self.ban_duration_var.set("自定义")
+            except:
+                # 如果解析失败，使用自定义
+                self.ban_duration_var.set("自定义")
+        else:
+            self.ban_duration_var.set("24小时")
+    
+        # 确保season_var已更新为当前设置的赛季值（从第一个账户读取）
+        if self.accounts and len(self.accounts) > 0 and "season" in self.accounts[0]:
+            self.season_var.set(str(self.accounts[0]["season"]))
+        
+        # 填充后的表单内容，保存时与之比较得到用户修改过的字段
+        self.form_baseline = (account, self.form_fields())
+    
     def treeview_sort_column(self, column):
         """对treeview的列进行排序"""
         # 如果点击的是当前排序列，则切换排序方向
@@ -1383,26 +1380,18 @@ class AccountManager:
         if not item:
             return
             
-        # 记录拖动的项目
+        # 记录拖动的项目（行ID即账号的唯一标识）
         self.drag_item = item
         
-        # 找到该项目在原始数据中的索引
-        values = self.tree.item(item, "values")
-        if not values:
-            return
-            
-        selected_name = str(values[1])
-        for i, account in enumerate(self.accounts):
-            if str(account["name"]) == selected_name:
-                self.drag_source_index = i
-                break
+        # 记录被拖动的账号（账号不存在时不进行拖动）
+        self.drag_source_uid = item if self.store.get(item) is not None else None
                 
         # 设置视觉反馈 - 直接修改鼠标样式
         self.tree.config(cursor="hand2")
     
     def on_drag_motion(self, event):
         """拖动行时的处理"""
-        if not self.drag_item or self.drag_source_index is None:
+        if not self.drag_item or self.drag_source_uid is None:
             return
             
         # 获取当前鼠标下方的行
@@ -1410,71 +1399,71 @@ class AccountManager:
         if not target_item or target_item == self.drag_item:
             return
         
+        # 目标行没有变化时无需处理
+        if target_item == self.drag_highlight_item:
+            return
+        
         # 保持鼠标样式为拖动样式
         self.tree.config(cursor="hand2")
         
-        # 尝试高亮目标行
+        # 只修改上一个高亮行和新的目标行
         try:
-            # 移除所有高亮
-            for item in self.tree.get_children():
-                self.tree.item(item, tags=())
-                
-            # 高亮目标行
-            if target_item and target_item != self.drag_item:
-                self.tree.item(target_item, tags=('highlight',))
-                
-            # 确保tag配置存在
-            if not self.tag_exists('highlight'):
-                self.tree.tag_configure('highlight', background='#ECECEC')
+            self.clear_drag_highlight()
+            self.tree.item(target_item, tags=('highlight',))
+            self.drag_highlight_item = target_item
         except Exception as e:
             # 忽略高亮过程中的错误，保持基本拖动功能
-            print(f"高亮错误: {str(e)}")
+            log.error("高亮错误: %s", e)
+    
+    def clear_drag_highlight(self):
+        """清除拖动时的高亮行"""
+        item = self.drag_highlight_item
+        self.drag_highlight_item = None
+        # 虚拟滚动时高亮行可能已不在表格中
+        if item and self.tree.exists(item):
+            self.tree.item(item, tags=())
     
     def on_drag_release(self, event):
         """释放鼠标完成拖动"""
         # 恢复正常鼠标样式
         self.tree.config(cursor="")
         
-        # 清除所有高亮
+        # 清除高亮
         try:
-            for item in self.tree.get_children():
-                self.tree.item(item, tags=())
+            self.clear_drag_highlight()
         except:
             pass
         
-        if not self.drag_item or self.drag_source_index is None:
+        if not self.drag_item or self.drag_source_uid is None:
+            self.drag_item = None
+            self.drag_source_uid = None
             return
             
         # 获取释放时鼠标下方的行
         target_item = self.tree.identify_row(event.y)
         if not target_item or target_item == self.drag_item:
             self.drag_item = None
-            self.drag_source_index = None
+            self.drag_source_uid = None
             return
             
         # 获取目标行的索引
         try:
-            values = self.tree.item(target_item, "values")
-            if not values:
+            account = self.store.get(self.drag_source_uid)
+            target_account = self.store.get(target_item)
+            if account is None or target_account is None:
                 self.drag_item = None
-                self.drag_source_index = None
+                self.drag_source_uid = None
                 return
                 
-            target_name = str(values[1])
-            target_index = None
-            for i, account in enumerate(self.accounts):
-                if str(account["name"]) == target_name:
-                    target_index = i
-                    break
-                    
-            if target_index is None:
+            # 调整账号顺序：只修改被拖动账号的顺序键
+            moving_down = account["order"] < target_account["order"]
+            order = self.core.order_key_beside(target_account, after=moving_down, exclude=account)
+            account = self.store.update(account["uid"], {"order": order})
+            if account is None:
+                # 拖动过程中账号被删除
                 self.drag_item = None
-                self.drag_source_index = None
+                self.drag_source_uid = None
                 return
-                
-            # 调整账号顺序
-            account = self.accounts.pop(self.drag_source_index)
-            self.accounts.insert(target_index, account)
             
             # 清除任何已有的排序状态
             if self.sort_column:
@@ -1492,33 +1481,142 @@ class AccountManager:
                 # 额外的状态提示
                 self.status_message.set(f"手动排序模式已启用，'{old_sort_column}'列排序已取消")
                 self.root.after(3000, lambda: self.status_message.set(""))
+                
+                # 显示顺序整体变化，重新生成表格
+                self.update_treeview()
+            else:
+                # 未排序时表格顺序与账号列表一致，只需移动被拖动的行
+                self.move_account_row(self.drag_item, self.tree_renderer.index_of(target_item))
             
-            # 保存自定义顺序
-            self.save_custom_order()
-            
-            # 重新加载表格
-            self.update_treeview()
+            # 只保存被移动的账号
+            self.save_record(account)
             
             # 显示状态信息
             self.status_message.set(f"已调整账号 '{account['name']}' 的位置")
             self.root.after(3000, lambda: self.status_message.set(""))
         except Exception as e:
-            print(f"拖动处理错误: {str(e)}")
+            log.error("拖动处理错误: %s", e)
             
         # 重置拖放状态
         self.drag_item = None
-        self.drag_source_index = None
+        self.drag_source_uid = None
+    
+    def move_account_row(self, uid, position):
+        """将表格中的一行移动到指定位置，只刷新序号发生变化的行"""
+        if position is None:
+            return
+        moved_range = self.tree_renderer.move_row(uid, position)
+        if not moved_range:
+            return
+        start, end = moved_range
+        for pos in range(start, end + 1):
+            iid = self.tree_renderer.iid_at(pos)
+            values = self.tree_renderer.values_of(iid)
+            if values[0] != pos + 1:
+                self.tree_renderer.update_row(iid, (pos + 1,) + tuple(values[1:]))
+    
+    def start_api_server(self):
+        """启动本机HTTP接口，供其他工具读取账号状态和触发刷新"""
+        port = os.environ.get("ACCOUNT_MANAGER_API_PORT", "").strip()
+        if not port:
+            return
+        try:
+            self.api_server = AccountApiServer(
+                self.core, port=int(port),
+                refresh=self.on_remote_refresh, refresh_account=self.on_remote_refresh_account
+            )
+            self.api_server.start()
+        except (OSError, ValueError) as e:
+            self.api_server = None
+            log.warning("本机接口启动失败: %s", e)
+    
+    def on_remote_refresh(self, kind):
+        """本机接口或其他实例请求刷新（在请求线程中），交给主线程启动以便更新按钮和状态栏"""
+        if self.engine.is_busy():
+            return False
+        sweep = self.core.sweep_for(kind)
+        self.ui_queue.post(lambda: self.start_sweep(sweep, "正在按外部请求刷新账号状态..."))
+        return True
+    
+    def on_remote_refresh_account(self, uid):
+        """本机接口或其他实例请求刷新单个账号（在请求线程中）"""
+        self.ui_queue.post(lambda: self.check_single_account_ban_status(uid))
+        return True
     
-    def save_custom_order(self):
-        """保存用户自定义的顺序"""
-        # 保存每个账号的新序号
-        for i, account in enumerate(self.accounts):
-            account_name = str(account["name"])
-            self.custom_order[account_name] = i
+    def call_on_ui(self, callback, timeout=30):
+        """在主线程中执行回调并等待结果（在后台线程中调用），回调抛出的异常原样抛出"""
+        done = threading.Event()
+        outcome = {}
         
-        # 保存到文件
-        self.save_accounts()
-
+        def run():
+            try:
+                outcome["result"] = callback()
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+        
+        self.ui_queue.post(run)
+        if not done.wait(timeout):
+            raise TimeoutError("界面没有响应")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("result")
+    
+    def activate_window(self):
+        """其他实例启动时把窗口切到前台"""
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+    
+    def import_accounts_file(self, path):
+        """导入其他实例转发来的账号文件（在主线程中执行）"""
+        added, replaced = self.core.import_accounts(path)
+        self.search_index.sync(self.accounts)
+        self.update_treeview()
+        self.status_message.set(f"已导入账号：新增 {added} 个，替换 {replaced} 个")
+        self.root.after(3000, lambda: self.status_message.set(""))
+        return {"added": added, "replaced": replaced}
+    
+    def show_diagnostics(self):
+        """打开诊断窗口，已打开时切到前台"""
+        if self.diagnostics_window is not None and self.diagnostics_window.is_open():
+            self.diagnostics_window.lift()
+            return
+        # 打开时才导入，文件对话框等模块不计入启动时间
+        from diagnostics_window import DiagnosticsWindow
+        self.diagnostics_window = DiagnosticsWindow(self.root, self.core.metrics, profiler=self.profiler,
+                                                    on_profiling=self.on_profiling_toggled)
+    
+    def on_profiling_toggled(self, enabled):
+        """
+        诊断窗口中开启或停止性能分析时，同时开启或停止主循环阻塞检测
+        启动时已开启的阻塞检测(如设置了ACCOUNT_MANAGER_STALL_MS)不随性能分析停止
+        """
+        if enabled and self.stall_detector is None:
+            self.stall_detector = StallDetector(self.root)
+            self.stall_detector.start()
+            self.stall_detector_from_toggle = True
+        elif not enabled and self.stall_detector_from_toggle:
+            self.stall_detector.stop()
+            self.stall_detector = None
+            self.stall_detector_from_toggle = False
+    
+    def on_close(self):
+        """关闭窗口前停止正在执行的刷新和界面更新队列"""
+        if self.diagnostics_window is not None and self.diagnostics_window.is_open():
+            self.diagnostics_window.close()
+        if self.stall_detector is not None:
+            self.stall_detector.stop()
+        # 写出性能分析结果
+        self.profiler.stop()
+        if self.api_server is not None:
+            self.api_server.stop()
+        self.instance_server.stop()
+        self.core.shutdown()
+        self.ui_queue.stop()
+        self.root.destroy()
+    
     def tag_exists(self, tag_name):
         """检查tag是否已在树视图中配置"""
         try:
@@ -1559,101 +1657,13 @@ class AccountManager:
             else:
                 self.duration_radios["追3天"].configure(state="disabled")
         except Exception as e:
-            print(f"更新追3天按钮状态出错: {str(e)}")
+            log.error("更新追3天按钮状态出错: %s", e)
             # 出错时禁用按钮
             try:
                 self.duration_radios["追3天"].configure(state="disabled")
             except:
                 pass
 
-    # 添加网络请求功能来查询封禁状态
-    def check_ban_status_online(self, player_id):
-        """
-        通过网络接口查询账号的封禁状态
-        返回: (是否封禁, 是否查询成功, 玩家等级, account_id)
-        """
-        if not player_id:
-            return False, False, 0, None
-            
-        try:
-            # 调用独立的API查询函数
-            return self.query_ban_api(player_id)
-        except Exception as e:
-            print(f"查询封禁状态出错: {str(e)}")
-            return False, False, 0, None
-            
-    def query_ban_api(self, player_id):
-        """
-        独立的API查询函数，以便于未来更换API时只需修改此函数
-        返回: (是否封禁, 是否查询成功, 玩家等级, account_id)
-        """
-        url = f"https://apiv1.pubg.plus/steam/player/banv2?player_id={player_id}"
-        print(f"正在请求API: {url}")
-        try:
-            # 打印详细的请求信息
-            print(f"开始查询玩家 {player_id} 的封禁状态...")
-            
-            # 添加请求头，模拟浏览器
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)  # 增加超时时间到10秒
-            print(f"API响应状态码: {response.status_code}")
-            
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    # 调试用，只打印部分数据，避免数据过大
-                    if "player" in data:
-                        player_info = data["player"].copy()
-                        if "matches" in data:
-                            data_debug = data.copy()
-                            data_debug["matches"] = f"[{len(data['matches'])} matches]"
-                            print(f"API返回数据: {data_debug}")
-                        else:
-                            print(f"API返回数据: {data}")
-                    else:
-                        print(f"API返回数据: {data}")
-                    
-                    # 初始化等级为0和account_id为None
-                    player_level = 0
-                    account_id = None
-                    
-                    # 获取API返回的account_id
-                    if "player" in data and "id" in data["player"]:
-                        account_id = data["player"]["id"]
-                        print(f"从API获取到account_id: {account_id}")
-                    
-                    # 如果有player信息，计算等级
-                    if "player" in data and "tier" in data["player"] and "level" in data["player"]:
-                        tier = data["player"]["tier"]
-                        level = data["player"]["level"]
-                        # 根据规则计算等级: (tier-1)*500+level
-                        player_level = (tier - 1) * 500 + level
-                        print(f"玩家等级信息: tier={tier}, level={level}, 计算后等级={player_level}")
-                    
-                    if "ban" in data and "banType" in data["ban"]:
-                        # 检查封禁状态: TemporaryBan表示封禁，Innocent表示未封禁
-                        ban_type = data["ban"]["banType"]
-                        is_banned = ban_type == "TemporaryBan"
-                        print(f"账号 {player_id} 查询结果: ban_type={ban_type}, {'已封禁' if is_banned else '未封禁'}")
-                        return is_banned, True, player_level, account_id
-                    else:
-                        print(f"API返回数据格式错误，缺少预期字段: {data}")
-                except Exception as e:
-                    print(f"解析API响应JSON出错: {str(e)}")
-                    print(f"原始响应内容: {response.text[:500]}...") # 只打印前500个字符
-            else:
-                print(f"API请求失败，状态码: {response.status_code}")
-                print(f"响应内容: {response.text[:500]}...") # 只打印前500个字符
-        except Exception as e:
-            print(f"API请求异常: {str(e)}")
-            import traceback
-            traceback.print_exc()  # 打印详细的异常堆栈信息
-            
-        return False, False, 0, None
-
     def update_stats_info(self):
         """更新统计信息"""
         total_accounts = len(self.accounts)
@@ -1664,339 +1674,181 @@ class AccountManager:
         
         # 更新统计信息文本
         stats_text = f"账号列表 (共{total_accounts}个账号，封禁中{banned_accounts}个，未封禁{unbanned_accounts}个，追封{extended_bans}个)"
+        if self.search_var.get().strip():
+            stats_text += f" - 筛选出{self.visible_count}个"
         self.list_frame.configure(text=stats_text)
     
     def refresh_ban_status(self):
         """刷新封禁状态并更新界面"""
-        # 如果后台任务正在运行，不再启动新任务
-        if self.background_task_running:
-            self.status_message.set("正在检查账号状态，请稍候...")
-            return
-            
-        # 禁用刷新按钮
-        self.refresh_btn.configure(state="disabled")
-        
-        # 显示正在刷新的提示
-        self.status_message.set("正在刷新账号状态...")
-        self.root.update()  # 强制更新界面以显示提示消息
-        
-        # 启动后台检查任务，现在只检查本地时间
-        self.background_task_running = True
-        
-        def run_local_check():
-            try:
-                # 执行状态更新 - 只根据本地时间判断
-                updated_ban = self.update_ban_status()
-                
-                # 执行段位更新
-                print("封禁状态检查完成，开始查询段位信息...")
-                updated_rank = self.update_account_ranks()
-                
-                # 在主线程中更新UI
-                self.root.after(0, lambda: self.finish_background_check(updated_ban, updated_rank))
-            except Exception as e:
-                print(f"后台检查任务异常: {str(e)}")
-                # 在主线程中更新状态
-                self.root.after(0, lambda: self.status_message.set(f"检查过程出错: {str(e)}"))
-                self.background_task_running = False
-        
-        # 启动后台线程
-        threading.Thread(target=run_local_check, daemon=True).start()
-        
-        # 延迟启用刷新按钮，即使任务还未完成
-        self.root.after(5000, lambda: self.refresh_btn.configure(state="normal"))
+        # 刷新在后台执行，按钮在结束前保持禁用，可通过停止按钮中止
+        self.start_sweep(self.core.full_sweep, "正在刷新账号状态...")
+
+    def refresh_rank_status(self):
+        """刷新段位状态并更新界面"""
+        self.start_sweep(self.core.rank_sweep, "正在查询账号段位...")
 
-    def query_rank_api(self, account_id):
+    def check_single_account_ban_status(self, uid):
         """
-        查询账号的段位信息
-        account_id: 账号的account_id
-        返回: (是否成功, tpp段位信息, fpp段位信息)
-            段位信息格式为字典: {"tier": 段位名称, "subTier": 子段位, "rankPoint": 分数}
-            如: {"tier": "Gold", "subTier": "4", "rankPoint": 2165}
+        在后台查询单个账号的封禁状态和段位，不阻塞界面
+        查询期间该行显示"查询中…"，多个账号可以同时查询，结果返回后只刷新对应的行
         """
-        if not account_id:
-            print("账号没有account_id，无法查询段位")
-            return False, None, None
+        account = self.store.get(uid)
+        if account is None:
+            return
             
-        # 从第一个账户读取season字段，如果不存在则使用默认值35
-        season_num = 35  # 默认赛季
-        if self.accounts and len(self.accounts) > 0:
-            # 检查第一个账户是否有season字段
-            if "season" in self.accounts[0]:
-                season_num = self.accounts[0]["season"]
-                print(f"从accounts.json中读取赛季: {season_num}")
-            else:
-                # 没有找到season字段，写入默认值
-                self.accounts[0]["season"] = season_num
-                print(f"accounts.json中未找到season字段，写入默认值: {season_num}")
-                self.save_accounts()
+        account_name = account.get('name', '未命名')
+        # 与本机接口、进程间命令相同：有account_id时按account_id查询，否则按玩家ID
+        player_id = account.get('account_id') or account.get('id')
         
-        # 构建season参数字符串
-        season = f"division.bro.official.pc-2018-{season_num}"
-        url = f"https://apiv1.pubg.plus/steam/player/season_r?acc_id={account_id}&season={season}"
-        print(f"正在请求段位API: {url}")
+        if not player_id:
+            messagebox.showinfo("提示", f"账号 {account_name} 没有设置ID，无法查询API")
+            return
         
-        try:
-            # 添加请求头，模拟浏览器
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            print(f"段位API响应状态码: {response.status_code}")
+        if uid in self.checking_uids:
+            self.status_message.set(f"账号 {account_name} 正在查询中，请稍候...")
+            return
             
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    print(f"段位API返回数据: {data}")
-                    
-                    # 初始化返回值
-                    tpp_rank = None
-                    fpp_rank = None
-                    
-                    if "attributes" in data and "rankedGameModeStats" in data["attributes"]:
-                        stats = data["attributes"]["rankedGameModeStats"]
-                        
-                        # 获取TPP段位信息
-                        if "squad" in stats:
-                            squad_data = stats["squad"]
-                            if "currentTier" in squad_data and "currentRankPoint" in squad_data:
-                                current_tier = squad_data["currentTier"]
-                                rank_point = squad_data["currentRankPoint"]
-                                
-                                tpp_rank = {
-                                    "tier": current_tier["tier"],
-                                    "subTier": current_tier["subTier"],
-                                    "rankPoint": rank_point
-                                }
-                                print(f"获取到TPP段位: {tpp_rank}")
-                        
-                        # 获取FPP段位信息
-                        if "squad-fpp" in stats:
-                            fpp_data = stats["squad-fpp"]
-                            if "currentTier" in fpp_data and "currentRankPoint" in fpp_data:
-                                current_tier = fpp_data["currentTier"]
-                                rank_point = fpp_data["currentRankPoint"]
-                                
-                                fpp_rank = {
-                                    "tier": current_tier["tier"],
-                                    "subTier": current_tier["subTier"],
-                                    "rankPoint": rank_point
-                                }
-                                print(f"获取到FPP段位: {fpp_rank}")
-                    
-                    return True, tpp_rank, fpp_rank
-                except Exception as e:
-                    print(f"解析段位API响应JSON出错: {str(e)}")
-                    print(f"原始响应内容: {response.text[:500]}...") # 只打印前500个字符
-            else:
-                print(f"段位API请求失败，状态码: {response.status_code}")
-                print(f"响应内容: {response.text[:500]}...") # 只打印前500个字符
+        # 标记为查询中并刷新这一行
+        self.checking_uids.add(uid)
+        self.refresh_account_row(uid)
+        self.status_message.set(f"正在查询账号 {account_name} 的封禁状态...")
+        
+        future = self.engine.submit(self.core.refresh_single_account(self.engine, uid))
+        future.add_done_callback(
+            lambda f: self.ui_queue.post(lambda: self.finish_single_account_check(uid, account_name, f))
+        )
+    
+    def finish_single_account_check(self, uid, account_name, future):
+        """单个账号查询结束（在主线程中执行）"""
+        self.checking_uids.discard(uid)
+        # 清除"查询中…"并显示最新数据
+        self.refresh_account_row(uid)
+        
+        if future.cancelled():
+            self.status_message.set(f"账号 {account_name} 的查询已取消")
+            return
+        try:
+            ban_updated, rank_updated = future.result()
         except Exception as e:
-            print(f"段位API请求异常: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
-        return False, None, None
-
-    def update_account_ranks(self):
-        """查询并更新所有账号的段位信息"""
-        print("开始查询所有账号段位信息...")
-        ranks_updated = False
-        
-        for idx, account in enumerate(self.accounts):
-            account_name = account.get('name', '未命名')
-            account_id = account.get('account_id', '')
-            
-            # 更新状态栏显示当前正在查询的账号
-            self.root.after(0, lambda name=account_name, i=idx+1, total=len(self.accounts): 
-                           self.status_message.set(f"正在查询账号段位 ({i}/{total}): {name}"))
-            
-            if not account_id:
-                print(f"账号 {account_name} 没有account_id，跳过段位查询")
-                continue
-                
-            print(f"正在查询账号 {account_name} 的段位信息...")
-            success, tpp_rank, fpp_rank = self.query_rank_api(account_id)
-            
-            if success:
-                # 更新TPP段位信息
-                if tpp_rank:
-                    # 转换段位名称
-                    tier_name_map = {
-                        "Bronze": "青铜",
-                        "Silver": "白银",
-                        "Gold": "黄金",
-                        "Platinum": "铂金",
-                        "Diamond": "钻石",
-                        "Master": "大师"
-                    }
-                    
-                    tier_name = tier_name_map.get(tpp_rank["tier"], tpp_rank["tier"])
-                    sub_tier = tpp_rank["subTier"]
-                    rank_point = tpp_rank["rankPoint"]
-                    
-                    # 保存rank分数到独立字段
-                    account["tpp_rank_point"] = rank_point
-                    
-                    # 只保存基础段位格式: 黄金4
-                    tpp_rank_display = f"{tier_name}{sub_tier}"
-                    
-                    # 检查是否需要更新
-                    update_needed = False
-                    if account.get("tpp_rank") != tpp_rank_display:
-                        update_needed = True
-                    if account.get("tpp_rank_point") != rank_point:
-                        update_needed = True
-                    
-                    if update_needed:
-                        account["tpp_rank"] = tpp_rank_display
-                        print(f"账号 {account_name} TPP段位已更新: {tpp_rank_display}({rank_point})")
-                        ranks_updated = True
-                else:
-                    # 如果没有获取到段位，直接设置为未定级
-                    update_needed = False
-                    if account.get("tpp_rank") != "未定级":
-                        update_needed = True
-                    if account.get("tpp_rank_point", 0) != 0:
-                        update_needed = True
-                        
-                    if update_needed:
-                        account["tpp_rank"] = "未定级"
-                        account["tpp_rank_point"] = 0
-                        print(f"账号 {account_name} TPP段位已更新为: 未定级")
-                        ranks_updated = True
-                
-                # 更新FPP段位信息
-                if fpp_rank:
-                    # 转换段位名称
-                    tier_name_map = {
-                        "Bronze": "青铜",
-                        "Silver": "白银",
-                        "Gold": "黄金",
-                        "Platinum": "铂金",
-                        "Diamond": "钻石",
-                        "Master": "大师"
-                    }
-                    
-                    tier_name = tier_name_map.get(fpp_rank["tier"], fpp_rank["tier"])
-                    sub_tier = fpp_rank["subTier"]
-                    rank_point = fpp_rank["rankPoint"]
-                    
-                    # 保存rank分数到独立字段
-                    account["fpp_rank_point"] = rank_point
-                    
-                    # 只保存基础段位格式: 铂金5
-                    fpp_rank_display = f"{tier_name}{sub_tier}"
-                    
-                    # 检查是否需要更新
-                    update_needed = False
-                    if account.get("fpp_rank") != fpp_rank_display:
-                        update_needed = True
-                    if account.get("fpp_rank_point") != rank_point:
-                        update_needed = True
-                    
-                    if update_needed:
-                        account["fpp_rank"] = fpp_rank_display
-                        print(f"账号 {account_name} FPP段位已更新: {fpp_rank_display}({rank_point})")
-                        ranks_updated = True
-                else:
-                    # 如果没有获取到段位，直接设置为未定级
-                    update_needed = False
-                    if account.get("fpp_rank") != "未定级":
-                        update_needed = True
-                    if account.get("fpp_rank_point", 0) != 0:
-                        update_needed = True
-                    
-                    if update_needed:
-                        account["fpp_rank"] = "未定级"
-                        account["fpp_rank_point"] = 0
-                        print(f"账号 {account_name} FPP段位已更新为: 未定级")
-                        ranks_updated = True
-                
-                # 在UI中更新显示
-                self.root.after(0, lambda i=idx: self.update_single_account_ui(i))
-            
-            # 添加延迟以避免API请求过快
-            time.sleep(1)
+            self.status_message.set(f"查询账号 {account_name} 出错: {type(e).__name__} {str(e)}")
+            log.warning("查询账号 %s 出错: %s %s", account_name, type(e).__name__, e)
+            return
         
-        # 如果有段位更新，保存到文件
-        if ranks_updated:
-            self.save_accounts()
-            self.status_message.set("段位查询完成: 有段位更新")
+        # 有修改时已由refresh_single_account追加到增量日志
+        if ban_updated:
+            self.status_message.set(f"账号 {account_name} 封禁状态已更新")
+        elif rank_updated:
+            self.status_message.set(f"账号 {account_name} 段位已更新")
         else:
-            self.status_message.set("段位查询完成: 无段位变化")
+            self.status_message.set(f"账号 {account_name} 封禁状态未变")
             
         # 3秒后清空状态栏
         self.root.after(3000, lambda: self.status_message.set(""))
-        
-        return ranks_updated
 
-    def refresh_rank_status(self):
-        """刷新段位状态并更新界面"""
-        # 如果后台任务正在运行，不再启动新任务
-        if self.background_task_running:
-            self.status_message.set("正在检查账号状态，请稍候...")
+    def prefetch_account(self, uid):
+        """
+        账号数据过期时以低优先级在后台刷新（预取）
+        刷新执行期间、账号正在查询或等待中的预取过多时跳过
+        """
+        if not self.prefetch_var.get() or self.engine.is_busy():
             return
-            
-        # 显示正在刷新的提示
-        self.status_message.set("正在查询账号段位...")
-        self.root.update()  # 强制更新界面以显示提示消息
-        
-        # 启动后台线程执行段位查询
-        self.background_task_running = True
-        
-        def run_rank_query():
-            try:
-                # 执行段位更新
-                self.update_account_ranks()
-            except Exception as e:
-                print(f"段位查询任务异常: {str(e)}")
-                # 在主线程中更新状态
-                self.root.after(0, lambda: self.status_message.set(f"段位查询出错: {str(e)}"))
-            finally:
-                # 重置后台任务标志
-                self.background_task_running = False
-        
-        # 启动后台线程
-        threading.Thread(target=run_rank_query, daemon=True).start()
-
-    def check_single_account_ban_status(self, account_index):
-        """通过API查询单个账号的封禁状态，并更新"""
-        if account_index < 0 or account_index >= len(self.accounts):
+        if uid in self.checking_uids or uid in self.prefetching_uids:
             return
-            
-        account = self.accounts[account_index]
-        account_name = account.get('name', '未命名')
-        account_id = account.get('id', '')
-        
-        if not account_id:
-            messagebox.showinfo("提示", f"账号 {account_name} 没有设置ID，无法查询API")
+        if len(self.prefetching_uids) >= self.prefetch_limit:
+            return
+        account = self.store.get(uid)
+        if account is None or not (account.get("account_id") or account.get("id")):
+            return
+        if not self.core.is_stale_cached(account, self.prefetch_max_age, cache="prefetch"):
             return
-            
-        # 更新状态栏
-        self.status_message.set(f"正在查询账号 {account_name} 的封禁状态...")
-        self.root.update()  # 强制更新界面显示
         
+        self.prefetching_uids.add(uid)
+        # 记录当前表单内容，结果返回时表单未被修改才用新数据刷新表单
+        form_state = self.form_state() if uid == self.current_account_uid else None
+        future = self.engine.submit(self.core.refresh_single_account(self.engine, uid, low_priority=True))
+        future.add_done_callback(
+            lambda f: self.ui_queue.post(lambda: self.finish_prefetch(uid, form_state, f))
+        )
+    
+    def finish_prefetch(self, uid, form_state, future):
+        """预取结束（在主线程中执行）"""
+        self.prefetching_uids.discard(uid)
+        if future.cancelled():
+            return
         try:
-            # 查询账号封禁状态
-            account_updated = self.check_ban_real(account)
-            
-            if account_updated:
-                # 如果状态有更新，更新UI并保存
-                self.update_single_account_ui(account_index)
-                self.save_accounts()
-                self.status_message.set(f"账号 {account_name} 封禁状态已更新")
-            else:
-                self.status_message.set(f"账号 {account_name} 封禁状态未变")
-                
-            # 3秒后清空状态栏
-            self.root.after(3000, lambda: self.status_message.set(""))
+            future.result()
         except Exception as e:
-            messagebox.showerror("错误", f"查询账号 {account_name} 封禁状态时出错: {str(e)}")
-            self.status_message.set("查询出错")
+            log.warning("预取账号数据出错: %s %s", type(e).__name__, e, extra={"sample": "prefetch_error"})
+            return
+        
+        account = self.store.get(uid)
+        if account is None:
+            return
+        
+        # 表单正显示该账号且未被修改时显示最新数据
+        if (form_state is not None and uid == self.current_account_uid
+                and self.form_state() == form_state):
+            self.fill_form(account)
+            self.update_extend_button_state()
+    
+    def form_state(self):
+        """右侧表单当前的内容，用于判断表单是否被修改过"""
+        return (
+            self.name_var.get(), self.level_var.get(), self.password_var.get(),
+            self.tpp_rank_var.get(), self.fpp_rank_var.get(), self.phone_var.get(),
+            self.id_var.get(), self.status_var.get(), self.unban_time_var.get(),
+            self.extended_ban_var.get(), self.ban_duration_var.get(),
+            self.note_text.get("1.0", tk.END),
+        )
+    
+    def on_tree_hover(self, event):
+        """鼠标在某行上停留400毫秒后预取该账号"""
+        item = self.tree.identify_row(event.y) if str(event.type) == "Motion" else None
+        if item == self.hover_item:
+            return
+        self.hover_item = item
+        if self.hover_after_id is not None:
+            self.root.after_cancel(self.hover_after_id)
+            self.hover_after_id = None
+        if item and self.drag_item is None:
+            self.hover_after_id = self.root.after(400, lambda: self.prefetch_account(item))
+    
+    def schedule_view_prefetch(self):
+        """可见区域变化后，停止滚动500毫秒再预取可见的账号"""
+        if not self.prefetch_var.get():
+            return
+        if self.view_prefetch_after_id is not None:
+            self.root.after_cancel(self.view_prefetch_after_id)
+        self.view_prefetch_after_id = self.root.after(500, self.prefetch_visible_accounts)
+    
+    def prefetch_visible_accounts(self):
+        """预取可见区域内数据过期的账号"""
+        self.view_prefetch_after_id = None
+        for uid in self.tree_renderer.visible_iids():
+            self.prefetch_account(uid)
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # 带参数时以命令行方式运行，不创建窗口
+        from account_core.cli import main
+        sys.exit(main(sys.argv[1:]))
+    
+    # 同一个数据文件只允许一个实例修改，后启动的实例把已有窗口切到前台后退出
+    repository = AccountRepository(default_data_file())
+    instance_lock = InstanceLock(repository.lock_file)
+    if not instance_lock.acquire():
+        try:
+            reply = send_command(repository.endpoint_file, "activate", timeout=5)
+        except OSError:
+            reply = {"ok": False}
+        if not reply.get("ok"):
+            # 持有锁的是常驻模式或命令行刷新，没有窗口可以切换
+            root = tk.Tk()
+            root.withdraw()
+            messagebox.showwarning("提示", f"数据文件正被其他进程使用(pid {instance_lock.owner()})，请先关闭该程序")
+        sys.exit(0)
+    # 只有持有锁的实例写日志文件，避免多个进程同时滚动同一个文件
+    configure_logging(log_file=repository.log_file)
     root = tk.Tk()
     app = AccountManager(root)
     root.mainloop() 
\ No newline at end of file
@@ -0,0 +1 @@
+"""基准测试和模拟工具，不随程序打包"""
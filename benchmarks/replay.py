@@ -0,0 +1,87 @@
+"""
+离线回放接口样本：用录制的封禁/段位响应检查解析结果并计时，不访问网络
+    python -m account_core --record-fixtures fixtures sweep --bans --ranks   # 先录制样本
+    python -m benchmarks.replay fixtures --update                          # 把当前解析结果记为预期
+    python -m benchmarks.replay fixtures --repeat 20                       # 修改解析代码后对比并计时
+
+每个样本文件中的expected为记录的解析结果；与当前结果不同的样本会列出，退出码为1
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import PubgPlusProvider, ReplayTransport  # noqa: E402
+from account_core.fixtures import load_fixtures  # noqa: E402
+from account_core.logs import configure_logging  # noqa: E402
+
+
+def season_number(season):
+    """division.bro.official.pc-2018-35 -> 35"""
+    return int(season.rsplit("-", 1)[-1])
+
+
+def replay(provider, fixture):
+    """用样本中的(匿名)参数调用对应的查询，返回可以保存为JSON的结果"""
+    params = fixture["params"]
+    if fixture["kind"] == "ban":
+        return list(provider.query_ban(params.get("player_id", "")))
+    return list(provider.query_rank(params.get("acc_id", ""), season_number(params.get("season", "0"))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线回放接口样本")
+    parser.add_argument("directory", help="样本目录")
+    parser.add_argument("--update", action="store_true", help="把当前解析结果写入样本作为预期")
+    parser.add_argument("--repeat", type=int, default=5, help="计时的重复次数")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.directory)
+    if not fixtures:
+        print(f"目录中没有样本: {args.directory}", file=sys.stderr)
+        return 1
+    provider = PubgPlusProvider(transport=ReplayTransport(args.directory))
+
+    mismatches = []
+    timings = {}
+    # 按默认级别记录日志但丢弃输出，避免终端输出影响计时
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        configure_logging(stream=devnull)
+        for path, fixture in fixtures:
+            result = replay(provider, fixture)
+            if args.update:
+                fixture["expected"] = result
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(fixture, f, ensure_ascii=False, indent=2)
+            elif "expected" in fixture and fixture["expected"] != result:
+                mismatches.append((path, fixture["expected"], result))
+
+        for _ in range(args.repeat):
+            for _, fixture in fixtures:
+                start = time.perf_counter()
+                replay(provider, fixture)
+                timings.setdefault(fixture["kind"], []).append(time.perf_counter() - start)
+
+    for kind, values in sorted(timings.items()):
+        print(f"{kind:<6} {len(values) // args.repeat if args.repeat else 0:>5} 个样本  "
+              f"中位数 {statistics.median(values) * 1000:8.3f}ms  最慢 {max(values) * 1000:8.3f}ms")
+    if args.update:
+        print(f"已更新 {len(fixtures)} 个样本的预期结果")
+        return 0
+    for path, expected, result in mismatches:
+        print(f"结果不一致: {os.path.basename(path)}\n  预期: {expected}\n  实际: {result}")
+    missing = sum(1 for _, fixture in fixtures if "expected" not in fixture)
+    if missing:
+        print(f"{missing} 个样本没有预期结果，使用 --update 记录")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+基准测试：在生成的1千、1万、10万个账号上计时加载、保存、表格刷新、各列排序、名称查找和封禁到期检查，
+以及在新的解释器中导入核心逻辑和界面模块的耗时(冷启动)
+    python -m benchmarks.run                         # 默认1000 10000 100000
+    python -m benchmarks.run --sizes 1000 --repeat 5
+    python -m benchmarks.run --compare benchmarks/results/旧结果.json
+
+结果写入benchmarks/results/<时间>-<提交>.json，用于对比优化前后的数据。
+表格刷新和排序在隐藏的Tk窗口上执行；没有图形环境时跳过这两项，只测核心逻辑
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import AccountService  # noqa: E402
+from account_core.logs import configure_logging  # noqa: E402
+from benchmarks.synthetic import generate_accounts  # noqa: E402
+
+# 可以点击表头排序的列
+SORT_COLUMNS = ("level", "fpp_rank", "tpp_rank", "status", "unban_time", "phone")
+
+# 每次名称查找测试查找的账号数
+LOOKUP_COUNT = 100
+
+# 冷启动测试在新的解释器中导入的模块，第二个需要tkinter
+STARTUP_IMPORTS = ("account_core", "account_manager")
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def measure(function, setup=None, repeat=3):
+    """执行repeat次，返回每次的耗时(秒)；setup在每次计时前执行，不计入耗时"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def summarize(timings):
+    return {
+        "best": min(timings),
+        "median": statistics.median(timings),
+        "runs": timings,
+    }
+
+
+def write_book(directory, count, seed):
+    """生成账号数据并写入directory下的accounts.json，返回(文件路径, 账号列表)"""
+    accounts = generate_accounts(count, seed=seed)
+    data_file = os.path.join(directory, "accounts.json")
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(accounts, f, ensure_ascii=False, indent=2)
+    return data_file, accounts
+
+
+def reset_book(data_file, accounts):
+    """恢复为生成时的数据(去掉增量日志)，使每次计时的起点相同"""
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(accounts, f, ensure_ascii=False, indent=2)
+    for suffix in (".journal", ".sweep"):
+        if os.path.exists(data_file + suffix):
+            os.remove(data_file + suffix)
+
+
+def bench_core(target, data_file, accounts, repeat, seed):
+    """
+    不依赖界面的部分
+    target: AccountManager或AccountService，两者的load/save/update_ban_status调用方式相同
+    """
+    core = getattr(target, "core", target)
+    load = getattr(target, "load_accounts_only", None) or target.load
+    results = {}
+    results["load"] = measure(load, setup=lambda: reset_book(data_file, accounts), repeat=repeat)
+    results["save_accounts"] = measure(target.save_accounts, repeat=repeat)
+
+    names = [account["name"] for account in random.Random(seed).sample(accounts, min(LOOKUP_COUNT, len(accounts)))]
+    results["lookup_name"] = measure(lambda: [core.find_account(name) for name in names], repeat=repeat)
+    # 启动时搜索索引在后台建立，这里单独计时，之后的搜索使用建好的索引
+    results["build_search_index"] = measure(
+        lambda: core.search_index.install(core.build_search_index()),
+        setup=lambda: core.search_index.defer(core.accounts), repeat=repeat)
+    results["search_name"] = measure(lambda: [core.search_index.search(name) for name in names], repeat=repeat)
+
+    def reload():
+        reset_book(data_file, accounts)
+        load()
+    results["update_ban_status"] = measure(core.update_ban_status, setup=reload, repeat=repeat)
+    return results
+
+
+def bench_gui(app, repeat):
+    """表格刷新和各列排序(隐藏窗口)"""
+    results = {}
+
+    def render():
+        app.update_treeview()
+        app.root.update_idletasks()
+
+    def unsorted():
+        app.sort_column = None
+        app.sort_reverse = False
+    results["update_treeview"] = measure(render, setup=unsorted, repeat=repeat)
+
+    for column in SORT_COLUMNS:
+        def sort(column=column):
+            app.force_sort(column)
+            app.root.update_idletasks()
+        results[f"force_sort:{column}"] = measure(sort, setup=unsorted, repeat=repeat)
+    unsorted()
+    return results
+
+
+def create_app(data_file):
+    """在隐藏的Tk窗口中创建界面，没有图形环境时返回None"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print(f"无法创建Tk窗口，跳过表格刷新和排序: {str(e)}", file=sys.stderr)
+        return None
+    root.withdraw()
+    from account_manager import AccountManager
+    return AccountManager(root, data_file=data_file)
+
+
+def bench_startup(repeat, use_gui):
+    """在新的解释器中计时导入模块，不包括解释器自身的启动"""
+    results = {}
+    for module in STARTUP_IMPORTS if use_gui else STARTUP_IMPORTS[:1]:
+        code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+        timings = []
+        for _ in range(repeat):
+            output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+            timings.append(float(output.decode().strip().splitlines()[-1]))
+        results[f"import:{module}"] = summarize(timings)
+    return results
+
+
+def run_size(count, repeat, seed, use_gui):
+    """对一种数据量执行全部测试"""
+    directory = tempfile.mkdtemp(prefix="account-bench-")
+    try:
+        data_file, accounts = write_book(directory, count, seed)
+        app = create_app(data_file) if use_gui else None
+        if app is None:
+            service = AccountService(data_file)
+            service.load()
+            results = bench_core(service, data_file, accounts, repeat, seed)
+            results["skipped"] = ["update_treeview"] + [f"force_sort:{column}" for column in SORT_COLUMNS]
+            return results
+        try:
+            results = bench_core(app, data_file, accounts, repeat, seed)
+            results.update(bench_gui(app, repeat))
+        finally:
+            app.on_close()
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def current_commit():
+    """当前的git提交(有未提交修改时加上-dirty)，不在git仓库中时返回unknown"""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                        stderr=subprocess.DEVNULL).decode().strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous_file):
+    """打印与之前结果的中位数对比"""
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f"\n与 {previous.get('commit')} ({previous.get('timestamp')}) 对比(中位数):")
+    for size, results in current["results"].items():
+        old_results = previous.get("results", {}).get(size, {})
+        for name, result in results.items():
+            if name == "skipped" or name not in old_results:
+                continue
+            old = old_results[name]["median"]
+            new = result["median"]
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"  {size:>7} {name:<24} {old * 1000:10.2f}ms -> {new * 1000:10.2f}ms  {change:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="账号管理器基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="账号数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测试的重复次数")
+    parser.add_argument("--seed", type=int, default=0, help="生成数据的随机种子")
+    parser.add_argument("--no-gui", action="store_true", help="跳过表格刷新和排序")
+    parser.add_argument("--output", default=None, help="结果文件，默认写入benchmarks/results/")
+    parser.add_argument("--compare", default=None, help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+
+    report = {
+        "commit": current_commit(),
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": {},
+    }
+    print("测试冷启动...", file=sys.stderr)
+    report["results"]["startup"] = bench_startup(args.repeat, not args.no_gui)
+    for name, result in report["results"]["startup"].items():
+        print(f"  {name:<24} 中位数 {result['median'] * 1000:10.2f}ms  最快 {result['best'] * 1000:10.2f}ms")
+    for count in args.sizes:
+        print(f"测试 {count} 个账号...", file=sys.stderr)
+        # 按默认级别记录日志但丢弃输出，避免终端输出影响结果
+        with open(os.devnull, 'w', encoding='utf-8') as devnull:
+            configure_logging(stream=devnull)
+            results = run_size(count, args.repeat, args.seed, not args.no_gui)
+        report["results"][str(count)] = results
+        for name, result in results.items():
+            if name != "skipped":
+                print(f"  {name:<24} 中位数 {result['median'] * 1000:10.2f}ms  最快 {result['best'] * 1000:10.2f}ms")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
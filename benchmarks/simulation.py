@@ -0,0 +1,356 @@
+"""
+刷新模拟：用虚拟时钟和脚本化的假接口运行真实的刷新逻辑
+    python -m benchmarks.simulation --accounts 10000 --hours 4
+    python -m benchmarks.simulation --accounts 2000 --hours 2 --throttle 1800:300 --timeout-rate 0.02
+
+事件循环的时间是虚拟的：没有可执行的任务时直接把时钟拨到下一个定时任务，
+请求间隔、请求超时、总时间预算和假接口的延迟都按虚拟时间计算，几小时的刷新几秒内跑完。
+假接口按脚本返回：对数正态分布的延迟、限流时段(429)、超时、封禁和解封的状态变化。
+结束后报告吞吐量、请求延迟分位数和账号状态与假接口真实状态的差异
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import random
+import selectors
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import AccountService, RefreshEngine, SweepCancelled  # noqa: E402
+from account_core.logs import configure_logging  # noqa: E402
+from benchmarks.synthetic import generate_accounts  # noqa: E402
+
+# 段位名称 -> 接口返回的英文段位
+TIER_NAMES = {"青铜": "Bronze", "白银": "Silver", "黄金": "Gold", "铂金": "Platinum", "钻石": "Diamond", "大师": "Master"}
+
+
+class VirtualClock:
+    """虚拟时钟(秒)，由事件循环在空闲时向前拨动"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """没有就绪的IO时不等待，直接把虚拟时钟拨到事件循环要等待的时刻"""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            # 没有定时任务，只能等待其他线程提交任务(如run_coroutine_threadsafe)
+            return super().select(None)
+        self.clock.advance(timeout)
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """使用虚拟时钟的事件循环"""
+
+    def __init__(self, clock):
+        super().__init__(_VirtualSelector(clock))
+        self.clock = clock
+
+    def time(self):
+        return self.clock.now
+
+
+class SimulatedEngine(RefreshEngine):
+    """在虚拟时间事件循环中运行的刷新引擎，请求交给假接口，按其给出的延迟返回"""
+
+    def __init__(self, api, clock, **options):
+        super().__init__(**options)
+        self.api = api
+        self.clock = clock
+
+    def _new_loop(self):
+        return VirtualTimeLoop(self.clock)
+
+    async def _execute(self, function, *args):
+        # 假接口在请求开始时计算结果和延迟，经过延迟后返回；延迟超过请求超时时由wait_for抛出超时
+        result = function(*args)
+        await asyncio.sleep(self.api.last_latency)
+        return result
+
+
+class FakePubgApi:
+    """
+    脚本化的假接口，接口与PubgPlusProvider相同(check_ban、query_rank)
+    每个玩家有真实的封禁时段和段位，返回请求开始时刻的真实状态
+    """
+
+    def __init__(self, clock, accounts, epoch, seed=0, latency_median=0.4, latency_sigma=0.6,
+                 timeout_rate=0.01, timeout_latency=60.0, throttle_windows=(), ban_rate=0.05, duration=4 * 3600):
+        """
+        latency_median/latency_sigma: 正常响应延迟的对数正态分布参数(秒)
+        timeout_rate: 请求卡住(延迟timeout_latency秒)的概率
+        throttle_windows: [(开始秒, 持续秒)]，期间所有请求立即返回429
+        ban_rate: 模拟期间新被封禁的玩家比例
+        """
+        self.clock = clock
+        self.rng = random.Random(seed)
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.timeout_rate = timeout_rate
+        self.timeout_latency = timeout_latency
+        self.throttle_windows = list(throttle_windows)
+        self.last_latency = 0.0
+        # 每次请求: (开始时间, 接口, 状态, 延迟)
+        self.calls = []
+
+        # 玩家的真实状态，按id和account_id都能查到
+        self.players = {}
+        for i, account in enumerate(accounts):
+            player = {
+                "account_id": account.get("account_id") or f"account.sim{i:08d}",
+                "level": account.get("level", 1),
+                "tpp": self._rank_of(account.get("tpp_rank"), account.get("tpp_rank_point", 0)),
+                "fpp": self._rank_of(account.get("fpp_rank"), account.get("fpp_rank_point", 0)),
+                "bans": [],
+            }
+            # 数据中封禁且尚未到期的账号，真实状态为封禁到解封时间
+            if account.get("status") and account.get("unban_time"):
+                unban = datetime.datetime.strptime(account["unban_time"], "%Y-%m-%d %H:%M:%S")
+                player["bans"].append((-math.inf, (unban - epoch).total_seconds()))
+            # 模拟期间新的封禁，封禁24或72小时
+            if self.rng.random() < ban_rate:
+                start = self.rng.uniform(0, duration)
+                player["bans"].append((start, start + self.rng.choice((24, 72)) * 3600))
+            # 段位在模拟期间有变化
+            if player["tpp"] and self.rng.random() < 0.5:
+                player["tpp"]["rankPoint"] += self.rng.randint(1, 200)
+            self.players[account["id"]] = player
+            self.players[player["account_id"]] = player
+
+    @staticmethod
+    def _rank_of(rank, point):
+        """数据中的段位转换为接口返回的格式，未定级为None"""
+        if not rank or rank == "未定级":
+            return None
+        if rank == "大师":
+            return {"tier": "Master", "subTier": "", "rankPoint": point}
+        return {"tier": TIER_NAMES[rank[:2]], "subTier": rank[2:], "rankPoint": point}
+
+    def is_banned(self, player, at):
+        """玩家在虚拟时刻at是否处于封禁中"""
+        return any(start <= at < end for start, end in player["bans"])
+
+    def _outcome(self, endpoint):
+        """决定本次请求的状态和延迟"""
+        now = self.clock.now
+        if any(start <= now < start + length for start, length in self.throttle_windows):
+            status, latency = 429, 0.05
+        elif self.rng.random() < self.timeout_rate:
+            status, latency = "timeout", self.timeout_latency
+        else:
+            status, latency = 200, self.rng.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+        self.last_latency = latency
+        self.calls.append((now, endpoint, status, latency))
+        return status
+
+    def check_ban(self, player_id):
+        player = self.players.get(player_id)
+        status = self._outcome("ban")
+        if status != 200 or player is None:
+            return False, False, 0, None
+        return self.is_banned(player, self.clock.now), True, player["level"], player["account_id"]
+
+    def query_rank(self, account_id, season_num):
+        player = self.players.get(account_id)
+        status = self._outcome("rank")
+        if status != 200 or player is None:
+            return False, None, None
+        return True, player["tpp"] and dict(player["tpp"]), player["fpp"] and dict(player["fpp"])
+
+
+def percentile(values, fraction):
+    """按最近秩法取分位数，空列表返回0"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def run_scenario(accounts=10000, hours=4.0, kind="full", interval=1800.0, seed=0, concurrency=4,
+                 min_interval=0.25, request_timeout=15, sweep_budget=900, **api_options):
+    """
+    运行一个模拟场景：每次刷新结束后等待interval虚拟秒再开始下一次，直到hours小时
+    kind: "full"、"bans"、"ranks"，或"stale"(只刷新超过interval未查询的账号)
+    返回: 报告字典
+    """
+    duration = hours * 3600
+    epoch = datetime.datetime.now().replace(microsecond=0)
+    clock = VirtualClock()
+    book = generate_accounts(accounts, seed=seed, now=epoch)
+    api = FakePubgApi(clock, book, epoch, seed=seed, duration=duration, **api_options)
+    engine = SimulatedEngine(api, clock, concurrency=concurrency, request_timeout=request_timeout,
+                             min_interval=min_interval, sweep_budget=sweep_budget)
+
+    directory = tempfile.mkdtemp(prefix="account-sim-")
+    data_file = os.path.join(directory, "accounts.json")
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(book, f, ensure_ascii=False)
+    service = AccountService(data_file, provider=api, engine=engine,
+                             clock=lambda: epoch + datetime.timedelta(seconds=clock.now))
+
+    sweeps = []
+    real_start = time.perf_counter()
+    try:
+        service.load()
+        service.start()
+        while clock.now < duration:
+            sweep = service.stale_sweep(interval) if kind == "stale" else service.sweep_for(kind)
+            started_at = clock.now
+            calls_before = len(api.calls)
+            finished = threading.Event()
+            outcome = {}
+
+            def on_done(result, error):
+                outcome.update(result=result, error=error)
+                finished.set()
+
+            service.start_sweep(sweep, on_done=on_done)
+            finished.wait()
+            error = outcome["error"]
+            sweeps.append({
+                "started_at": started_at,
+                "duration": clock.now - started_at,
+                "requests": len(api.calls) - calls_before,
+                "completed": error is None,
+                "error": None if error is None else str(error) if isinstance(error, SweepCancelled) else repr(error),
+            })
+            # 等待到下一次刷新(虚拟时间)
+            engine.submit(asyncio.sleep(interval)).result()
+        service.shutdown()
+        return build_report(service, api, sweeps, epoch, clock.now, time.perf_counter() - real_start)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def build_report(service, api, sweeps, epoch, end, real_seconds):
+    """统计吞吐量、延迟和状态正确性"""
+    latencies = [latency for _, _, status, latency in api.calls if status == 200]
+    statuses = {}
+    for _, endpoint, status, _ in api.calls:
+        key = f"{endpoint}:{status}"
+        statuses[key] = statuses.get(key, 0) + 1
+
+    status_mismatch = rank_mismatch = never_checked = 0
+    staleness = []
+    for account in service.accounts:
+        player = api.players.get(account["id"])
+        if not account.get("checked_at"):
+            never_checked += 1
+        else:
+            checked = datetime.datetime.strptime(account["checked_at"], "%Y-%m-%d %H:%M:%S")
+            staleness.append(end - (checked - epoch).total_seconds())
+        if bool(account["status"]) != api.is_banned(player, end):
+            status_mismatch += 1
+        expected_point = player["tpp"]["rankPoint"] if player["tpp"] else 0
+        if account.get("tpp_rank_point", 0) != expected_point:
+            rank_mismatch += 1
+
+    online_seconds = sum(sweep["duration"] for sweep in sweeps)
+    accounts = len(service.accounts)
+    return {
+        "accounts": accounts,
+        "virtual_seconds": end,
+        "real_seconds": real_seconds,
+        "speedup": end / real_seconds if real_seconds else 0.0,
+        "sweeps": sweeps,
+        "requests": len(api.calls),
+        "requests_per_second": len(api.calls) / online_seconds if online_seconds else 0.0,
+        "statuses": statuses,
+        "latency": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+        },
+        "correctness": {
+            "status_mismatch": status_mismatch,
+            "rank_mismatch": rank_mismatch,
+            "never_checked": never_checked,
+            "staleness_p50": percentile(staleness, 0.50),
+            "staleness_p95": percentile(staleness, 0.95),
+        },
+    }
+
+
+def parse_window(text):
+    """"开始秒:持续秒" -> (开始, 持续)"""
+    start, length = text.split(":")
+    return float(start), float(length)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="刷新模拟(虚拟时钟+假接口)")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--hours", type=float, default=4.0, help="模拟的总时长(虚拟小时)")
+    parser.add_argument("--kind", choices=("full", "bans", "ranks", "stale"), default="full")
+    parser.add_argument("--interval", type=float, default=1800, help="两次刷新之间的间隔(虚拟秒)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--min-interval", type=float, default=0.25)
+    parser.add_argument("--request-timeout", type=float, default=15)
+    parser.add_argument("--budget", type=float, default=900, help="单次刷新的时间预算(虚拟秒)，0为不限制")
+    parser.add_argument("--latency", type=float, default=0.4, help="接口延迟中位数(秒)")
+    parser.add_argument("--latency-sigma", type=float, default=0.6, help="延迟对数正态分布的sigma")
+    parser.add_argument("--timeout-rate", type=float, default=0.01, help="请求超时的概率")
+    parser.add_argument("--throttle", type=parse_window, action="append", default=[],
+                        metavar="START:SECONDS", help="限流时段(返回429)，可重复")
+    parser.add_argument("--ban-rate", type=float, default=0.05, help="模拟期间新被封禁的玩家比例")
+    parser.add_argument("--output", default=None, help="把报告写入JSON文件")
+    args = parser.parse_args(argv)
+
+    # 按默认级别记录日志但丢弃输出，模拟期间不受终端输出影响
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        configure_logging(stream=devnull)
+        report = run_scenario(
+            accounts=args.accounts, hours=args.hours, kind=args.kind, interval=args.interval, seed=args.seed,
+            concurrency=args.concurrency, min_interval=args.min_interval, request_timeout=args.request_timeout,
+            sweep_budget=args.budget or None, latency_median=args.latency, latency_sigma=args.latency_sigma,
+            timeout_rate=args.timeout_rate, throttle_windows=args.throttle, ban_rate=args.ban_rate,
+        )
+
+    print(f"{report['accounts']} 个账号，虚拟 {report['virtual_seconds'] / 3600:.2f} 小时，"
+          f"实际 {report['real_seconds']:.1f} 秒 (加速 {report['speedup']:.0f} 倍)")
+    for i, sweep in enumerate(report["sweeps"], 1):
+        state = "完成" if sweep["completed"] else sweep["error"]
+        print(f"  第{i}次刷新 @{sweep['started_at'] / 60:7.1f}分: {sweep['duration']:8.1f}秒 "
+              f"{sweep['requests']:6d}个请求 {state}")
+    print(f"请求 {report['requests']} 个，{report['requests_per_second']:.2f} 个/秒，状态 {report['statuses']}")
+    latency = report["latency"]
+    print(f"延迟 p50 {latency['p50']:.3f}秒 p95 {latency['p95']:.3f}秒 p99 {latency['p99']:.3f}秒")
+    correctness = report["correctness"]
+    print(f"结束时封禁状态与真实状态不一致 {correctness['status_mismatch']} 个，"
+          f"段位分数不一致 {correctness['rank_mismatch']} 个，从未查询成功 {correctness['never_checked']} 个，"
+          f"距上次查询 p50 {correctness['staleness_p50'] / 60:.1f}分 p95 {correctness['staleness_p95'] / 60:.1f}分")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+生成用于基准测试和模拟的账号数据
+字段组成与真实数据一致：段位、封禁(含已到期和追封)、备注、account_id、最近查询时间等
+"""
+
+import datetime
+import random
+import uuid
+
+from account_core import DEFAULT_SEASON, RANK_OPTIONS
+
+# 备注中常见的词语
+NOTE_WORDS = ["主号", "小号", "已出售", "待解封", "朋友的", "别动", "上分", "练枪", "周末用", "密码已改",
+              "绑定手机", "换绑中", "亚服", "欧服", "四排", "单排", "测试"]
+
+
+def generate_accounts(count, seed=0, now=None):
+    """
+    生成count个账号(与accounts.json中的格式相同)
+    同一个seed生成的数据相同，便于不同提交之间对比
+    """
+    rng = random.Random(seed)
+    now = now or datetime.datetime.now()
+    accounts = []
+    for i in range(count):
+        account = {
+            "uid": uuid.UUID(int=rng.getrandbits(128)).hex,
+            "order": float(i),
+            "name": f"player_{rng.getrandbits(40):010x}",
+            "password": f"pw{rng.getrandbits(32):08x}",
+            "tpp_rank": random_rank(rng),
+            "fpp_rank": random_rank(rng),
+            "tpp_rank_point": 0,
+            "fpp_rank_point": 0,
+            "phone": f"1{rng.randint(3000000000, 9999999999)}" if rng.random() < 0.6 else "",
+            "id": f"{rng.getrandbits(40):010x}",
+            "status": False,
+            "unban_time": "",
+            "extended_ban": "",
+            "level": rng.randint(1, 500),
+            "note": " ".join(rng.sample(NOTE_WORDS, rng.randint(1, 3))) if rng.random() < 0.3 else "",
+            "account_id": f"account.{uuid.UUID(int=rng.getrandbits(128)).hex}" if rng.random() < 0.7 else "",
+        }
+        if account["tpp_rank"] != "未定级":
+            account["tpp_rank_point"] = rng.randint(1000, 4500)
+        if account["fpp_rank"] != "未定级":
+            account["fpp_rank_point"] = rng.randint(1000, 4500)
+
+        roll = rng.random()
+        if roll < 0.15:
+            # 封禁中：一半已到期(等待本地解封)，一半未到期
+            hours = rng.uniform(-72, 0) if rng.random() < 0.5 else rng.uniform(0, 720)
+            offset = datetime.timedelta(hours=hours)
+            account["status"] = True
+            account["unban_time"] = (now + offset).strftime("%Y-%m-%d %H:%M:%S")
+        elif roll < 0.18:
+            account["status"] = True
+            # 追封，与界面和封禁查询写入的值相同
+            account["extended_ban"] = "追3天"
+            account["unban_time"] = (now + datetime.timedelta(days=3)).strftime("%Y-%m-%d %H:%M:%S")
+
+        if rng.random() < 0.8:
+            checked = now - datetime.timedelta(seconds=rng.uniform(0, 2 * 86400))
+            account["checked_at"] = checked.strftime("%Y-%m-%d %H:%M:%S")
+        accounts.append(account)
+
+    if accounts:
+        accounts[0]["season"] = DEFAULT_SEASON
+    return accounts
+
+
+def random_rank(rng):
+    """约三成未定级，其余集中在黄金到钻石"""
+    if rng.random() < 0.3:
+        return "未定级"
+    position = int(rng.triangular(1, len(RANK_OPTIONS) - 1, 16))
+    return RANK_OPTIONS[position]
@@ -0,0 +1,155 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+
+# 表格定义: (标题, [(列名, 列标题, 宽度)])
+ENDPOINT_COLUMNS = [("endpoint", "接口", 70), ("requests", "请求数", 70), ("error_rate", "错误率", 70),
+                    ("retries", "重试", 60), ("p50", "p50", 70), ("p95", "p95", 70), ("p99", "p99", 70),
+                    ("statuses", "状态码", 220)]
+PHASE_COLUMNS = [("phase", "阶段", 70), ("runs", "次数", 60), ("accounts", "账号数", 80),
+                 ("last_rate", "上次 账号/秒", 100), ("rate", "平均 账号/秒", 100), ("seconds", "累计耗时", 90)]
+CACHE_COLUMNS = [("cache", "缓存", 100), ("hits", "命中", 80), ("misses", "未命中", 80), ("ratio", "命中率", 80)]
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+
+def _rate(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+class DiagnosticsWindow:
+    """
+    诊断窗口：显示各接口的延迟分位数、错误率和状态码，刷新各阶段的吞吐量和缓存命中率，
+    每秒更新一次，可以导出为Prometheus文本格式或JSON；提供profiler时还可以开启和停止性能分析
+    on_profiling: 可选的 on_profiling(是否开启)，性能分析开启或停止后调用
+    """
+
+    def __init__(self, root, metrics, interval=1000, profiler=None, on_profiling=None):
+        self.metrics = metrics
+        self.interval = interval
+        self.profiler = profiler
+        self.on_profiling = on_profiling
+        self.window = tk.Toplevel(root)
+        self.window.title("诊断")
+        self.window.geometry("760x480")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self._after_id = None
+
+        self.endpoint_tree = self._create_table("接口请求", ENDPOINT_COLUMNS, 4)
+        self.phase_tree = self._create_table("刷新阶段", PHASE_COLUMNS, 5)
+        self.cache_tree = self._create_table("缓存", CACHE_COLUMNS, 4)
+
+        btn_frame = ttk.Frame(self.window)
+        btn_frame.pack(fill="x", padx=10, pady=8)
+        ttk.Button(btn_frame, text="导出Prometheus", command=lambda: self.export(".prom")).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="导出JSON", command=lambda: self.export(".json")).pack(side="left", padx=5)
+        if profiler is not None:
+            self.profile_btn = ttk.Button(btn_frame, command=self.toggle_profiling, width=14)
+            self.profile_btn.pack(side="left", padx=5)
+            self._update_profile_button()
+        self.uptime_var = tk.StringVar()
+        ttk.Label(btn_frame, textvariable=self.uptime_var).pack(side="right")
+
+        self.refresh()
+
+    def _create_table(self, title, columns, height):
+        frame = ttk.LabelFrame(self.window, text=title)
+        frame.pack(fill="x", padx=10, pady=(8, 0))
+        tree = ttk.Treeview(frame, columns=[column for column, _, _ in columns], show="headings", height=height)
+        for column, heading, width in columns:
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor="center")
+        tree.pack(fill="x", padx=5, pady=5)
+        return tree
+
+    def _fill(self, tree, rows):
+        """用新的行替换表格内容，行的第一列作为iid，未变化的行不重写"""
+        keys = [str(row[0]) for row in rows]
+        for iid in tree.get_children():
+            if iid not in keys:
+                tree.delete(iid)
+        for position, row in enumerate(rows):
+            iid = keys[position]
+            values = tuple(str(value) for value in row)
+            if tree.exists(iid):
+                if tuple(tree.item(iid, "values")) != values:
+                    tree.item(iid, values=values)
+                tree.move(iid, "", position)
+            else:
+                tree.insert("", position, iid=iid, values=values)
+
+    def refresh(self):
+        """读取一次指标快照并更新表格"""
+        snapshot = self.metrics.snapshot()
+        self._fill(self.endpoint_tree, [
+            (endpoint, stats["requests"], f"{stats['error_rate'] * 100:.1f}%", stats["retries"],
+             _seconds(stats["latency"]["p50"]), _seconds(stats["latency"]["p95"]), _seconds(stats["latency"]["p99"]),
+             " ".join(f"{status}:{count}" for status, count in sorted(stats["statuses"].items())))
+            for endpoint, stats in sorted(snapshot["endpoints"].items())
+        ])
+        self._fill(self.phase_tree, [
+            (phase, stats["runs"], stats["accounts"], _rate(stats["last"]["accounts_per_second"]),
+             _rate(stats["accounts_per_second"]), f"{stats['seconds']:.1f}秒")
+            for phase, stats in sorted(snapshot["phases"].items())
+        ])
+        self._fill(self.cache_tree, [
+            (name, stats["hits"], stats["misses"],
+             "-" if stats["hit_ratio"] is None else f"{stats['hit_ratio'] * 100:.1f}%")
+            for name, stats in sorted(snapshot["cache"].items())
+        ])
+        uptime = f"已运行 {snapshot['uptime_seconds'] / 60:.1f} 分钟"
+        if "first_paint" in snapshot["startup"]:
+            uptime += f"  首次显示 {_seconds(snapshot['startup']['first_paint'])}"
+        self.uptime_var.set(uptime)
+        self._after_id = self.window.after(self.interval, self.refresh)
+
+    def export(self, extension):
+        """导出当前指标到用户选择的文件"""
+        if extension == ".json":
+            filetypes = [("JSON", "*.json")]
+        else:
+            filetypes = [("Prometheus文本", "*.prom"), ("文本文件", "*.txt")]
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=extension, filetypes=filetypes,
+                                            initialfile=f"metrics{extension}")
+        if not path:
+            return
+        try:
+            self.metrics.export(path)
+        except OSError as e:
+            messagebox.showerror("导出失败", str(e), parent=self.window)
+
+    def toggle_profiling(self):
+        """开启采样性能分析，或停止并写出结果"""
+        if self.profiler.enabled:
+            try:
+                paths = self.profiler.stop()
+            except OSError as e:
+                messagebox.showerror("性能分析", f"写入结果失败: {str(e)}", parent=self.window)
+                paths = None
+            if paths:
+                messagebox.showinfo("性能分析", "结果已写入:\n" + "\n".join(paths), parent=self.window)
+            elif paths is not None:
+                messagebox.showinfo("性能分析", "分析期间没有执行被分析的操作", parent=self.window)
+        else:
+            self.profiler.start("sample")
+        self._update_profile_button()
+        if self.on_profiling is not None:
+            self.on_profiling(self.profiler.enabled)
+
+    def _update_profile_button(self):
+        self.profile_btn.configure(text="停止性能分析" if self.profiler.enabled else "开始性能分析")
+
+    def lift(self):
+        self.window.deiconify()
+        self.window.lift()
+
+    def is_open(self):
+        return self._after_id is not None
+
+    def close(self):
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        self.window.destroy()
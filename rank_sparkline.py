@@ -0,0 +1,67 @@
+import tkinter as tk
+
+
+class RankSparkline:
+    """
+    账号详情中的段位分数走势
+    左侧为本赛季TPP和FPP分数随时间变化的两条折线，右侧为最新分数和本赛季的变化
+    """
+
+    COLORS = (("TPP", "#1f77b4"), ("FPP", "#ff7f0e"))
+
+    def __init__(self, parent, width=264, height=36, text_width=90):
+        self.width = width
+        self.height = height
+        self.text_width = text_width
+        self.canvas = tk.Canvas(parent, width=width, height=height, highlightthickness=0, background="white")
+
+    def grid(self, **kwargs):
+        self.canvas.grid(**kwargs)
+
+    def clear(self, message=""):
+        self.canvas.delete("all")
+        if message:
+            self.canvas.create_text(4, self.height / 2, text=message, anchor="w", fill="gray")
+
+    def show(self, series):
+        """显示一个RankSeries，None或没有点时显示提示"""
+        if series is None or not len(series):
+            self.clear("暂无段位历史")
+            return
+        self.canvas.delete("all")
+        columns = [series.tpp_points, series.fpp_points]
+        # 未定级(分数为0)的点不画
+        values = [value for column in columns for value in column if value > 0]
+        if not values:
+            self.clear("本赛季未定级")
+            return
+        low, high = min(values), max(values)
+        start, end = series.times[0], series.times[-1]
+        plot_width = self.width - self.text_width - 8
+        pad = 3
+
+        def x(time):
+            return pad + (plot_width - 2 * pad) * ((time - start) / (end - start) if end > start else 1)
+
+        def y(value):
+            span = high - low
+            return self.height - pad - (self.height - 2 * pad) * ((value - low) / span if span else 0.5)
+
+        for (label, color), column, row in zip(self.COLORS, columns, (0, 1)):
+            coords = []
+            for time, value in zip(series.times, column):
+                if value > 0:
+                    coords.extend((x(time), y(value)))
+            if len(coords) == 2:
+                self.canvas.create_oval(coords[0] - 2, coords[1] - 2, coords[0] + 2, coords[1] + 2, fill=color, outline="")
+            elif coords:
+                self.canvas.create_line(*coords, fill=color, width=1.5)
+
+            # 最新分数和本赛季的变化(与第一个已定级的点比较)
+            scored = [value for value in column if value > 0]
+            text = f"{label} -"
+            if scored:
+                change = scored[-1] - scored[0]
+                text = f"{label} {scored[-1]} ({change:+d})"
+            self.canvas.create_text(self.width - self.text_width, self.height / 4 + row * self.height / 2,
+                                    text=text, anchor="w", fill=color)
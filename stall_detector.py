@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+import time
+
+from account_core.logs import get_logger
+
+log = get_logger("stall_detector")
+
+
+class StallDetector:
+    """
+    Tk主循环阻塞检测
+    主线程每interval毫秒通过after更新一次心跳，监视线程发现心跳停止超过threshold毫秒时
+    记下主线程当时的调用栈(即正在阻塞的回调)，主循环恢复后把阻塞时长和调用栈写入日志
+    """
+
+    def __init__(self, root, threshold=100, interval=50, stack_depth=8):
+        self.root = root
+        self.threshold = threshold / 1000
+        self.interval = interval
+        self.stack_depth = stack_depth
+        self.stalls = 0  # 检测到的阻塞次数
+        self._main_ident = None
+        self._last_beat = 0.0
+        self._stack = None  # 当前阻塞开始时主线程的调用栈
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._after_id = None
+
+    @classmethod
+    def from_env(cls, root, enabled=False):
+        """
+        按环境变量ACCOUNT_MANAGER_STALL_MS(阈值毫秒)创建，未设置且enabled为False时返回None
+        enabled: 为True时即使未设置也以默认阈值创建(如开启了性能分析)
+        """
+        value = os.environ.get("ACCOUNT_MANAGER_STALL_MS", "").strip()
+        if not value and not enabled:
+            return None
+        try:
+            threshold = int(value) if value else 100
+        except ValueError:
+            log.warning("ACCOUNT_MANAGER_STALL_MS不是整数: %s", value)
+            threshold = 100
+        return cls(root, threshold=threshold)
+
+    def start(self):
+        """在主线程中调用"""
+        if self._thread is not None:
+            return
+        self._main_ident = threading.get_ident()
+        self._stop.clear()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name="stall-detector", daemon=True)
+        self._thread.start()
+        log.info("界面阻塞检测已开启，阈值 %dms", self.threshold * 1000)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(1)
+        self._thread = None
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _beat(self):
+        """主线程心跳；上一次心跳之后发生过阻塞时写入日志"""
+        now = time.monotonic()
+        with self._lock:
+            stack, self._stack = self._stack, None
+            gap = now - self._last_beat
+            self._last_beat = now
+        if stack is not None:
+            self.stalls += 1
+            log.warning("界面主线程阻塞了 %.0fms，阻塞时正在执行:\n%s", (gap - self.interval / 1000) * 1000, stack)
+        self._after_id = self.root.after(self.interval, self._beat)
+
+    def _watch(self):
+        """监视线程：心跳超时时记录主线程的调用栈"""
+        while not self._stop.wait(self.interval / 2000):
+            with self._lock:
+                last_beat = self._last_beat
+                overdue = time.monotonic() - last_beat - self.interval / 1000
+                if overdue < self.threshold or self._stack is not None:
+                    continue
+            stack = self.format_stack(sys._current_frames().get(self._main_ident))
+            with self._lock:
+                # 读取调用栈期间主循环已恢复时不算阻塞
+                if self._last_beat == last_beat:
+                    self._stack = stack
+
+    def format_stack(self, frame):
+        """从最内层开始的若干帧，每帧一行"""
+        lines = []
+        while frame is not None and len(lines) < self.stack_depth:
+            code = frame.f_code
+            lines.append(f"    {code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return "\n".join(lines) or "    (未知)"
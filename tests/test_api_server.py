@@ -0,0 +1,111 @@
+"""
+本机HTTP接口：ETag和Host检查
+    python -m unittest discover tests
+"""
+
+import datetime
+import http.client
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import AccountApiServer, AccountService  # noqa: E402
+from account_core import search  # noqa: E402
+
+
+class FakeEngine:
+    """只提供接口用到的is_busy"""
+
+    def __init__(self):
+        self.busy = False
+
+    def is_busy(self):
+        return self.busy
+
+
+class ApiServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="account-test-")
+        data_file = os.path.join(self.directory, "accounts.json")
+        self.now = datetime.datetime.now().replace(microsecond=0)
+        unban_time = (self.now + datetime.timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump([{"uid": "a", "order": 0.0, "name": "a", "password": "secret", "status": False,
+                        "unban_time": "", "season": 35},
+                       {"uid": "b", "order": 1.0, "name": "b", "password": "secret", "status": True,
+                        "unban_time": unban_time, "season": 35}], f)
+        self.engine = FakeEngine()
+        self.service = AccountService(data_file, engine=self.engine)
+        self.service.load()
+        self.server = AccountApiServer(self.service, port=0)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def request(self, method, path, headers=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=5)
+        try:
+            connection.request(method, path, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.getheader("ETag"), response.read()
+        finally:
+            connection.close()
+
+    def test_stats_etag_changes_with_refreshing(self):
+        status, etag, body = self.request("GET", "/stats")
+        self.assertEqual(status, 200)
+        self.assertFalse(json.loads(body)["refreshing"])
+        self.assertEqual(self.request("GET", "/stats", {"If-None-Match": etag})[0], 304)
+
+        self.engine.busy = True
+        status, _, body = self.request("GET", "/stats", {"If-None-Match": etag})
+        self.assertEqual(status, 200)
+        self.assertTrue(json.loads(body)["refreshing"])
+
+    def test_unknown_path_is_not_304(self):
+        _, etag, _ = self.request("GET", "/accounts")
+        self.assertEqual(self.request("GET", "/accounts", {"If-None-Match": etag})[0], 304)
+        self.assertEqual(self.request("GET", "/nothing", {"If-None-Match": etag})[0], 404)
+        self.assertEqual(self.request("GET", "/accounts/missing", {"If-None-Match": "*"})[0], 404)
+
+    def test_time_relative_query_has_no_etag(self):
+        path = "/accounts?q=unban%3C6h"
+        with mock.patch.object(search.time, "time", return_value=self.now.timestamp()):
+            status, etag, body = self.request("GET", path)
+        self.assertEqual(status, 200)
+        self.assertIsNone(etag)
+        self.assertEqual(json.loads(body)["total"], 0)
+
+        # 三小时后"b"在6小时内解封，快照版本没有变化，但不能返回304
+        later = self.now + datetime.timedelta(hours=3)
+        with mock.patch.object(search.time, "time", return_value=later.timestamp()):
+            status, _, body = self.request("GET", path, {"If-None-Match": "*"})
+        self.assertEqual(status, 200)
+        self.assertEqual([account["uid"] for account in json.loads(body)["accounts"]], ["b"])
+
+        # 与时间无关的查询仍然带ETag
+        self.assertIsNotNone(self.request("GET", "/accounts?q=status:banned")[1])
+
+    def test_rejects_foreign_host(self):
+        self.assertEqual(self.request("GET", "/accounts", {"Host": f"localhost:{self.server.port}"})[0], 200)
+        self.assertEqual(self.request("GET", "/accounts", {"Host": "evil.example:8765"})[0], 403)
+        self.assertEqual(self.request("POST", "/refresh", {"Host": "evil.example"})[0], 403)
+
+    def test_accounts_hide_password(self):
+        _, _, body = self.request("GET", "/accounts")
+        self.assertNotIn("password", json.loads(body)["accounts"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
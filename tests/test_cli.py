@@ -0,0 +1,144 @@
+"""
+命令行：退出码、--json的JSON行输出，list不输出密码
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import InstanceLock, cli  # noqa: E402
+from account_core.logs import configure_logging  # noqa: E402
+
+
+class SlowProvider:
+    """每次查询耗时delay秒的假接口，代替命令行创建的PubgPlusProvider"""
+
+    delay = 0.0
+
+    def check_ban(self, player_id):
+        time.sleep(self.delay)
+        return False, True, 10, player_id
+
+    def query_rank(self, account_id, season_num):
+        time.sleep(self.delay)
+        return True, None, None
+
+
+class CliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="account-test-")
+        self.data_file = os.path.join(self.directory, "accounts.json")
+        accounts = [{"uid": f"u{i}", "order": float(i), "name": f"player{i}", "password": "secret", "id": f"player{i}",
+                     "status": i == 0, "unban_time": "", "extended_ban": "", "season": 35}
+                    for i in range(3)]
+        with open(self.data_file, 'w', encoding='utf-8') as f:
+            json.dump(accounts, f)
+        SlowProvider.delay = 0.0
+        patcher = mock.patch.object(cli, "PubgPlusProvider", SlowProvider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        configure_logging(stream=False)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run_cli(self, *argv):
+        """执行命令行，返回(退出码, stdout)"""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            code = cli.main(["--data", self.data_file, "--log-level", "ERROR"] + list(argv))
+        return code, stdout.getvalue()
+
+    def events(self, output):
+        """--json的输出：每行一个带event和time的JSON对象"""
+        events = [json.loads(line) for line in output.splitlines()]
+        for event in events:
+            self.assertIn("event", event)
+            self.assertIn("time", event)
+        return events
+
+    def test_list_json_lines_without_passwords(self):
+        code, output = self.run_cli("--json", "list")
+        self.assertEqual(code, cli.EXIT_OK)
+        events = self.events(output)
+        self.assertEqual([event["event"] for event in events], ["account"] * 3 + ["result"])
+        self.assertEqual([event["name"] for event in events[:3]], ["player0", "player1", "player2"])
+        self.assertEqual(events[-1]["count"], 3)
+        for event in events:
+            self.assertNotIn("password", event)
+
+    def test_list_filter(self):
+        code, output = self.run_cli("--json", "list", "--filter", "status:banned")
+        self.assertEqual(code, cli.EXIT_OK)
+        self.assertEqual([event.get("name") for event in self.events(output)], ["player0", None])
+
+    def test_list_text_without_passwords(self):
+        code, output = self.run_cli("list")
+        self.assertEqual(code, cli.EXIT_OK)
+        self.assertEqual(len(output.splitlines()), 4)
+        self.assertNotIn("secret", output)
+
+    def test_list_while_locked_reads_file_without_passwords(self):
+        # 持有锁的实例不接受命令时，list直接读取文件
+        lock = InstanceLock(self.data_file + ".lock")
+        self.assertTrue(lock.acquire())
+        try:
+            code, output = self.run_cli("--json", "list")
+        finally:
+            lock.release()
+        self.assertEqual(code, cli.EXIT_OK)
+        self.assertEqual(len(self.events(output)), 4)
+        self.assertNotIn("password", output)
+
+    def test_usage_errors(self):
+        self.assertEqual(self.run_cli()[0], cli.EXIT_USAGE)
+        with self.assertRaises(SystemExit) as raised:
+            self.run_cli("sweep", "--budget", "soon")
+        self.assertEqual(raised.exception.code, cli.EXIT_USAGE)
+
+    def test_error(self):
+        code, output = self.run_cli("--json", "refresh", "nobody")
+        self.assertEqual(code, cli.EXIT_ERROR)
+        self.assertEqual(self.events(output)[-1]["event"], "error")
+
+        code, _ = self.run_cli("import", os.path.join(self.directory, "missing.json"))
+        self.assertEqual(code, cli.EXIT_ERROR)
+
+    def test_sweep(self):
+        code, output = self.run_cli("--json", "sweep", "--bans")
+        self.assertEqual(code, cli.EXIT_OK)
+        result = self.events(output)[-1]
+        self.assertEqual((result["event"], result["completed"]), ("result", True))
+
+    def test_sweep_over_budget_is_incomplete(self):
+        SlowProvider.delay = 0.5
+        code, output = self.run_cli("--json", "sweep", "--bans", "--concurrency", "1", "--budget", "0.2")
+        self.assertEqual(code, cli.EXIT_INCOMPLETE)
+        self.assertFalse(self.events(output)[-1]["completed"])
+
+    def test_locked(self):
+        lock = InstanceLock(self.data_file + ".lock")
+        self.assertTrue(lock.acquire())
+        try:
+            self.assertEqual(self.run_cli("--daemon")[0], cli.EXIT_LOCKED)
+            # 持有锁的进程没有提供进程间命令时无法转发
+            self.assertEqual(self.run_cli("sweep")[0], cli.EXIT_LOCKED)
+        finally:
+            lock.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
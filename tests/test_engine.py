@@ -0,0 +1,144 @@
+"""
+刷新引擎：并发数、请求间隔、总时间预算、停止，以及卡住的请求不占满线程池
+并发和时间相关的用例在虚拟时钟的模拟引擎中运行，不实际等待
+    python -m unittest discover tests
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import RefreshEngine, SweepCancelled  # noqa: E402
+from benchmarks.simulation import SimulatedEngine, VirtualClock  # noqa: E402
+
+
+class FixedLatencyApi:
+    """每个请求耗时latency秒的假接口，记录每个请求开始的虚拟时间"""
+
+    def __init__(self, clock, latency):
+        self.clock = clock
+        self.latency = latency
+        self.last_latency = latency
+        self.starts = []
+        self.on_request = None
+
+    def request(self, item):
+        self.starts.append(self.clock.now)
+        if self.on_request is not None:
+            self.on_request(item)
+        return item
+
+
+class SimulatedEngineTest(unittest.TestCase):
+
+    def make_engine(self, latency=1.0, **options):
+        self.clock = VirtualClock()
+        self.api = FixedLatencyApi(self.clock, latency)
+        engine = SimulatedEngine(self.api, self.clock, **options)
+        engine.start()
+        self.addCleanup(engine.shutdown)
+        return engine
+
+    def sweep(self, engine, items):
+        """执行一次对items的刷新，返回(结果, error)"""
+        outcome = {}
+
+        async def run(engine):
+            results = await engine.map(lambda item: engine.call(self.api.request, item), items)
+            return sorted(result for _, result, _ in results)
+
+        finished = threading.Event()
+
+        def on_done(result, error):
+            outcome["result"] = result
+            outcome["error"] = error
+            finished.set()
+
+        # 被停止时返回的future已取消，等待on_done
+        engine.run_sweep(run, on_done=on_done)
+        self.assertTrue(finished.wait(10))
+        return outcome["result"], outcome["error"]
+
+    def test_concurrency_limit(self):
+        engine = self.make_engine(concurrency=2, min_interval=0, sweep_budget=None)
+        result, error = self.sweep(engine, range(6))
+        self.assertIsNone(error)
+        self.assertEqual(result, list(range(6)))
+        self.assertEqual(self.api.starts, [0.0, 0.0, 1.0, 1.0, 2.0, 2.0])
+
+    def test_min_interval(self):
+        engine = self.make_engine(concurrency=10, min_interval=0.25, sweep_budget=None)
+        self.sweep(engine, range(4))
+        self.assertEqual(self.api.starts, [0.0, 0.25, 0.5, 0.75])
+
+    def test_sweep_budget(self):
+        engine = self.make_engine(concurrency=1, min_interval=0, sweep_budget=3.5)
+        result, error = self.sweep(engine, range(10))
+        self.assertIsInstance(error, SweepCancelled)
+        self.assertIsNone(result)
+        self.assertEqual(self.api.starts, [0.0, 1.0, 2.0, 3.0])
+
+    def test_cancel(self):
+        engine = self.make_engine(concurrency=1, min_interval=0, sweep_budget=None)
+        self.api.on_request = lambda item: item == 2 and engine.cancel()
+        result, error = self.sweep(engine, range(10))
+        self.assertIsInstance(error, SweepCancelled)
+        self.assertEqual(len(self.api.starts), 3)
+        # 停止后可以启动新的刷新
+        self.api.on_request = None
+        self.assertIsNone(self.sweep(engine, range(2))[1])
+
+    def test_timed_out_request_keeps_its_slot(self):
+        engine = self.make_engine(latency=10.0, concurrency=1, request_timeout=2, min_interval=0, sweep_budget=None)
+
+        async def run():
+            try:
+                await engine.call(self.api.request, "slow")
+            except asyncio.TimeoutError:
+                pass
+            self.api.last_latency = 1.0
+            return await engine.call(self.api.request, "next")
+
+        self.assertEqual(engine.submit(run()).result(10), "next")
+        # 超时的请求到10秒才真正结束，下一个请求在那之后才开始
+        self.assertEqual(self.api.starts, [0.0, 10.0])
+
+
+class ThreadPoolTest(unittest.TestCase):
+
+    def test_stopped_requests_do_not_starve_new_ones(self):
+        engine = RefreshEngine(concurrency=2, request_timeout=5, min_interval=0, sweep_budget=None)
+        engine.start()
+        self.addCleanup(engine.shutdown)
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def hang(item):
+            started.release()
+            release.wait(10)
+            return item
+
+        async def run(engine):
+            return await engine.map(lambda item: engine.call(hang, item), range(2))
+
+        finished = threading.Event()
+        engine.run_sweep(run, on_done=lambda result, error: finished.set())
+        for _ in range(2):
+            self.assertTrue(started.acquire(timeout=5))
+        engine.cancel()
+        self.assertTrue(finished.wait(5))
+
+        # 线程池的两个线程仍卡在已停止的请求中；新请求等到它们结束后再开始，不会在队列中超时
+        threading.Timer(1.0, release.set).start()
+        future = engine.submit(engine.call(lambda: "done", timeout=0.5))
+        self.assertEqual(future.result(10), "done")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+进程间命令和单实例锁：令牌校验、未知命令、锁被持有时第二个实例加锁失败
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import AccountService, InstanceLock, InstanceServer, send_command  # noqa: E402
+
+
+class InstanceServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="account-test-")
+        data_file = os.path.join(self.directory, "accounts.json")
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump([{"uid": "a", "order": 0.0, "name": "alpha", "password": "secret", "status": False,
+                        "unban_time": "", "season": 35}], f)
+        self.service = AccountService(data_file)
+        self.service.load()
+        # 监听本机系统分配的端口
+        self.server = InstanceServer(self.service)
+        self.server.start()
+        self.endpoint_file = self.service.repository.endpoint_file
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_ping_and_list(self):
+        reply = send_command(self.endpoint_file, "ping")
+        self.assertEqual(reply, {"ok": True, "pid": os.getpid()})
+        reply = send_command(self.endpoint_file, "list", filter="alp")
+        self.assertEqual([account["name"] for account in reply["accounts"]], ["alpha"])
+        self.assertNotIn("password", reply["accounts"][0])
+
+    def test_wrong_token_is_rejected(self):
+        with open(self.endpoint_file, 'r', encoding='utf-8') as f:
+            endpoint = json.load(f)
+        forged = os.path.join(self.directory, "forged.ipc")
+        with open(forged, 'w', encoding='utf-8') as f:
+            json.dump(dict(endpoint, token="0" * 32), f)
+        reply = send_command(forged, "list")
+        self.assertFalse(reply["ok"])
+        self.assertNotIn("accounts", reply)
+
+    def test_unknown_command(self):
+        reply = send_command(self.endpoint_file, "format_disk")
+        self.assertFalse(reply["ok"])
+        self.assertIn("format_disk", reply["error"])
+
+    def test_stop_removes_endpoint(self):
+        self.server.stop()
+        self.assertFalse(os.path.exists(self.endpoint_file))
+        with self.assertRaises(OSError):
+            send_command(self.endpoint_file, "ping")
+
+
+class InstanceLockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="account-test-")
+        self.path = os.path.join(self.directory, "accounts.json.lock")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_second_lock_fails_while_held(self):
+        first = InstanceLock(self.path)
+        second = InstanceLock(self.path)
+        self.assertTrue(first.acquire())
+        try:
+            self.assertFalse(second.acquire())
+            self.assertEqual(second.owner(), os.getpid())
+        finally:
+            first.release()
+        self.assertTrue(second.acquire())
+        second.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+日志抽样：每个类别每个时间窗口只输出前burst条，之后的第一条附上省略的条数
+    python -m unittest discover tests
+"""
+
+import logging
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core.logs import SampleFilter, _level  # noqa: E402
+
+
+def record(message, sample=None):
+    record = logging.LogRecord("account_core.test", logging.INFO, __file__, 1, message, None, None)
+    if sample is not None:
+        record.sample = sample
+    return record
+
+
+class SampleFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.filter = SampleFilter(burst=3, interval=10.0, clock=lambda: self.now)
+
+    def test_burst_per_window(self):
+        passed = [self.filter.filter(record(f"账号{i}", "account")) for i in range(5)]
+        self.assertEqual(passed, [True, True, True, False, False])
+
+        # 下一个窗口的第一条附上上个窗口省略的条数
+        self.now = 10.0
+        first = record("账号5", "account")
+        self.assertTrue(self.filter.filter(first))
+        self.assertEqual(first.getMessage(), "账号5 (已省略 2 条同类日志)")
+        second = record("账号6", "account")
+        self.assertTrue(self.filter.filter(second))
+        self.assertEqual(second.getMessage(), "账号6")
+
+    def test_categories_are_independent(self):
+        for _ in range(3):
+            self.filter.filter(record("a", "ban"))
+        self.assertFalse(self.filter.filter(record("a", "ban")))
+        self.assertTrue(self.filter.filter(record("b", "rank")))
+
+    def test_unsampled_records_always_pass(self):
+        self.assertTrue(all(self.filter.filter(record("x")) for _ in range(100)))
+
+    def test_rate_over_time(self):
+        # 每秒10条持续60秒，每10秒的窗口只输出3条
+        passed = 0
+        for i in range(600):
+            self.now = i / 10
+            passed += self.filter.filter(record("x", "account"))
+        self.assertEqual(passed, 6 * 3)
+
+
+class LevelTest(unittest.TestCase):
+
+    def test_level_names(self):
+        self.assertEqual(_level("debug", logging.INFO), logging.DEBUG)
+        self.assertEqual(_level(" WARNING ", logging.INFO), logging.WARNING)
+        self.assertEqual(_level(logging.ERROR, logging.INFO), logging.ERROR)
+        self.assertEqual(_level("", logging.INFO), logging.INFO)
+        self.assertEqual(_level("loud", logging.INFO), logging.INFO)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+运行指标：直方图分位数的边界情况、Prometheus文本格式和JSON导出
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import MetricsRegistry  # noqa: E402
+from account_core.metrics import PREFIX, Histogram  # noqa: E402
+
+# 样本行：指标名{标签} 数值
+SAMPLE_LINE = re.compile(r'^([a-z_]+)(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? (-?[0-9.e+]+|\+Inf)$')
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(0.5))
+        self.assertIsNone(histogram.percentile(0.99))
+
+    def test_single_value(self):
+        histogram = Histogram()
+        histogram.observe(0.3)
+        for fraction in (0.5, 0.95, 0.99, 1.0):
+            self.assertEqual(histogram.percentile(fraction), 0.3)
+
+    def test_value_above_all_buckets(self):
+        histogram = Histogram()
+        histogram.observe(100.0)
+        self.assertEqual(histogram.percentile(1.0), 100.0)
+        self.assertTrue(30.0 <= histogram.percentile(0.5) <= 100.0)
+        self.assertEqual(histogram.cumulative()[-1], (float("inf"), 1))
+
+    def test_interpolates_within_bucket(self):
+        histogram = Histogram(buckets=(1.0, 2.0))
+        for value in (0.5, 1.5, 1.5, 1.5):
+            histogram.observe(value)
+        self.assertEqual(histogram.percentile(0.25), 1.0)
+        self.assertAlmostEqual(histogram.percentile(0.5), 1.0 + 1.0 / 3)
+        self.assertEqual(histogram.percentile(1.0), 1.5)
+        self.assertEqual(histogram.cumulative(), [(1.0, 1), (2.0, 4), (float("inf"), 4)])
+
+
+class RegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        self.metrics = MetricsRegistry(clock=lambda: self.now)
+
+    def populate(self):
+        self.metrics.observe_request("ban", 0.2, 200, key="a")
+        self.metrics.observe_request("ban", 1.2, 429, key="b")
+        self.metrics.observe_request("ban", 0.4, 200, key="b")
+        self.metrics.observe_request("rank", 20.0, "timeout", key="a")
+        self.metrics.record_cache("http_etag", True)
+        self.metrics.record_cache("http_etag", False)
+        self.metrics.record_phase("online", 10, 2.0)
+        self.metrics.record_startup("first_paint", 0.5)
+
+    def test_snapshot(self):
+        self.populate()
+        self.now = 160.0
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["uptime_seconds"], 60.0)
+        ban = snapshot["endpoints"]["ban"]
+        self.assertEqual((ban["requests"], ban["errors"], ban["retries"]), (3, 1, 1))
+        self.assertAlmostEqual(ban["error_rate"], 1 / 3)
+        self.assertEqual(ban["statuses"], {"200": 2, "429": 1})
+        self.assertEqual(snapshot["cache"]["http_etag"]["hit_ratio"], 0.5)
+        self.assertEqual(snapshot["phases"]["online"]["accounts_per_second"], 5.0)
+
+    def test_empty_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        self.assertEqual((snapshot["endpoints"], snapshot["cache"], snapshot["phases"]), ({}, {}, {}))
+        json.dumps(snapshot)
+
+    def test_prometheus_format(self):
+        self.populate()
+        text = self.metrics.to_prometheus()
+        self.assertTrue(text.endswith("\n"))
+        declared = set()
+        samples = {}
+        for line in text.splitlines():
+            if line.startswith("# TYPE "):
+                _, _, name, kind = line.split(" ")
+                self.assertIn(kind, ("counter", "gauge", "histogram"))
+                declared.add(name)
+                continue
+            match = SAMPLE_LINE.match(line)
+            self.assertIsNotNone(match, line)
+            name = match.group(1)
+            # 每个样本都属于之前声明过类型的指标
+            base = re.sub(r"_(bucket|sum|count)$", "", name)
+            self.assertTrue(name in declared or base in declared, line)
+            samples[line.rsplit(" ", 1)[0]] = float(line.rsplit(" ", 1)[1])
+
+        buckets = f'{PREFIX}_request_duration_seconds_bucket{{endpoint="ban",le='
+        self.assertEqual(samples[buckets + '"0.25"}'], 1)
+        self.assertEqual(samples[buckets + '"+Inf"}'], 3)
+        self.assertEqual(samples[f'{PREFIX}_request_duration_seconds_count{{endpoint="ban"}}'], 3)
+        self.assertEqual(samples[f'{PREFIX}_requests_total{{endpoint="rank",status="timeout"}}'], 1)
+        self.assertEqual(samples[f'{PREFIX}_cache_lookups_total{{cache="http_etag",result="miss"}}'], 1)
+
+    def test_empty_prometheus_is_valid(self):
+        for line in self.metrics.to_prometheus().splitlines():
+            self.assertTrue(line.startswith("# TYPE ") or SAMPLE_LINE.match(line), line)
+
+    def test_export(self):
+        self.populate()
+        directory = tempfile.mkdtemp(prefix="account-test-")
+        try:
+            json_path = os.path.join(directory, "metrics.json")
+            self.metrics.export(json_path)
+            with open(json_path, 'r', encoding='utf-8') as f:
+                self.assertEqual(json.load(f)["endpoints"]["ban"]["requests"], 3)
+            prom_path = os.path.join(directory, "metrics.prom")
+            self.metrics.export(prom_path)
+            with open(prom_path, 'r', encoding='utf-8') as f:
+                self.assertIn(f"# TYPE {PREFIX}_requests_total counter", f.read())
+            self.assertEqual(sorted(os.listdir(directory)), ["metrics.json", "metrics.prom"])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
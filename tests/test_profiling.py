@@ -0,0 +1,53 @@
+"""
+性能分析：写出结果失败时也能停止
+    python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import Profiler  # noqa: E402
+
+
+class ProfilerStopTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="account-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_stop_when_dump_fails(self):
+        # 输出目录的位置已有同名文件，无法创建目录
+        blocked = os.path.join(self.directory, "profiles")
+        open(blocked, 'w').close()
+        profiler = Profiler(directory=blocked)
+        profiler.start("cprofile")
+        with profiler.section("work"):
+            sum(range(1000))
+
+        with self.assertRaises(OSError):
+            profiler.stop()
+        self.assertFalse(profiler.enabled)
+        self.assertEqual(profiler.stop(), [])
+
+    def test_stop_writes_results(self):
+        profiler = Profiler(directory=os.path.join(self.directory, "profiles"))
+        profiler.start("cprofile")
+        with profiler.section("work"):
+            sum(range(1000))
+        paths = profiler.stop()
+        self.assertEqual(len(paths), 1)
+        self.assertTrue(paths[0].endswith("-work.pstats"))
+        self.assertFalse(profiler.enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+段位历史：后台读取期间查询不等待，记录等待读取完成
+    python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import RankHistory  # noqa: E402
+
+
+class SlowRankHistory(RankHistory):
+    """解析文件时等到release才返回"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.parsing = threading.Event()
+        self.release = threading.Event()
+
+    def _read(self):
+        self.parsing.set()
+        self.release.wait(10)
+        return super()._read()
+
+
+class RankHistoryLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="account-test-")
+        self.path = os.path.join(self.directory, "accounts.json.ranks")
+        history = RankHistory(self.path)
+        history.record("a", 35, 1000, 10, 2000, 0, 0)
+        history.record("a", 35, 2000, 10, 2100, 0, 0)
+        history.flush()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_queries_do_not_wait_for_background_load(self):
+        history = SlowRankHistory(self.path)
+        loader = threading.Thread(target=history.load)
+        loader.start()
+        self.assertTrue(history.parsing.wait(5))
+
+        # 读取中：查询立即返回空结果
+        self.assertTrue(history.loading)
+        self.assertIsNone(history.series("a", 35))
+        self.assertEqual(history.seasons("a"), [])
+
+        history.release.set()
+        loader.join(5)
+        self.assertFalse(history.loading)
+        self.assertEqual(len(history.series("a", 35)), 2)
+
+    def test_record_after_load_keeps_existing_points(self):
+        history = RankHistory(self.path)
+        self.assertTrue(history.record("a", 35, 3000, 11, 2200, 0, 0))
+        self.assertFalse(history.record("a", 35, 4000, 11, 2200, 0, 0))
+        history.flush()
+        self.assertEqual([point[2] for point in RankHistory(self.path).series("a", 35).range()], [2000, 2100, 2200])
+
+
+if __name__ == "__main__":
+    unittest.main()
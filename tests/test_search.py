@@ -0,0 +1,55 @@
+"""
+搜索索引：逐字输入时复用上次结果，与时间有关的条件不复用
+    python -m unittest discover tests
+"""
+
+import datetime
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import RANK_MAP, AccountSearchIndex  # noqa: E402
+from account_core import search  # noqa: E402
+
+
+def account(uid, name, unban_time):
+    return {"uid": uid, "name": name, "status": True, "unban_time": unban_time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+class SearchCacheTest(unittest.TestCase):
+
+    def test_unban_filter_follows_current_time(self):
+        now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        index = AccountSearchIndex(RANK_MAP)
+        index.rebuild([account("a", "alpha", now + datetime.timedelta(hours=2)),
+                       account("b", "alpine", now + datetime.timedelta(hours=8))])
+
+        with mock.patch.object(search.time, "time", return_value=now.timestamp()):
+            self.assertEqual(index.search("unban<6h al"), {"a"})
+        # 三小时后"b"也在6小时内解封，继续输入时不能只在上次结果中筛选
+        later = now + datetime.timedelta(hours=3)
+        with mock.patch.object(search.time, "time", return_value=later.timestamp()):
+            self.assertEqual(index.search("unban<6h alp"), {"a", "b"})
+
+    def test_deferred_index_matches_built_index(self):
+        now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        accounts = [account("a", "alpha", now), account("b", "beta", now), account("c", "alphabet", now)]
+        index = AccountSearchIndex(RANK_MAP)
+        index.defer(accounts)
+        self.assertFalse(index.ready)
+        self.assertEqual(index.search("alph"), {"a", "c"})
+
+        built = index.build(accounts)
+        index.remove(accounts[2])
+        index.update(dict(accounts[1], name="alphabeta"))
+        self.assertTrue(index.install(built))
+        self.assertEqual(index.search("alph"), {"a", "b"})
+
+
+if __name__ == "__main__":
+    unittest.main()
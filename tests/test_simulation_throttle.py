@@ -0,0 +1,71 @@
+"""
+限流后继续刷新：在虚拟时钟的模拟中，限流期间返回429的账号在下一次刷新中重新查询
+    python -m unittest discover tests
+"""
+
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import AccountService  # noqa: E402
+from benchmarks.simulation import FakePubgApi, SimulatedEngine, VirtualClock  # noqa: E402
+from benchmarks.synthetic import generate_accounts  # noqa: E402
+
+
+class ThrottledResumeTest(unittest.TestCase):
+
+    def test_throttled_accounts_are_requeried(self):
+        epoch = datetime.datetime(2024, 1, 1)
+        clock = VirtualClock()
+        book = generate_accounts(40, seed=1, now=epoch)
+        for account in book:
+            account.pop("checked_at", None)
+        # 前5秒全部返回429；每次刷新的预算只够查询一部分账号，刷新会被中断后继续
+        api = FakePubgApi(clock, book, epoch, seed=1, timeout_rate=0.0, throttle_windows=[(0, 5)], ban_rate=0.0)
+        engine = SimulatedEngine(api, clock, concurrency=4, request_timeout=15, min_interval=0.25, sweep_budget=8)
+
+        directory = tempfile.mkdtemp(prefix="account-test-")
+        try:
+            data_file = os.path.join(directory, "accounts.json")
+            with open(data_file, 'w', encoding='utf-8') as f:
+                json.dump(book, f, ensure_ascii=False)
+            service = AccountService(data_file, provider=api, engine=engine,
+                                     clock=lambda: epoch + datetime.timedelta(seconds=clock.now))
+            service.load()
+            service.start()
+            try:
+                completed = False
+                for _ in range(10):
+                    outcome = {}
+
+                    def on_done(result, error):
+                        outcome["error"] = error
+
+                    future = service.start_sweep(service.full_sweep, on_done=on_done)
+                    self.assertIsNotNone(future)
+                    future.result(30)
+                    if outcome["error"] is None:
+                        completed = True
+                        break
+            finally:
+                service.shutdown()
+
+            self.assertTrue(completed)
+            self.assertTrue(any(status == 429 for _, _, status, _ in api.calls))
+            # 每个账号最终都查询成功过，限流的账号没有被检查点跳过
+            unchecked = [account["name"] for account in service.accounts if not account.get("checked_at")]
+            self.assertEqual(unchecked, [])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+账号存储：提交产生的字段级修改、期望值冲突和提交后的通知
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import AccountStore, Change  # noqa: E402
+
+
+def make_store():
+    store = AccountStore()
+    store.reset([{"uid": "a", "name": "alpha", "status": False, "unban_time": ""},
+                 {"uid": "b", "name": "beta", "status": True, "unban_time": "2024-01-01 00:00:00"}])
+    return store
+
+
+class CommitTest(unittest.TestCase):
+
+    def test_changes_are_field_level(self):
+        store = make_store()
+        changes = store.commit([("a", {"name": "alpha", "status": True, "checked_at": "now"}),
+                                ("b", {"status": False})])
+        # 值没有变化的name不算修改，新增的字段old为None
+        self.assertEqual(list(changes), [Change("a", "status", False, True),
+                                         Change("a", "checked_at", None, "now"),
+                                         Change("b", "status", True, False)])
+        self.assertEqual(changes.uids(), ["a", "b"])
+        self.assertEqual(changes.fields("a"), {"status", "checked_at"})
+        self.assertTrue(changes.touches("checked_at", "rank"))
+        self.assertFalse(changes.touches("name"))
+        self.assertIs(store.snapshot().changes, changes)
+
+    def test_same_account_twice_in_one_commit(self):
+        store = make_store()
+        changes = store.commit([("a", {"status": True}), ("a", {"unban_time": "x"})])
+        self.assertEqual(store.get("a")["status"], True)
+        self.assertEqual(store.get("a")["unban_time"], "x")
+        self.assertEqual(len(changes), 2)
+
+    def test_expect_conflict_is_rejected(self):
+        store = make_store()
+        version = store.snapshot().version
+        self.assertIsNone(store.update("a", {"name": "new"}, expect={"name": "stale"}))
+        self.assertEqual(store.get("a")["name"], "alpha")
+        self.assertEqual(store.snapshot().version, version)
+
+        # 一批中冲突的修改被跳过，其余修改照常提交
+        results = store.update_many([("a", {"name": "new"}, {"name": "stale"}),
+                                     ("b", {"name": "new"}, {"name": "beta"}),
+                                     ("missing", {"name": "new"})])
+        self.assertIsNone(results[0])
+        self.assertEqual(results[1]["name"], "new")
+        self.assertIsNone(results[2])
+        self.assertEqual(store.snapshot().changes.uids(), ["b"])
+
+    def test_noop_commit_publishes_nothing(self):
+        store = make_store()
+        calls = []
+        store.subscribe(lambda snapshot, uids: calls.append(uids))
+        snapshot = store.snapshot()
+
+        changes = store.commit([("a", {"name": "alpha"}), ("missing", {"name": "x"})])
+        self.assertFalse(changes)
+        self.assertIs(store.snapshot(), snapshot)
+        self.assertIs(store.update("a", {"status": False}), snapshot.get("a"))
+        self.assertEqual(calls, [])
+
+    def test_listeners_run_outside_the_lock(self):
+        store = make_store()
+        seen = []
+
+        def listener(snapshot, uids):
+            # 提交的锁已经释放，回调中可以再次提交
+            self.assertTrue(store._lock.acquire(blocking=False))
+            store._lock.release()
+            seen.append((snapshot.version, uids))
+            if uids == ["a"]:
+                store.update("b", {"status": False})
+
+        store.subscribe(listener)
+        version = store.snapshot().version
+        store.update("a", {"status": True})
+        self.assertEqual(seen, [(version + 1, ["a"]), (version + 2, ["b"])])
+        self.assertEqual(store.get("b")["status"], False)
+
+    def test_failing_listener_does_not_block_others(self):
+        store = make_store()
+        calls = []
+
+        def failing(snapshot, uids):
+            raise RuntimeError("boom")
+
+        store.subscribe(failing)
+        store.subscribe(lambda snapshot, uids: calls.append(uids))
+        store.update("a", {"status": True})
+        self.assertEqual(calls, [["a"]])
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def test_published_snapshot_is_unchanged_by_later_commits(self):
+        store = make_store()
+        snapshot = store.snapshot()
+        alpha = snapshot.get("a")
+
+        store.update("a", {"status": True})
+        store.put({"uid": "c", "name": "gamma"})
+        store.put({"uid": "b", "name": "beta2"})
+        store.delete("a")
+
+        self.assertEqual(len(snapshot), 2)
+        self.assertIs(snapshot.get("a"), alpha)
+        self.assertEqual(alpha["status"], False)
+        self.assertEqual(snapshot.get("b")["name"], "beta")
+        self.assertIsNone(snapshot.get("c"))
+        self.assertEqual([account["uid"] for account in store.snapshot()], ["b", "c"])
+
+    def test_version_increases_by_one_per_commit(self):
+        store = make_store()
+        version = store.snapshot().version
+        store.update_many([("a", {"status": True}), ("b", {"status": False})])
+        self.assertEqual(store.snapshot().version, version + 1)
+
+        store.put({"uid": "c", "name": "gamma"})
+        self.assertEqual(store.snapshot().version, version + 2)
+        # 与已有账号完全相同的put和不存在账号的delete都不提交
+        store.put({"uid": "c", "name": "gamma"})
+        self.assertIsNone(store.delete("missing"))
+        self.assertEqual(store.snapshot().version, version + 2)
+
+        store.delete("c")
+        self.assertEqual(store.snapshot().version, version + 3)
+
+    def test_put_replaces_and_delete_reindexes(self):
+        store = make_store()
+        store.put({"uid": "a", "name": "alpha"})
+        # 整体替换时不在新记录中的字段记为删除
+        self.assertIn(Change("a", "status", False, None), store.snapshot().changes)
+        self.assertNotIn("status", store.get("a"))
+
+        removed = store.delete("a")
+        self.assertEqual(removed["name"], "alpha")
+        self.assertEqual(list(store.snapshot().changes), [Change("a", None, removed, None)])
+        self.assertEqual(store.snapshot().index, {"b": 0})
+        self.assertEqual(store.get("b")["name"], "beta")
+
+
+if __name__ == "__main__":
+    unittest.main()
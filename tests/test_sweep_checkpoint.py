@@ -0,0 +1,167 @@
+"""
+刷新检查点：被停止的刷新下次从检查点继续时，只跳过查询成功的账号
+    python -m unittest discover tests
+"""
+
+import asyncio
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import AccountService, RefreshEngine, SweepCheckpoint  # noqa: E402
+
+
+class ScriptedProvider:
+    """
+    按玩家id返回脚本化结果的假接口
+    failing中的玩家封禁查询返回失败(同限流或HTTP错误)，timeouts中的玩家封禁查询超时，
+    rank_failing中的玩家段位查询失败，blocking中的玩家封禁查询一直等到release
+    """
+
+    def __init__(self):
+        self.failing = set()
+        self.timeouts = set()
+        self.rank_failing = set()
+        self.blocking = set()
+        self.release = threading.Event()
+        self.ban_calls = []
+
+    def check_ban(self, player_id):
+        # 有account_id时按account_id查询，这里统一换回玩家id
+        player_id = player_id[len("account."):] if player_id.startswith("account.") else player_id
+        self.ban_calls.append(player_id)
+        if player_id in self.blocking:
+            self.release.wait(10)
+        if player_id in self.timeouts:
+            raise asyncio.TimeoutError()
+        if player_id in self.failing:
+            return False, False, 0, None
+        return False, True, 10, f"account.{player_id}"
+
+    def query_rank(self, account_id, season_num):
+        if account_id[len("account."):] in self.rank_failing:
+            return False, None, None
+        return True, None, None
+
+
+class SweepCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="account-test-")
+        self.data_file = os.path.join(self.directory, "accounts.json")
+        names = ["good", "throttled", "timeout", "rank_fail", "hang"]
+        accounts = [{"uid": name, "order": float(i), "name": name, "id": name, "account_id": f"account.{name}",
+                     "status": False, "unban_time": "", "extended_ban": "", "season": 35}
+                    for i, name in enumerate(names)]
+        with open(self.data_file, 'w', encoding='utf-8') as f:
+            json.dump(accounts, f)
+
+        self.provider = ScriptedProvider()
+        self.provider.failing.add("throttled")
+        self.provider.timeouts.add("timeout")
+        self.provider.rank_failing.add("rank_fail")
+        self.provider.blocking.add("hang")
+        engine = RefreshEngine(concurrency=8, request_timeout=30, min_interval=0, sweep_budget=None)
+        self.service = AccountService(self.data_file, provider=self.provider, engine=engine)
+        self.service.load()
+        self.service.start()
+
+    def tearDown(self):
+        self.provider.release.set()
+        self.service.shutdown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run_sweep(self, stop_after=None):
+        """执行一次完整刷新；stop_after不为None时在完成该数量的账号后停止，返回on_done的error"""
+        reached = threading.Event()
+        finished = threading.Event()
+        outcome = {}
+
+        def listener(event, data):
+            if event == "progress" and data["phase"] == "online" and data["done"] == stop_after:
+                reached.set()
+
+        def on_done(result, error):
+            outcome["error"] = error
+            finished.set()
+
+        self.service.add_listener(listener)
+        self.service.start_sweep(self.service.full_sweep, on_done=on_done)
+        if stop_after is not None:
+            self.assertTrue(reached.wait(10))
+            self.service.engine.cancel()
+        self.assertTrue(finished.wait(10))
+        self.service._listeners.remove(listener)
+        return outcome["error"]
+
+    def test_resume_requeries_failed_accounts(self):
+        # 第一次刷新在前4个账号完成后停止，"hang"仍在查询中
+        error = self.run_sweep(stop_after=4)
+        self.assertIsNotNone(error)
+        self.assertTrue(os.path.exists(self.service.repository.checkpoint_file))
+
+        # 接口恢复后继续：只有查询成功的"good"被跳过，失败、超时和未完成的账号重新查询
+        self.provider.failing.clear()
+        self.provider.timeouts.clear()
+        self.provider.rank_failing.clear()
+        self.provider.release.set()
+        self.provider.ban_calls.clear()
+        self.assertIsNone(self.run_sweep())
+        self.assertEqual(sorted(self.provider.ban_calls), ["hang", "rank_fail", "throttled", "timeout"])
+        self.assertFalse(os.path.exists(self.service.repository.checkpoint_file))
+
+
+class CheckpointFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="account-test-")
+        self.path = os.path.join(self.directory, "accounts.json.sweep")
+        self.now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def checkpoint(self, kind):
+        return SweepCheckpoint(self.path, kind, clock=lambda: self.now)
+
+    def test_kinds_do_not_overwrite_each_other(self):
+        online = self.checkpoint("online")
+        online.mark("a")
+        online.flush()
+
+        # 段位刷新写入并完成自己的检查点，不影响未完成的在线刷新
+        ranks = self.checkpoint("ranks")
+        ranks.mark("b")
+        ranks.flush()
+        ranks.clear()
+
+        resumed = self.checkpoint("online")
+        self.assertEqual(resumed.resume(), 1)
+        self.assertEqual(resumed.done, {"a"})
+        self.assertEqual(self.checkpoint("ranks").resume(), 0)
+
+        resumed.clear()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_expiry_uses_clock(self):
+        checkpoint = self.checkpoint("online")
+        checkpoint.mark("a")
+        checkpoint.flush()
+
+        self.now += datetime.timedelta(hours=23)
+        self.assertEqual(self.checkpoint("online").resume(), 1)
+        self.now += datetime.timedelta(hours=2)
+        self.assertEqual(self.checkpoint("online").resume(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
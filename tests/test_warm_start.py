@@ -0,0 +1,109 @@
+"""
+启动刷新策略：环境变量解析(无效值使用默认值)和按上次刷新时间选择刷新方式
+    python -m unittest discover tests
+"""
+
+import datetime
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from account_core import WarmStartPolicy  # noqa: E402
+
+
+def environ(**values):
+    """只包含指定启动刷新变量的环境"""
+    names = ("ACCOUNT_MANAGER_STARTUP_SWEEP", "ACCOUNT_MANAGER_STARTUP_MAX_AGE", "ACCOUNT_MANAGER_STARTUP_SKIP_WITHIN")
+    patched = {name: "" for name in names}
+    patched.update(values)
+    return mock.patch.dict(os.environ, patched)
+
+
+class FakeService:
+    """choose()用到的AccountService接口"""
+
+    def __init__(self, accounts, last_sweep=None, stale=()):
+        self.accounts = accounts
+        self.now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        self._last_sweep = last_sweep
+        self._stale = set(stale)
+
+    def clock(self):
+        return self.now
+
+    def last_sweep(self, kind):
+        return self._last_sweep
+
+    def is_stale(self, account, max_age):
+        return account["uid"] in self._stale
+
+    def full_sweep(self, engine):
+        pass
+
+    def local_sweep(self, engine):
+        pass
+
+    def stale_sweep(self, max_age):
+        return ("stale", max_age)
+
+
+class FromEnvTest(unittest.TestCase):
+
+    def test_defaults(self):
+        with environ():
+            policy = WarmStartPolicy.from_env()
+        self.assertEqual((policy.mode, policy.max_age, policy.skip_within), ("stale", 1800, 600))
+
+    def test_valid_values(self):
+        with environ(ACCOUNT_MANAGER_STARTUP_SWEEP=" Full ", ACCOUNT_MANAGER_STARTUP_MAX_AGE="90",
+                     ACCOUNT_MANAGER_STARTUP_SKIP_WITHIN="1.5"):
+            policy = WarmStartPolicy.from_env()
+        self.assertEqual((policy.mode, policy.max_age, policy.skip_within), ("full", 90.0, 1.5))
+
+    def test_invalid_values_fall_back_to_defaults(self):
+        with environ(ACCOUNT_MANAGER_STARTUP_SWEEP="sometimes", ACCOUNT_MANAGER_STARTUP_MAX_AGE="30m",
+                     ACCOUNT_MANAGER_STARTUP_SKIP_WITHIN="soon"):
+            with self.assertLogs("account_core.warm_start", "WARNING") as logs:
+                policy = WarmStartPolicy.from_env()
+        self.assertEqual((policy.mode, policy.max_age, policy.skip_within), ("stale", 1800, 600))
+        self.assertEqual(len(logs.records), 3)
+
+    def test_unknown_mode_in_constructor(self):
+        with self.assertRaises(ValueError):
+            WarmStartPolicy("sometimes")
+
+
+class ChooseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.accounts = [{"uid": "a", "id": "a"}, {"uid": "b", "id": "b"}, {"uid": "c"}]
+
+    def test_modes(self):
+        service = FakeService(self.accounts, stale=("a",))
+        self.assertEqual(WarmStartPolicy("full").choose(service)[0], service.full_sweep)
+        self.assertEqual(WarmStartPolicy("off").choose(service)[0], service.local_sweep)
+
+    def test_recent_sweep_skips_online(self):
+        service = FakeService(self.accounts, stale=("a",))
+        service._last_sweep = service.now - datetime.timedelta(minutes=5)
+        self.assertEqual(WarmStartPolicy().choose(service)[0], service.local_sweep)
+        service._last_sweep = service.now - datetime.timedelta(minutes=15)
+        self.assertEqual(WarmStartPolicy().choose(service)[0], ("stale", 1800))
+
+    def test_only_stale_accounts_with_ids(self):
+        # "c"没有ID，过期也不查询
+        service = FakeService(self.accounts, stale=("c",))
+        self.assertEqual(WarmStartPolicy().choose(service)[0], service.local_sweep)
+        service = FakeService(self.accounts, stale=("a", "c"))
+        sweep, message = WarmStartPolicy(max_age=60).choose(service)
+        self.assertEqual(sweep, ("stale", 60))
+        self.assertIn("1/3", message)
+
+
+if __name__ == "__main__":
+    unittest.main()
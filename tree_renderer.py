@@ -0,0 +1,279 @@
+import bisect
+import math
+from tkinter import ttk
+
+
+class TreeRenderer:
+    """
+    Treeview差量渲染器
+    记录上一次显示的行，新的显示列表只对差异部分执行插入、移动、更新和删除；
+    行数超过阈值时只实体化可见区域及其前后若干行(虚拟滚动)
+    """
+
+    def __init__(self, tree, scrollbar, virtual_threshold=2000, margin=50):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        # 超过该行数时启用虚拟滚动，为None时始终完整渲染
+        self.virtual_threshold = virtual_threshold
+        # 虚拟滚动时可见区域前后额外实体化的行数
+        self.margin = margin
+
+        # 完整的显示列表 [(iid, values)]
+        self._rows = []
+        # iid -> 在完整显示列表中的位置
+        self._positions = {}
+        # 当前实体化到Treeview中的iid(按显示顺序)
+        self._shown = []
+        # iid -> 已写入Treeview的values
+        self._shown_values = {}
+        # 实体化窗口在完整列表中的起始位置
+        self._window_start = 0
+        # 可见区域第一行在完整列表中的位置
+        self._first = 0
+        # 是否已安排重新计算窗口
+        self._rewindow_pending = False
+        # 可见区域变化(滚动、重新渲染)后的回调，不带参数
+        self.on_view_changed = None
+
+        # 接管滚动条与Treeview之间的联动
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.scrollbar.configure(command=self.yview)
+        # 表格高度变化时可见行数随之变化，需要重新计算窗口
+        self.tree.bind("<Configure>", self._on_configure, add="+")
+
+    def render(self, rows):
+        """
+        渲染新的显示列表
+        rows: [(iid, values)]，iid在列表中必须唯一
+        """
+        self._rows = rows
+        self._positions = {iid: i for i, (iid, _) in enumerate(rows)}
+
+        if self.is_virtual():
+            self._rewindow()
+        else:
+            self._window_start = 0
+            self._apply(rows)
+
+    def update_row(self, iid, values):
+        """
+        更新单行的显示内容，不改变行的位置
+        返回: 该行是否在显示列表中
+        """
+        pos = self._positions.get(iid)
+        if pos is None:
+            return False
+        self._rows[pos] = (iid, values)
+        # 未实体化的行只更新记录，滚动到时再写入Treeview
+        if iid in self._shown_values and self._shown_values[iid] != values:
+            self.tree.item(iid, values=values)
+            self._shown_values[iid] = values
+        return True
+
+    def move_row(self, iid, index):
+        """
+        将一行移动到完整显示列表中的指定位置
+        返回: 位置发生变化的行所在区间(start, end)，未移动时返回None
+        """
+        old = self._positions.get(iid)
+        if old is None or old == index:
+            return None
+        row = self._rows.pop(old)
+        self._rows.insert(index, row)
+        start, end = min(old, index), max(old, index)
+        for pos in range(start, end + 1):
+            self._positions[self._rows[pos][0]] = pos
+
+        if self.is_virtual():
+            # 窗口内容由差量渲染完成，只移动实际变化的行
+            self._rewindow()
+        else:
+            self.tree.move(iid, "", index)
+            self._shown.pop(old)
+            self._shown.insert(index, iid)
+        return start, end
+
+    def iid_at(self, position):
+        """返回完整显示列表中指定位置的行ID"""
+        return self._rows[position][0]
+
+    def index_of(self, iid):
+        """返回行在完整显示列表中的位置，不存在时返回None"""
+        return self._positions.get(iid)
+
+    def values_of(self, iid):
+        """返回行当前的显示内容，不存在时返回None"""
+        pos = self._positions.get(iid)
+        if pos is None:
+            return None
+        return self._rows[pos][1]
+
+    def visible_iids(self):
+        """返回当前可见区域内的行ID(按显示顺序)"""
+        if self.is_virtual():
+            return [iid for iid, _ in self._rows[self._first:self._first + self._page_size()]]
+        count = len(self._shown)
+        lo, hi = self.tree.yview()
+        return self._shown[int(lo * count):int(math.ceil(hi * count))]
+
+    def is_virtual(self):
+        """当前是否处于虚拟滚动模式"""
+        return self.virtual_threshold is not None and len(self._rows) > self.virtual_threshold
+
+    def see(self, iid):
+        """确保指定行可见"""
+        pos = self._positions.get(iid)
+        if pos is None:
+            return
+        if self.is_virtual() and iid not in self._shown_values:
+            self._first = max(0, pos - self._page_size() // 2)
+            self._rewindow()
+        self.tree.see(iid)
+
+    def yview(self, *args):
+        """滚动条回调"""
+        if not self.is_virtual():
+            self.tree.yview(*args)
+            return
+
+        total = len(self._rows)
+        page = self._page_size()
+        if args and args[0] == "moveto":
+            first = int(float(args[1]) * total)
+        elif args and args[0] == "scroll":
+            step = page if args[2] == "pages" else 1
+            first = self._first + int(args[1]) * step
+        else:
+            return
+        self._first = max(0, min(first, total - page))
+        self._rewindow()
+
+    def _on_configure(self, event):
+        """表格尺寸变化时重新实体化窗口"""
+        if self.is_virtual() and not self._rewindow_pending:
+            self._rewindow_pending = True
+            self.tree.after_idle(self._rewindow)
+
+    def _on_tree_scroll(self, lo, hi):
+        """Treeview自身滚动(鼠标滚轮等)时同步滚动条，接近窗口边缘时移动窗口"""
+        if self.on_view_changed is not None:
+            self.on_view_changed()
+        if not self.is_virtual():
+            self.scrollbar.set(lo, hi)
+            return
+
+        total = len(self._rows)
+        count = len(self._shown)
+        if not total or not count:
+            self.scrollbar.set(0, 1)
+            return
+
+        # 将窗口内的相对位置换算为完整列表中的位置
+        global_first = self._window_start + float(lo) * count
+        global_last = self._window_start + float(hi) * count
+        self._first = int(round(global_first))
+        self.scrollbar.set(global_first / total, global_last / total)
+
+        window_end = self._window_start + count
+        near_top = self._window_start > 0 and global_first - self._window_start < self.margin / 2
+        near_bottom = window_end < total and window_end - global_last < self.margin / 2
+        if (near_top or near_bottom) and not self._rewindow_pending:
+            self._rewindow_pending = True
+            self.tree.after_idle(self._rewindow)
+
+    def _rewindow(self):
+        """以当前可见位置为中心重新实体化窗口"""
+        self._rewindow_pending = False
+        total = len(self._rows)
+        page = self._page_size()
+        self._first = max(0, min(self._first, max(0, total - page)))
+        start = max(0, self._first - self.margin)
+        end = min(total, self._first + page + self.margin)
+
+        self._window_start = start
+        self._apply(self._rows[start:end])
+
+        # 让可见区域第一行保持在顶部
+        if end > start:
+            self.tree.yview_moveto((self._first - start) / (end - start))
+
+    def _page_size(self):
+        """估算Treeview一页可以显示的行数"""
+        height = self.tree.winfo_height()
+        try:
+            row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except (TypeError, ValueError):
+            row_height = 20
+        if height <= 1:
+            # 界面尚未显示时按默认高度估算
+            return 30
+        return max(1, (height - 25) // row_height)
+
+    def _apply(self, target):
+        """将Treeview当前内容以最少的操作变换为target"""
+        new_order = [iid for iid, _ in target]
+        new_set = set(new_order)
+
+        # 删除不再显示的行(一次调用批量删除)
+        removed = [iid for iid in self._shown if iid not in new_set]
+        if removed:
+            self.tree.delete(*removed)
+            for iid in removed:
+                del self._shown_values[iid]
+
+        # 保留下来的行中，按新顺序排列时位置递增的最长子序列不需要移动
+        old_positions = {iid: i for i, iid in enumerate(self._shown) if iid in new_set}
+        kept = [iid for iid in new_order if iid in old_positions]
+        stable = longest_increasing_subsequence(kept, old_positions)
+        moved = [iid for iid in kept if iid not in stable]
+        if moved:
+            # 先摘下需要移动的行，剩余行的相对顺序已与新顺序一致
+            self.tree.detach(*moved)
+        moved_set = set(moved)
+
+        stable_remaining = len(stable)
+        for i, (iid, values) in enumerate(target):
+            # 后面已没有保留的行时直接追加到末尾，避免Tk按位置查找
+            index = i if stable_remaining else "end"
+            if iid not in old_positions:
+                self.tree.insert("", index, iid=iid, values=values)
+                self._shown_values[iid] = values
+                continue
+            if iid in moved_set:
+                self.tree.move(iid, "", index)
+            else:
+                stable_remaining -= 1
+            if self._shown_values[iid] != values:
+                self.tree.item(iid, values=values)
+                self._shown_values[iid] = values
+
+        self._shown = new_order
+
+
+def longest_increasing_subsequence(items, positions):
+    """
+    返回items中按positions递增的最长子序列(集合形式)
+    用于找出重新排序时可以保持不动的行
+    """
+    tails = []       # tails[k]: 长度为k+1的递增子序列末尾元素在items中的下标
+    tail_values = []  # 与tails对应的positions值，用于二分查找
+    parents = [None] * len(items)
+
+    for i, item in enumerate(items):
+        value = positions[item]
+        k = bisect.bisect_left(tail_values, value)
+        if k > 0:
+            parents[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+
+    result = set()
+    i = tails[-1] if tails else None
+    while i is not None:
+        result.add(items[i])
+        i = parents[i]
+    return result
@@ -0,0 +1,69 @@
+import collections
+import threading
+
+from account_core.logs import get_logger
+
+log = get_logger("ui_queue")
+
+
+class UiUpdateQueue:
+    """
+    线程安全的界面更新队列
+    后台线程只向队列提交回调，主线程按固定间隔统一执行；
+    同一个key(如同一行、状态栏)在一个周期内多次提交时只执行最后一次
+    """
+
+    def __init__(self, root, interval=50):
+        self.root = root
+        # 两次处理之间的间隔(毫秒)
+        self.interval = interval
+        self._lock = threading.Lock()
+        # key -> 回调，按最后一次提交的顺序排列
+        self._pending = collections.OrderedDict()
+        # 无key提交时使用的自增序号，保证不会被合并
+        self._sequence = 0
+        self._after_id = None
+
+    def start(self):
+        """开始按固定间隔处理队列(必须在主线程调用)"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        """停止处理队列"""
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def post(self, callback, key=None):
+        """
+        提交一个界面更新，可在任意线程调用
+        key相同的更新在同一周期内会合并为最后一次
+        """
+        with self._lock:
+            if key is None:
+                self._sequence += 1
+                key = ("__seq__", self._sequence)
+            # 合并后按最后一次提交的位置执行，保证与其他更新的先后顺序
+            self._pending.pop(key, None)
+            self._pending[key] = callback
+
+    def flush(self):
+        """立即执行所有待处理的更新(必须在主线程调用)"""
+        with self._lock:
+            pending = self._pending
+            self._pending = collections.OrderedDict()
+
+        for callback in pending.values():
+            try:
+                callback()
+            except Exception as e:
+                log.error("界面更新出错: %s", e)
+
+    def _drain(self):
+        """定时处理队列"""
+        self.flush()
+        self._after_id = self.root.after(self.interval, self._drain)